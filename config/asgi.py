@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.GEOCODER_WARM_UP:
+    from tax_service.geocoders import get_geocoder
+
+    get_geocoder().warm_up()
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -14,3 +15,13 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def warm_up_geocoder(**kwargs):
+    from django.conf import settings
+
+    if settings.GEOCODER_WORKER_WARM_UP:
+        from tax_service.geocoders import get_geocoder
+
+        get_geocoder().warm_up()
@@ -31,12 +31,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tax_service.static_files.AsyncWhiteNoiseMiddleware',  # WhiteNoise, async-capable for ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'tax_service.db_router.ReplicaStickinessMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -64,11 +65,28 @@ import dj_database_url
 DATABASES = {
     'default': dj_database_url.config(
         default=env('DATABASE_URL', default='sqlite:///db.sqlite3'),
-        conn_max_age=600,
+        # Set CONN_MAX_AGE=0 under ASGI: async requests hop threads, so
+        # persistent per-thread connections would pile up.
+        conn_max_age=env.int('CONN_MAX_AGE', default=600),
         conn_health_checks=True,
     )
 }
 
+# Optional streaming replica for read-only endpoints (see tax_service/db_router.py).
+# Locally, point it at a second alias of the same database to exercise routing.
+if env('REPLICA_DATABASE_URL', default=''):
+    DATABASES['replica'] = dj_database_url.parse(
+        env('REPLICA_DATABASE_URL'),
+        conn_max_age=env.int('CONN_MAX_AGE', default=600),
+        conn_health_checks=True,
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['tax_service.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+REPLICA_MAX_LAG_SECONDS = env.float('REPLICA_MAX_LAG_SECONDS', default=10.0)
+REPLICA_LAG_CHECK_INTERVAL = env.float('REPLICA_LAG_CHECK_INTERVAL', default=2.0)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -123,3 +141,72 @@ if CELERY_RESULT_BACKEND.startswith('rediss://'):
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Reserve one task at a time so queued import chunks are dispatched fairly
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Import scheduling (see tax_service/scheduler.py)
+IMPORT_SMALL_JOB_ROWS = env.int('IMPORT_SMALL_JOB_ROWS', default=50_000)
+IMPORT_SMALL_QUEUE = env('IMPORT_SMALL_QUEUE', default='imports_small')
+IMPORT_LARGE_QUEUE = env('IMPORT_LARGE_QUEUE', default='imports_large')
+IMPORT_MAX_SLICES_PER_JOB = env.int('IMPORT_MAX_SLICES_PER_JOB', default=2)
+IMPORT_ROWS_PER_SECOND = env.float('IMPORT_ROWS_PER_SECOND', default=200.0)  # ETA before any history
+IMPORT_CHUNK_CLAIM_TIMEOUT = env.int('IMPORT_CHUNK_CLAIM_TIMEOUT', default=900)  # seconds before a claimed chunk counts as abandoned
+IMPORT_CHUNK_MAX_ATTEMPTS = env.int('IMPORT_CHUNK_MAX_ATTEMPTS', default=3)  # claims before an unrecorded chunk is reported as failed
+
+# Idempotency-Key handling for order creation (see tax_service/idempotency.py)
+IDEMPOTENCY_REDIS_URL = env('IDEMPOTENCY_REDIS_URL', default=red_url)  # '' = database only
+IDEMPOTENCY_CACHE_SECONDS = env.int('IDEMPOTENCY_CACHE_SECONDS', default=600)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+IDEMPOTENCY_WAIT_SECONDS = env.float('IDEMPOTENCY_WAIT_SECONDS', default=10.0)  # duplicate waits for in-flight result
+IDEMPOTENCY_LOCK_SECONDS = env.int('IDEMPOTENCY_LOCK_SECONDS', default=60)  # then the claim counts as abandoned
+
+# Dashboard polling (see tax_service/dashboard.py)
+CHANGES_SETTLE_SECONDS = env.float('CHANGES_SETTLE_SECONDS', default=2.0)  # commit lag the cursor allows for
+DASHBOARD_FULL_REFRESH_SECONDS = env.int('DASHBOARD_FULL_REFRESH_SECONDS', default=600)
+
+# Geocoding backend (see tax_service/geocoders/__init__.py): 'vector_polygon' |
+# 'nominatim' | 'local_nys', or a dotted path to a GeocodeProvider subclass
+GEOCODER_BACKEND = env('GEOCODER_BACKEND', default='vector_polygon')
+GEOCODER_WARM_UP = env.bool('GEOCODER_WARM_UP', default=False)  # load indexes at web start, not on the first order
+GEOCODER_WORKER_WARM_UP = env.bool('GEOCODER_WORKER_WARM_UP', default=True)  # same for each Celery worker process
+NOMINATIM_URL = env('NOMINATIM_URL', default='https://nominatim.openstreetmap.org/reverse')  # or `manage.py fake_nominatim`
+NOMINATIM_MIN_INTERVAL = env.float('NOMINATIM_MIN_INTERVAL', default=1.1)  # seconds slept before each uncached lookup
+
+# Redis Streams order ingestion (see tax_service/streams.py, `manage.py consume_order_stream`)
+ORDER_STREAM_REDIS_URL = env('ORDER_STREAM_REDIS_URL', default=red_url)
+ORDER_STREAM_KEY = env('ORDER_STREAM_KEY', default='orders:events')
+ORDER_STREAM_GROUP = env('ORDER_STREAM_GROUP', default='order-ingest')
+ORDER_STREAM_BATCH_SIZE = env.int('ORDER_STREAM_BATCH_SIZE', default=500)
+ORDER_STREAM_WINDOW_MS = env.int('ORDER_STREAM_WINDOW_MS', default=100)  # max wait after a batch's first entry
+ORDER_STREAM_CLAIM_IDLE_MS = env.int('ORDER_STREAM_CLAIM_IDLE_MS', default=30_000)  # then a crashed consumer's entries are reclaimed
+ORDER_STREAM_MAX_DELIVERIES = env.int('ORDER_STREAM_MAX_DELIVERIES', default=5)  # then an entry is dead-lettered
+
+# Opt-in profiling: ?profile=1 (staff) and ImportJob.profile (see tax_service/profiling.py)
+PROFILE_MODE = env('PROFILE_MODE', default='sampling')  # 'sampling' | 'cprofile'
+PROFILE_SAMPLE_INTERVAL_MS = env.float('PROFILE_SAMPLE_INTERVAL_MS', default=10.0)
+PROFILE_MAX_OVERHEAD = env.float('PROFILE_MAX_OVERHEAD', default=0.02)  # sampler time / wall time; the interval backs off above it
+PROFILE_MAX_SECONDS = env.int('PROFILE_MAX_SECONDS', default=900)  # sampling stops after this, the work carries on
+
+# Import-time budgets checked by `python manage.py startup_profile`
+STARTUP_BUDGET_WEB_MS = env.int('STARTUP_BUDGET_WEB_MS', default=1500)
+STARTUP_BUDGET_WORKER_MS = env.int('STARTUP_BUDGET_WORKER_MS', default=2000)
+
+# Boundary layers for VectorPolygonProvider, descended state -> county ->
+# locality/special. Each entry: level ('state' | 'county' | 'locality' | 'special'),
+# path, and either a fixed parent (state=, county=) or the feature property
+# holding it (state_property=, county_property=); names come from name_property.
+BOUNDARY_LAYERS = [
+    {'level': 'county', 'path': os.path.join(BASE_DIR, 'data', 'nys_counties.geojson'), 'state': 'New York'},
+    {'level': 'locality', 'path': os.path.join(BASE_DIR, 'data', 'nys_localities.geojson'), 'state': 'New York'},
+    {'level': 'special', 'path': os.path.join(BASE_DIR, 'data', 'nys_special_districts.geojson'), 'state': 'New York'},
+]
+# Prebuilt per-group quadtrees, rebuilt with `python manage.py build_boundary_index`
+BOUNDARY_INDEX_DIR = env('BOUNDARY_INDEX_DIR', default=os.path.join(BASE_DIR, 'data', 'boundary_index'))
+
+# Write-behind buffer for POST /api/orders/ (see tax_service/write_behind.py)
+ORDER_WRITE_BEHIND = env.bool('ORDER_WRITE_BEHIND', default=False)
+ORDER_WRITE_BEHIND_BACKEND = env('ORDER_WRITE_BEHIND_BACKEND', default='local')  # 'local' | 'redis'
+ORDER_WRITE_BEHIND_REDIS_URL = env('ORDER_WRITE_BEHIND_REDIS_URL', default=red_url)
+ORDER_WRITE_BEHIND_DURABILITY = env('ORDER_WRITE_BEHIND_DURABILITY', default='flush')  # 'flush' | 'buffer'
+ORDER_WRITE_BEHIND_FLUSH_MS = env.int('ORDER_WRITE_BEHIND_FLUSH_MS', default=50)
+ORDER_WRITE_BEHIND_MAX_ROWS = env.int('ORDER_WRITE_BEHIND_MAX_ROWS', default=500)
@@ -1,11 +1,12 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './styles.css';
-import type { OrderResponse, ImportResponse } from './api';
+import type { OrderResponse, ImportResponse, DashboardSummary } from './api';
 import { api } from './api';
 import { ToastContainer, toast } from 'react-toastify';
 import 'react-toastify/dist/ReactToastify.css';
 
-
+// Summary polls are conditional (ETag), so an unchanged summary costs a 304
+const SUMMARY_POLL_MS = 5000;
 
 function App() {
   const [lat, setLat] = useState('40.7128');
@@ -18,6 +19,7 @@ function App() {
   const [uploadStatus, setUploadStatus] = useState<ImportResponse | null>(null);
   const [uploadError, setUploadError] = useState<string | null>(null);
   const [isUploading, setIsUploading] = useState(false);
+  const [patchFile, setPatchFile] = useState<File | null>(null);
 
   const [orders, setOrders] = useState<OrderResponse[]>([]);
   const [ordersLoading, setOrdersLoading] = useState(false);
@@ -28,6 +30,29 @@ function App() {
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
   const [isFetchingMore, setIsFetchingMore] = useState(false);
+  // Cursor into /orders/changes/ taken when page 1 was loaded
+  const changesCursor = useRef<string | null>(null);
+
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
+  const summaryEtag = useRef<string | null>(null);
+
+  useEffect(() => {
+    const pollSummary = async () => {
+      if (document.hidden) return;
+      try {
+        const res = await api.fetchDashboardSummary(summaryEtag.current);
+        if (res) {
+          summaryEtag.current = res.etag;
+          setSummary(res.summary);
+        }
+      } catch (err) {
+        console.error('Failed to load dashboard summary', err);
+      }
+    };
+    pollSummary();
+    const interval = setInterval(pollSummary, SUMMARY_POLL_MS);
+    return () => clearInterval(interval);
+  }, []);
 
   useEffect(() => {
     // Reset state and fetch page 1 whenever sorting changes
@@ -46,7 +71,7 @@ function App() {
       });
       setCalcResult(res);
       toast.success('Successfully calculated tax and added order!');
-      handleFetchOrders(); // Refresh table after new calculation
+      handleFetchNewOrders(); // Add the new order to the table
     } catch (err) {
       toast.error('Failed to calculate tax. Please check coordinates and subtotal.');
     } finally {
@@ -67,7 +92,7 @@ function App() {
           } else {
             toast.error('CSV processing failed on the server.');
           }
-          await handleFetchOrders(); // Refresh table immediately after completion
+          await handleFetchNewOrders(); // Add imported orders immediately after completion
         }
       } catch (err) {
         toast.error('Lost connection while checking upload status.');
@@ -85,6 +110,12 @@ function App() {
     toast.info('Upload started. Calculating taxes for CSV rows...');
     try {
       const res = await api.uploadCSV(file);
+      if (res.deduplicated) {
+        toast.info(`This file was already uploaded, showing import #${res.id}.`);
+      } else if (res.appended_to) {
+        toast.info(`Importing only the rows added since import #${res.appended_to}.`);
+      }
+      setUploadStatus(res);
       pollImportStatus(res.id);
     } catch (err) {
       toast.error('Failed to upload CSV file. Server error.');
@@ -93,6 +124,21 @@ function App() {
     }
   };
 
+  const handleRetryFailed = async () => {
+    if (!uploadStatus) return;
+    setIsUploading(true);
+    toast.info(`Retrying ${uploadStatus.failed_rows} failed rows...`);
+    try {
+      const res = await api.retryFailedImport(uploadStatus.id, patchFile);
+      setUploadStatus(res);
+      setPatchFile(null);
+      pollImportStatus(res.id);
+    } catch (err) {
+      toast.error('Failed to retry the failed rows.');
+      setIsUploading(false);
+    }
+  };
+
   const fetchPage = async (pageNum: number, clearList = false) => {
     if (clearList) {
       setOrdersLoading(true);
@@ -105,6 +151,11 @@ function App() {
         orderingParam += ',-id';
       }
 
+      if (clearList) {
+        // Taken before the page so nothing created in between is missed
+        changesCursor.current = (await api.fetchOrderChanges(null)).next_cursor;
+      }
+
       // Progressive loading: chunk size of 50 for instant rendering
       const res = await api.fetchOrders(pageNum, '50', orderingParam);
 
@@ -132,6 +183,28 @@ function App() {
     fetchPage(1, true);
   };
 
+  // Newest-first by id: prepend only the orders created since the last load
+  const handleFetchNewOrders = async () => {
+    if (sortField !== 'id' || sortDirection !== 'desc' || !changesCursor.current) {
+      return handleFetchOrders();
+    }
+    try {
+      const res = await api.fetchOrderChanges(changesCursor.current);
+      if (res.reset || res.has_more) {
+        // Cleared, or too many new rows (large import): reload page 1
+        return handleFetchOrders();
+      }
+      changesCursor.current = res.next_cursor;
+      setOrders(prev => {
+        const freshIds = new Set(res.results.map(o => o.id));
+        const merged = [...prev.filter(o => !freshIds.has(o.id)), ...res.results];
+        return merged.sort((a, b) => b.id - a.id);
+      });
+    } catch (err) {
+      console.error('Failed to load new orders', err);
+    }
+  };
+
   const handleScroll = (e: React.UIEvent<HTMLDivElement>) => {
     const { scrollTop, clientHeight, scrollHeight } = e.currentTarget;
     if (scrollHeight - scrollTop <= clientHeight * 1.5 && !isFetchingMore && hasMore && !ordersLoading) {
@@ -213,7 +286,7 @@ function App() {
         onDrop={(e) => { e.preventDefault(); if (e.dataTransfer.files[0]) setFile(e.dataTransfer.files[0]); }}>
         <input
           type="file"
-          accept=".csv"
+          accept=".csv,.gz,.zip"
           onChange={(e) => setFile(e.target.files ? e.target.files[0] : null)}
           id="file-upload"
           className="hidden"
@@ -239,7 +312,7 @@ function App() {
               style={{ width: `${uploadStatus.total_rows ? (uploadStatus.processed_rows / uploadStatus.total_rows) * 100 : 0}% ` }}
             ></div>
           </div>
-          <p className="mt-2 text-sm">Processed: {uploadStatus.processed_rows} | Success: {uploadStatus.success_rows} | Errors: {uploadStatus.failed_rows}</p>
+          <p className="mt-2 text-sm">Processed: {uploadStatus.processed_rows} | Success: {uploadStatus.success_rows} | Duplicates: {uploadStatus.duplicate_rows} | Errors: {uploadStatus.failed_rows}</p>
 
           {uploadStatus.error_report && uploadStatus.error_report.length > 0 && (
             <div className="error-logs">
@@ -254,6 +327,18 @@ function App() {
               )}
             </div>
           )}
+
+          {uploadStatus.status === 'COMPLETED' && uploadStatus.failed_rows > 0 && (
+            <div className="mt-4">
+              <label className="text-sm">
+                Corrections CSV (optional, <code>row</code> column + fixed values):
+                <input type="file" accept=".csv" onChange={e => setPatchFile(e.target.files ? e.target.files[0] : null)} />
+              </label>
+              <button onClick={handleRetryFailed} disabled={isUploading} className="btn-small btn-primary mt-2">
+                Retry {uploadStatus.failed_rows} failed rows
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -306,6 +391,14 @@ function App() {
         </div>
       </div>
 
+      {summary && (
+        <div className="result-row space-between text-sm mb-4">
+          <span>Orders: <strong>{summary.orders}</strong></span>
+          <span>Tax collected: <strong>${summary.tax_amount}</strong></span>
+          <span>Effective rate: <strong>{(parseFloat(summary.effective_rate) * 100).toFixed(3)}%</strong></span>
+        </div>
+      )}
+
       {orders.length === 0 && !ordersLoading ? (
         <div className="empty-state">No orders loaded yet. Calculate one or upload CSV.</div>
       ) : (
@@ -6,6 +6,7 @@ export interface OrderRequest {
       lat: number;
       lon: number;
       subtotal: string;
+      external_id?: string;
 }
 
 export interface TaxBreakdown {
@@ -27,6 +28,7 @@ export interface OrderResponse {
       geo_state: string;
       geo_raw_response: any;
       breakdown: TaxBreakdown[];
+      external_id: string | null;
 }
 
 export interface ImportResponse {
@@ -36,10 +38,37 @@ export interface ImportResponse {
       processed_rows: number;
       success_rows: number;
       failed_rows: number;
+      duplicate_rows: number;
+      retries: number;
+      appended_to: number | null;
+      row_offset: number;
+      deduplicated?: boolean;
       error_report: Array<{ row: number, error: string }>;
+      queue: 'small' | 'large';
+      estimated_rows: number;
+      queue_position: number | null;
+      eta: string | null;
       created_at: string;
 }
 
+export interface OrderChanges {
+      results: OrderResponse[];
+      next_cursor: string | null;
+      has_more: boolean;
+      reset: boolean;
+}
+
+export interface DashboardSummary {
+      orders: number;
+      subtotal: string;
+      tax_amount: string;
+      total_amount: string;
+      effective_rate: string;
+      last_order_at: string | null;
+      top_counties: Array<{ county: string, orders: number, tax_amount: string }>;
+      imports: Record<string, number>;
+}
+
 export const api = {
       async calculateTax(data: OrderRequest): Promise<OrderResponse> {
             const response = await fetch(`${API_BASE_URL}/orders/`, {
@@ -55,11 +84,12 @@ export const api = {
             return response.json();
       },
 
-      async uploadCSV(file: File): Promise<{ id: number; status: string }> {
+      // An identical file returns the existing job (deduplicated: true) unless force is set
+      async uploadCSV(file: File, force: boolean = false): Promise<ImportResponse> {
             const formData = new FormData();
             formData.append('file', file);
 
-            const response = await fetch(`${API_BASE_URL}/orders/import_csv/`, {
+            const response = await fetch(`${API_BASE_URL}/orders/import_csv/${force ? '?force=true' : ''}`, {
                   method: 'POST',
                   body: formData,
             });
@@ -77,15 +107,56 @@ export const api = {
             return response.json();
       },
 
+      // Reprocess only the failed rows; `patch` is an optional CSV with a `row` column plus corrected values
+      async retryFailedImport(id: number, patch: File | null = null): Promise<ImportResponse> {
+            const formData = new FormData();
+            if (patch) {
+                  formData.append('file', patch);
+            }
+            const response = await fetch(`${API_BASE_URL}/imports/${id}/retry_failed/`, {
+                  method: 'POST',
+                  body: formData,
+            });
+            if (!response.ok) {
+                  throw new Error(`API Error: ${response.statusText}`);
+            }
+            return response.json();
+      },
+
       async fetchOrders(page: number = 1, limit: string = '50', ordering: string = '-created_at'): Promise<{ count: number; next: string | null; previous: string | null; results: OrderResponse[] }> {
-            const url = `${API_BASE_URL}/orders/?page=${page}&limit=${limit}&ordering=${ordering}&_t=${Date.now()}`;
-            const response = await fetch(url);
+            const url = `${API_BASE_URL}/orders/?page=${page}&limit=${limit}&ordering=${ordering}`;
+            const response = await fetch(url, { cache: 'no-store' });
+            if (!response.ok) {
+                  throw new Error(`API Error: ${response.statusText}`);
+            }
+            return response.json();
+      },
+
+      // Orders created after `since` (oldest first); pass next_cursor back on the next poll
+      async fetchOrderChanges(since: string | null): Promise<OrderChanges> {
+            const query = since ? `?since=${encodeURIComponent(since)}` : '';
+            const response = await fetch(`${API_BASE_URL}/orders/changes/${query}`, { cache: 'no-store' });
             if (!response.ok) {
                   throw new Error(`API Error: ${response.statusText}`);
             }
             return response.json();
       },
 
+      // Resolves to null when the summary is unchanged since `etag` (304)
+      async fetchDashboardSummary(etag: string | null): Promise<{ summary: DashboardSummary; etag: string | null } | null> {
+            const response = await fetch(`${API_BASE_URL}/dashboard/summary/`, {
+                  headers: etag ? { 'If-None-Match': etag } : {},
+                  cache: 'no-cache',
+            });
+            if (response.status === 304) {
+                  return null;
+            }
+            if (!response.ok) {
+                  throw new Error(`API Error: ${response.statusText}`);
+            }
+            return { summary: await response.json(), etag: response.headers.get('ETag') };
+      },
+
       async clearOrders(): Promise<void> {
             const response = await fetch(`${API_BASE_URL}/orders/clear/`, {
                   method: 'POST'
@@ -1,10 +1,144 @@
+import datetime
+
 from django.contrib import admin
-from .models import TaxRateAdmin, Order, ImportJob
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+from .models import (
+    TaxRateAdmin,
+    Order,
+    ImportJob,
+    Jurisdiction,
+    ProfileReport,
+    RateSet,
+    RerateJob,
+)
+from .pagination import EstimatedCountPaginator
+
+# How long filter choices read from the jurisdiction table are cached
+FILTER_CHOICES_TTL = 300
+
+
+class JurisdictionChoicesFilter(admin.SimpleListFilter):
+    """
+    Choices come from the (small, deduplicated) jurisdiction table and are
+    cached, instead of a DISTINCT over every order on each page load.
+    """
+
+    field = None
+
+    def lookups(self, request, model_admin):
+        values = cache.get_or_set(
+            f"admin:jurisdiction_choices:{self.field}",
+            lambda: list(
+                Jurisdiction.objects.exclude(**{self.field: ""})
+                .exclude(**{f"{self.field}__isnull": True})
+                .order_by(self.field)
+                .values_list(self.field, flat=True)
+                .distinct()
+            ),
+            FILTER_CHOICES_TTL,
+        )
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f"jurisdiction__{self.field}": self.value()})
+        return queryset
+
+
+class StateFilter(JurisdictionChoicesFilter):
+    title = "state"
+    parameter_name = "state"
+    field = "state"
+
+
+class CountyFilter(JurisdictionChoicesFilter):
+    title = "county"
+    parameter_name = "county"
+    field = "county"
+
+    def lookups(self, request, model_admin):
+        state = request.GET.get(StateFilter.parameter_name)
+        if not state:
+            return super().lookups(request, model_admin)
+        values = (
+            Jurisdiction.objects.filter(state=state)
+            .exclude(county="")
+            .order_by("county")
+            .values_list("county", flat=True)
+            .distinct()
+        )
+        return [(value, value) for value in values]
+
+
+class SourceFilter(JurisdictionChoicesFilter):
+    title = "source"
+    parameter_name = "source"
+    field = "source"
+
+
+def _next_period(start, kind):
+    if kind == "year":
+        return start.replace(year=start.year + 1)
+    if kind == "month":
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+class ProbedDatesQuerySet(models.QuerySet):
+    """
+    date_hierarchy asks for DISTINCT truncated dates over the whole result
+    set. Instead, probe each candidate year/month/day between MIN and MAX
+    with an EXISTS on the indexed column - a handful of index lookups.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None, is_dst=None):
+        bounds = self.aggregate(first=models.Min(field_name), last=models.Max(field_name))
+        if not bounds["first"]:
+            return []
+        tz = tzinfo or timezone.get_current_timezone()
+        first = timezone.localtime(bounds["first"], tz).replace(tzinfo=None)
+        last = timezone.localtime(bounds["last"], tz).replace(tzinfo=None)
+
+        current = datetime.datetime(
+            first.year,
+            1 if kind == "year" else first.month,
+            first.day if kind == "day" else 1,
+        )
+        found = []
+        while current <= last:
+            following = _next_period(current, kind)
+            lo, hi = timezone.make_aware(current, tz), timezone.make_aware(following, tz)
+            if self.filter(**{f"{field_name}__gte": lo, f"{field_name}__lt": hi}).exists():
+                found.append(lo)
+            current = following
+        return found if order == "ASC" else found[::-1]
+
+
+@admin.register(RateSet)
+class RateSetAdmin(admin.ModelAdmin):
+    list_display = ("version", "is_active", "row_count", "source", "created_at", "activated_at")
+    list_filter = ("is_active",)
+    search_fields = ("version", "source")
+    readonly_fields = ("content_hash", "row_count", "is_active", "created_at", "activated_at")
+    actions = ["activate_rate_set"]
+
+    @admin.action(description="Activate selected rate set")
+    def activate_rate_set(self, request, queryset):
+        from .rates import activate
+
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one rate set.", level="error")
+            return
+        rate_set = activate(queryset.get())
+        self.message_user(request, f"Rate set {rate_set.version} is now active.")
 
 
 @admin.register(TaxRateAdmin)
 class TaxRateAdminAdmin(admin.ModelAdmin):
     list_display = (
+        "rate_set",
         "state",
         "county",
         "locality",
@@ -15,8 +149,29 @@ class TaxRateAdminAdmin(admin.ModelAdmin):
         "valid_from",
         "valid_to",
     )
-    list_filter = ("state", "county")
+    list_filter = ("rate_set", "state", "county")
+    list_select_related = ("rate_set",)
     search_fields = ("county", "locality")
+    actions = ["rerate_affected_orders"]
+
+    @admin.action(description="Re-rate orders affected by selected rates")
+    def rerate_affected_orders(self, request, queryset):
+        from .tasks import rerate_orders_task
+
+        for rate in queryset:
+            # A special district row's locality is the district name
+            # ("MCTD"), not a city orders are stored under: its orders are
+            # found by county, and re-rating the rest of it changes nothing.
+            special = rate.rate_special is not None
+            job = RerateJob.objects.create(
+                state=rate.state,
+                county=rate.county,
+                locality=None if special else rate.locality,
+                period_start=rate.valid_from,
+                period_end=rate.valid_to,
+            )
+            rerate_orders_task.delay(job.id)
+        self.message_user(request, f"Queued {queryset.count()} re-rating job(s).")
 
 
 @admin.register(Order)
@@ -31,9 +186,39 @@ class OrderAdmin(admin.ModelAdmin):
         "total_amount",
         "created_at",
     )
-    list_filter = ("geo_state", "geo_county", "geo_source")
-    search_fields = ("geo_county", "geo_locality")
+    list_filter = (StateFilter, CountyFilter, SourceFilter)
+    list_select_related = ("jurisdiction",)
+    search_fields = ("jurisdiction__county", "jurisdiction__locality")
+    search_help_text = "Order id, or the start of a state, county or locality name"
+    raw_id_fields = ("jurisdiction", "rate_application")
     readonly_fields = ("breakdown", "jurisdictions", "geo_raw_response")
+    date_hierarchy = "order_timestamp"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return ProbedDatesQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset._db
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Numbers match the order id; text is prefix-matched against the
+        jurisdiction table and joined back through the indexed FK, so no
+        icontains scan runs over the order table.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        jurisdiction_ids = Jurisdiction.objects.filter(
+            models.Q(state__istartswith=term)
+            | models.Q(county__istartswith=term)
+            | models.Q(locality__istartswith=term)
+        ).values_list("pk", flat=True)
+        return queryset.filter(jurisdiction_id__in=list(jurisdiction_ids)), False
 
 
 @admin.register(ImportJob)
@@ -41,11 +226,51 @@ class ImportJobAdmin(admin.ModelAdmin):
     list_display = (
         "id",
         "status",
+        "queue",
+        "estimated_rows",
         "total_rows",
         "success_rows",
+        "duplicate_rows",
         "failed_rows",
         "created_at",
         "finished_at",
     )
+    list_filter = ("status", "queue", "profile")
+    readonly_fields = ("error_report",)
+
+    def get_queryset(self, request):
+        # error_report can hold thousands of rows per job; only the change
+        # view needs it.
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith(
+            "_changelist"
+        ):
+            queryset = queryset.defer("error_report")
+        return queryset
+
+
+@admin.register(RerateJob)
+class RerateJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "status",
+        "state",
+        "county",
+        "locality",
+        "period_start",
+        "period_end",
+        "matched_orders",
+        "changed_orders",
+        "tax_delta",
+        "finished_at",
+    )
     list_filter = ("status",)
     readonly_fields = ("error_report",)
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ("id", "label", "mode", "duration_ms", "samples", "overhead", "job", "created_at")
+    list_filter = ("mode",)
+    raw_id_fields = ("job",)
+    exclude = ("payload",)
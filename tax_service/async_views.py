@@ -0,0 +1,140 @@
+"""
+Async order endpoints for the ASGI deployment. Geocoding awaits
+GeocodeProvider.aresolve (PIP offloaded to the thread pool, Nominatim via
+asyncio.sleep + threaded HTTP) and the DB work uses Django's async ORM, so a
+slow geocoder parks a coroutine instead of a worker thread.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import APIException
+
+from . import external_ids, idempotency
+from .serializers import OrderCreateSerializer, OrderSerializer
+from .services import TaxCalculationService
+
+
+def _validated(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return None, JsonResponse({"detail": "JSON parse error"}, status=400)
+
+    serializer = OrderCreateSerializer(data=payload)
+    if not serializer.is_valid():
+        return None, JsonResponse(serializer.errors, status=400)
+    return serializer.validated_data, None
+
+
+@csrf_exempt
+@require_POST
+async def order_create(request):
+    data, error = _validated(request)
+    if error:
+        return error
+
+    key = request.headers.get(idempotency.HEADER)
+    if not key:
+        return await _create_order(data)
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        return JsonResponse(
+            {idempotency.HEADER: [f"At most {idempotency.MAX_KEY_LENGTH} characters"]},
+            status=400,
+        )
+
+    # claim() may poll for an in-flight duplicate; keep that off the event loop
+    try:
+        record, replay = await sync_to_async(idempotency.claim, thread_sensitive=False)(
+            key, idempotency.request_fingerprint(data)
+        )
+    except APIException as e:
+        return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+    if replay is not None:
+        response = JsonResponse(replay.body, status=replay.status_code)
+        response[idempotency.REPLAY_HEADER] = "true"
+        return response
+
+    try:
+        response = await _create_order(data)
+    except Exception:
+        await sync_to_async(idempotency.release)(record)
+        raise
+    await sync_to_async(idempotency.complete)(
+        record, response.status_code, json.loads(response.content)
+    )
+    return response
+
+
+async def _create_order(data):
+    external_id = data.get("external_id")
+    if external_id:
+        existing = await _existing_order_response(external_id)
+        if existing is not None:
+            return existing
+
+    service = TaxCalculationService()
+    try:
+        if settings.ORDER_WRITE_BEHIND:
+            from .write_behind import get_write_buffer
+
+            order = await service.aquote(
+                lat=data["lat"],
+                lon=data["lon"],
+                subtotal=data["subtotal"],
+                order_timestamp=data.get("timestamp"),
+                external_id=external_id,
+            )
+            await order.aintern_dimensions()
+            await sync_to_async(get_write_buffer().submit, thread_sensitive=False)(order)
+        else:
+            order = await service.aprocess_order(
+                lat=data["lat"],
+                lon=data["lon"],
+                subtotal=data["subtotal"],
+                order_timestamp=data.get("timestamp"),
+                external_id=external_id,
+            )
+    except IntegrityError:
+        # A concurrent request claimed the same external_id first
+        existing = await _existing_order_response(external_id) if external_id else None
+        if existing is None:
+            raise
+        return existing
+    return JsonResponse(OrderSerializer(order).data, status=201)
+
+
+async def _existing_order_response(external_id):
+    order, pending = await sync_to_async(external_ids.lookup)(external_id)
+    if pending:
+        # Claimed by an order that is still buffered or being inserted
+        response = JsonResponse(
+            {"detail": "An order with this external_id is still being written"}, status=409
+        )
+        response["Retry-After"] = "1"
+        return response
+    if order is None:
+        return None
+    return JsonResponse(OrderSerializer(order).data, status=200)
+
+
+@csrf_exempt
+@require_POST
+async def order_quote(request):
+    data, error = _validated(request)
+    if error:
+        return error
+
+    service = TaxCalculationService()
+    order = await service.aquote(
+        lat=data["lat"],
+        lon=data["lon"],
+        subtotal=data["subtotal"],
+        order_timestamp=data.get("timestamp"),
+    )
+    return JsonResponse(OrderSerializer(order).data)
@@ -0,0 +1,258 @@
+"""
+Dashboard polling: an incremental order feed and a cached summary.
+
+Both use created_at rather than the order id as the watermark. Ids are not
+commit-ordered (the write-behind buffer reserves id blocks, and concurrent
+transactions commit out of order), while created_at is stamped when the
+order is built, just before the insert (the write-behind flusher re-stamps
+rows that waited in its buffer past the settle window). Rows newer than CHANGES_SETTLE_SECONDS (plus
+REPLICA_MAX_LAG_SECONDS when the request reads from the replica) may still be
+joined by slower commits, so:
+
+- the changes cursor never advances past that settle window; recent rows can
+  be returned again and clients dedupe them by id;
+- the cached summary only covers rows up to the settle window; newer rows are
+  aggregated live on every request (an index range on created_at) and merged
+  into the response without being cached.
+
+The cached totals are rebuilt from scratch when history may have changed: a
+re-rating job finished, the table was cleared, or DASHBOARD_FULL_REFRESH_SECONDS
+passed (retention removed old months).
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .db_router import reading_from_replica
+from .models import ImportJob, Order, RerateJob
+
+CACHE_KEY = "dashboard:summary"
+TOP_COUNTIES = 10
+
+
+# ------------------------------------------------------------------ cursor
+def encode_cursor(created_at, order_id):
+    micros = int(created_at.timestamp()) * 1_000_000 + created_at.microsecond
+    return f"{micros}-{order_id}"
+
+
+def decode_cursor(value):
+    """
+    Returns (created_at, id) for a cursor string, or None if it is malformed.
+    """
+    try:
+        micros, order_id = value.split("-", 1)
+        micros, order_id = int(micros), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+    created_at = datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(
+        microseconds=micros
+    )
+    return created_at, order_id
+
+
+def settled_before(now=None):
+    seconds = settings.CHANGES_SETTLE_SECONDS
+    if reading_from_replica():
+        # Commits reach the replica up to REPLICA_MAX_LAG_SECONDS late
+        seconds += settings.REPLICA_MAX_LAG_SECONDS
+    return (now or timezone.now()) - timedelta(seconds=seconds)
+
+
+def changes_since(queryset, cursor, limit, now=None):
+    """
+    Orders after `cursor` in (created_at, id) order. Without a cursor no
+    rows are returned, only a cursor at the settle window to tail from
+    (use "0-0" to read from the beginning).
+
+    Returns (rows, next_cursor, has_more, reset). reset is True when the
+    table was cleared (the cursor's order is gone and ids restarted below
+    it); the rows then start from the beginning and the client should drop
+    its copy. A cursor order removed by retention is not a reset: the
+    (created_at, id) comparison still finds everything after it.
+    """
+    settled = settled_before(now)
+    if cursor is None:
+        return [], encode_cursor(settled, 0), False, False
+
+    created_at, order_id = cursor
+    reset = bool(
+        order_id
+        and not Order.objects.filter(pk=order_id, created_at=created_at).exists()
+        and not Order.objects.filter(pk__gte=order_id).exists()
+    )
+    if reset:
+        cursor = None
+    else:
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=order_id)
+        )
+
+    rows = list(queryset.order_by("created_at", "id")[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Advance only over settled rows; anything newer is sent again next time.
+    next_cursor = cursor
+    for order in rows:
+        if order.created_at > settled:
+            break
+        next_cursor = (order.created_at, order.id)
+    next_cursor = encode_cursor(*next_cursor) if next_cursor else "0-0"
+    return rows, next_cursor, has_more, reset
+
+
+# ----------------------------------------------------------------- summary
+def _history_marker():
+    """
+    Changes whenever already-counted orders may have changed.
+    """
+    last = (
+        RerateJob.objects.filter(status="COMPLETED")
+        .order_by("-finished_at")
+        .values_list("id", "finished_at")
+        .first()
+    )
+    return f"{last[0]}:{last[1].isoformat()}" if last else ""
+
+
+def _aggregate(queryset):
+    totals = queryset.aggregate(
+        orders=Count("id"),
+        subtotal=Sum("subtotal"),
+        tax_amount=Sum("tax_amount"),
+        total_amount=Sum("total_amount"),
+        last_order_at=Max("created_at"),
+    )
+    by_county = {}
+    for county, orders, tax in (
+        queryset.values_list("jurisdiction__county")
+        .annotate(orders=Count("id"), tax=Sum("tax_amount"))
+        .order_by()
+    ):
+        by_county[county or ""] = [orders, str(tax or 0)]
+    return totals, by_county
+
+
+def _merge(state, totals, by_county):
+    state["orders"] += totals["orders"]
+    for field in ("subtotal", "tax_amount", "total_amount"):
+        state[field] = str(Decimal(state[field]) + (totals[field] or 0))
+    if totals["last_order_at"]:
+        last = totals["last_order_at"].isoformat()
+        state["last_order_at"] = max(state["last_order_at"] or "", last)
+    for county, (orders, tax) in by_county.items():
+        current = state["by_county"].get(county, [0, "0"])
+        state["by_county"][county] = [
+            current[0] + orders,
+            str(Decimal(current[1]) + Decimal(tax)),
+        ]
+    return state
+
+
+def _empty_state(marker, now):
+    return {
+        "marker": marker,
+        "computed_at": now.isoformat(),
+        "through": None,
+        "orders": 0,
+        "subtotal": "0",
+        "tax_amount": "0",
+        "total_amount": "0",
+        "last_order_at": None,
+        "by_county": {},
+    }
+
+
+def _stale(state, marker, now):
+    if state is None or state["marker"] != marker:
+        return True
+    age = now - datetime.fromisoformat(state["computed_at"])
+    if age.total_seconds() > settings.DASHBOARD_FULL_REFRESH_SECONDS:
+        return True
+    # Cleared table: counted rows are gone
+    return bool(
+        state["orders"]
+        and not Order.objects.filter(
+            created_at__lte=datetime.fromisoformat(state["through"])
+        ).exists()
+    )
+
+
+def order_aggregates(now=None):
+    """
+    Totals over all orders: cached up to the settle window, live after it.
+    """
+    now = now or timezone.now()
+    settled = settled_before(now)
+    marker = _history_marker()
+    state = cache.get(CACHE_KEY)
+
+    if _stale(state, marker, now):
+        state = _empty_state(marker, now)
+    through = datetime.fromisoformat(state["through"]) if state["through"] else None
+    if through is None or settled > through:
+        queryset = Order.objects.filter(created_at__lte=settled)
+        if through is not None:
+            queryset = queryset.filter(created_at__gt=through)
+        _merge(state, *_aggregate(queryset))
+        state["through"] = settled.isoformat()
+        cache.set(CACHE_KEY, state, None)
+        through = settled
+
+    live = json.loads(json.dumps(state))
+    return _merge(live, *_aggregate(Order.objects.filter(created_at__gt=through)))
+
+
+def summary(now=None):
+    """
+    Returns (payload, etag, last_modified).
+    """
+    state = order_aggregates(now)
+    imports = dict(
+        ImportJob.objects.values_list("status").annotate(n=Count("id")).order_by()
+    )
+    import_activity = ImportJob.objects.aggregate(
+        created=Max("created_at"), started=Max("started_at"), finished=Max("finished_at")
+    )
+    counties = sorted(
+        state["by_county"].items(), key=lambda item: item[1][0], reverse=True
+    )[:TOP_COUNTIES]
+
+    subtotal = Decimal(state["subtotal"])
+    payload = {
+        "orders": state["orders"],
+        "subtotal": state["subtotal"],
+        "tax_amount": state["tax_amount"],
+        "total_amount": state["total_amount"],
+        "effective_rate": (
+            str((Decimal(state["tax_amount"]) / subtotal).quantize(Decimal("0.0001")))
+            if subtotal
+            else "0.0000"
+        ),
+        "last_order_at": state["last_order_at"],
+        "top_counties": [
+            {"county": county, "orders": n, "tax_amount": tax}
+            for county, (n, tax) in counties
+        ],
+        "imports": imports,
+    }
+    etag = hashlib.md5(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    moments = [value for value in import_activity.values() if value]
+    rerated = RerateJob.objects.aggregate(finished=Max("finished_at"))["finished"]
+    if rerated:
+        moments.append(rerated)
+    if state["last_order_at"]:
+        moments.append(datetime.fromisoformat(state["last_order_at"]))
+    last_modified = max(moments) if moments else None
+    return payload, etag, last_modified
@@ -0,0 +1,212 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless a view explicitly opts in (ReplicaReadMixin,
+or replica_reads() in function views), so Celery tasks, admin and anything
+that writes keep reading from the primary.
+An opted-in read still stays on the primary when:
+
+- the client wrote something within REPLICA_STICKY_SECONDS (read-your-writes,
+  tracked with a cookie set by ReplicaStickinessMiddleware),
+- the current request has already written,
+- the replica lags more than REPLICA_MAX_LAG_SECONDS, or the lag can't be read.
+"""
+
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = "replica"
+STICKY_COOKIE = "db_primary_until"
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+_lag_lock = threading.Lock()
+_lag_checked_at = 0.0
+_lag_value = None
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def replica_lag_seconds():
+    """
+    Replication lag of the replica in seconds, or None if it can't be read.
+    Non-Postgres replicas (e.g. a second SQLite alias locally) report 0.
+    """
+    connection = connections[REPLICA_ALIAS]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE "
+            "WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        lag = cursor.fetchone()[0]
+    return None if lag is None else float(lag)
+
+
+def replica_healthy():
+    """
+    Lag is sampled at most once per REPLICA_LAG_CHECK_INTERVAL per process.
+    """
+    global _lag_checked_at, _lag_value
+    now = time.monotonic()
+    with _lag_lock:
+        if now - _lag_checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            try:
+                _lag_value = replica_lag_seconds()
+            except Exception:
+                logger.exception("Could not read replica lag, using primary")
+                _lag_value = None
+            _lag_checked_at = now
+        lag = _lag_value
+    if lag is None or lag > settings.REPLICA_MAX_LAG_SECONDS:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def use_replica():
+    """
+    Route ORM reads inside the block to the replica, if one is configured
+    and healthy.
+    """
+    alias = REPLICA_ALIAS if replica_configured() and replica_healthy() else None
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Anything read later in this request must see this write.
+        if _read_alias.get() is not None:
+            _read_alias.set(None)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != REPLICA_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """
+    After a successful write, pin the client to the primary for
+    REPLICA_STICKY_SECONDS so it reads back what it just wrote. Each request
+    starts with reads on the primary (the read alias is reset afterwards).
+    Sync and async capable, so it doesn't force the ASGI views into a thread.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self._pin(request, response)
+
+    def _pin(self, request, response):
+        if (
+            replica_configured()
+            and request.method not in self.SAFE_METHODS
+            and response.status_code < 400
+        ):
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def reading_from_replica():
+    return _read_alias.get() is not None
+
+
+@contextlib.contextmanager
+def replica_reads(request):
+    """
+    use_replica() for a read-only request from a client that is not pinned
+    to the primary; other requests keep reading from the primary.
+    """
+    if (
+        request.method in ReplicaStickinessMiddleware.SAFE_METHODS
+        and not pinned_to_primary(request)
+    ):
+        with use_replica() as alias:
+            yield alias
+    else:
+        yield None
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin: the actions in replica_actions read from the replica,
+    unless the client is pinned to the primary.
+    """
+
+    replica_actions = ("list",)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_cm = None
+        if self.action in self.replica_actions:
+            self._replica_cm = replica_reads(request)
+            self._replica_cm.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        cm = getattr(self, "_replica_cm", None)
+        if cm is not None:
+            self._replica_cm = None
+            cm.__exit__(None, None, None)
+        return super().finalize_response(request, response, *args, **kwargs)
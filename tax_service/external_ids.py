@@ -0,0 +1,86 @@
+"""
+Uniqueness of Order.external_id across partitions.
+
+Every insert path claims the external_ids it writes in OrderExternalId
+(see the model): the API and imports in the same transaction as the order,
+so a concurrent duplicate fails on the claim's unique index and the whole
+insert rolls back; write-behind and async inserts before the order row
+exists. A claim whose order is not visible yet is "pending": retries get
+409 until it is written, and a pending claim older than PENDING_SECONDS
+(its buffered row was lost) is dropped so the order can be created again.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Order, OrderExternalId
+
+logger = logging.getLogger(__name__)
+
+# A claim without a visible order is given up after this long
+PENDING_SECONDS = 60
+
+
+def claim(orders):
+    """
+    Claim the external_ids of saved (or id-reserved) orders. Raises
+    IntegrityError when one is already claimed; call inside the insert's
+    transaction.
+    """
+    claims = [
+        OrderExternalId(external_id=order.external_id, order_id=order.pk)
+        for order in orders
+        if order.external_id
+    ]
+    if claims:
+        OrderExternalId.objects.bulk_create(claims)
+
+
+def claimed(external_ids):
+    """
+    The subset of external_ids that already have an order.
+    """
+    external_ids = {eid for eid in external_ids if eid}
+    if not external_ids:
+        return set()
+    return set(
+        OrderExternalId.objects.filter(external_id__in=external_ids).values_list(
+            "external_id", flat=True
+        )
+    )
+
+
+def release(order_ids):
+    """
+    Drop the claims of buffered orders that were never written.
+    """
+    OrderExternalId.objects.filter(order_id__in=list(order_ids)).delete()
+
+
+def lookup(external_id, now=None):
+    """
+    Returns (order, pending) for a claimed external_id: the existing order,
+    or pending=True while its insert has not committed. (None, False) when
+    the external_id is free, including after a stale pending claim is
+    dropped.
+    """
+    record = OrderExternalId.objects.filter(external_id=external_id).first()
+    if record is None:
+        return None, False
+    order = None
+    if record.order_id is not None:
+        order = (
+            Order.objects.select_related("jurisdiction", "rate_application")
+            .filter(pk=record.order_id)
+            .first()
+        )
+    if order is not None:
+        return order, False
+    if record.created_at > (now or timezone.now()) - timedelta(seconds=PENDING_SECONDS):
+        return None, True
+    # The row was lost (or removed by retention): free the external_id
+    OrderExternalId.objects.filter(pk=record.pk, order_id=record.order_id).delete()
+    logger.warning(f"Dropped stale claim on external_id {external_id!r}")
+    return None, False
@@ -0,0 +1,150 @@
+"""
+Failed import rows, kept for retrying.
+
+Every import chunk with failures stores the original values of just those
+rows as one ImportFailedRows set (zlib JSON columns, plus their row numbers
+and errors). retry_failed_rows() reprocesses the sets one at a time through
+the normal validation and tax path, optionally overlaying corrections from
+a patch CSV, and updates the job's counters in place. Rows that fail again
+replace their set, so a retry costs time proportional to the failures, not
+to the size of the original file.
+"""
+
+import csv
+import io
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ImportFailedRows, ImportJob
+from .scheduler import decode_chunk, encode_chunk
+from .utils.columnar import parse_columns, resolve_columns
+
+logger = logging.getLogger(__name__)
+
+ROW_COLUMN = "row"
+ERROR_COLUMN = "error"
+
+
+def store_failed_rows(job_id, values, row_index, errors):
+    """
+    Keep the original values of the rows named in errors. values are the
+    chunk's columns and row_index their row numbers.
+    """
+    reasons = {e["row"]: e["error"] for e in errors if "row" in e}
+    positions = [i for i, row in enumerate(row_index) if row in reasons]
+    if not positions:
+        return None
+
+    subset = {
+        name: [column[i] for i in positions]
+        for name, column in values.items()
+        if column is not None
+    }
+    subset[ROW_COLUMN] = [row_index[i] for i in positions]
+    subset[ERROR_COLUMN] = [reasons[row_index[i]] for i in positions]
+    return ImportFailedRows.objects.create(
+        job_id=job_id, row_count=len(positions), payload=encode_chunk(subset)
+    )
+
+
+def read_patch(text):
+    """
+    Patch CSV -> {row: {column: value}}. The file needs a "row" column with
+    the row numbers from the error report; the other columns use the import
+    headers (lat, lon, subtotal, timestamp, external_id and their aliases).
+    Blank cells keep the original value. Raises ValueError on a bad file.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, [])
+    names = [name.strip().lower() for name in header]
+    if ROW_COLUMN not in names:
+        raise ValueError(f"Patch CSV needs a '{ROW_COLUMN}' column")
+    row_position = names.index(ROW_COLUMN)
+    columns = resolve_columns(header)
+
+    patch = {}
+    for line, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        try:
+            index = int(row[row_position])
+        except (IndexError, ValueError):
+            raise ValueError(f"Invalid row number on line {line}")
+        patch[index] = {
+            name: row[position].strip()
+            for name, position in columns.items()
+            if position is not None and position < len(row) and row[position].strip()
+        }
+    return patch
+
+
+def _retry_set(job_id, failed, patch, service):
+    from .tasks import process_batch
+
+    values = decode_chunk(failed.payload)
+    row_index = values.pop(ROW_COLUMN)
+    values.pop(ERROR_COLUMN, None)
+    for i, row in enumerate(row_index):
+        for name, value in patch.get(row, {}).items():
+            values.setdefault(name, [None] * len(row_index))[i] = value
+
+    parsed, rejected = parse_columns(values, len(row_index), row_index=row_index)
+    with transaction.atomic():
+        success, duplicates, errors = process_batch(None, service, job_id, parsed)
+        errors = sorted(rejected + errors, key=lambda e: e["row"])
+        store_failed_rows(job_id, values, row_index, errors)
+        failed.delete()
+        ImportJob.objects.filter(pk=job_id).update(
+            success_rows=F("success_rows") + success,
+            duplicate_rows=F("duplicate_rows") + duplicates,
+            failed_rows=F("failed_rows") - len(row_index) + len(errors),
+        )
+    return success, duplicates, len(errors)
+
+
+def rebuild_error_report(job):
+    """
+    Global (non-row) errors followed by the errors of the rows still failing.
+    """
+    report = [e for e in job.error_report if "row" not in e]
+    rows = []
+    for payload in (
+        ImportFailedRows.objects.filter(job=job).order_by("pk").values_list("payload", flat=True)
+    ):
+        values = decode_chunk(payload)
+        rows.extend(
+            {"row": row, "error": error}
+            for row, error in zip(values[ROW_COLUMN], values[ERROR_COLUMN])
+        )
+    return report + sorted(rows, key=lambda e: e["row"])
+
+
+def retry_failed_rows(job, patch=None, service=None):
+    """
+    Reprocess the stored failed rows of job. Returns (succeeded, duplicates,
+    still_failing).
+    """
+    from .services import TaxCalculationService
+
+    service = service or TaxCalculationService()
+    patch = patch or {}
+    totals = [0, 0, 0]
+    # Sets written during this run hold rows that just failed again
+    for failed in list(ImportFailedRows.objects.filter(job=job).order_by("pk")):
+        for i, count in enumerate(_retry_set(job.pk, failed, patch, service)):
+            totals[i] += count
+
+    job.refresh_from_db()
+    job.error_report = rebuild_error_report(job)
+    job.retries += 1
+    job.status = "COMPLETED"
+    job.finished_at = timezone.now()
+    job.save()
+    logger.info(
+        f"ImportJob {job.pk} retry: {totals[0]} succeeded, {totals[1]} duplicates, "
+        f"{totals[2]} still failing"
+    )
+    return tuple(totals)
@@ -0,0 +1,111 @@
+"""
+Geocoding providers.
+
+The backend is chosen with settings.GEOCODER_BACKEND, either one of the
+names in GEOCODER_BACKENDS or a dotted path to a GeocodeProvider subclass.
+Each backend lives in its own module and is imported only when it is
+configured, so the web and worker processes never pay for the HTTP client,
+KD-tree or polygon code of a backend they do not use.
+
+Backends do their expensive setup (loading boundaries, building trees) on
+the first resolve; GeocodeProvider.warm_up() runs it ahead of time, in
+every Celery worker process (GEOCODER_WORKER_WARM_UP) and optionally at web
+start (GEOCODER_WARM_UP).
+"""
+
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+GEOCODER_BACKENDS = {
+    "vector_polygon": "tax_service.geocoders.vector_polygon.VectorPolygonProvider",
+    "nominatim": "tax_service.geocoders.nominatim.NominatimProvider",
+    "local_nys": "tax_service.geocoders.local_nys.LocalNYSProvider",
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class GeocodeResult:
+    def __init__(
+        self,
+        state,
+        county,
+        locality,
+        raw_response,
+        lat_rounded,
+        lon_rounded,
+        special_districts=None,
+    ):
+        self.state = state
+        self.county = county
+        self.locality = locality
+        self.raw_response = raw_response
+        self.lat_rounded = lat_rounded
+        self.lon_rounded = lon_rounded
+        self.special_districts = special_districts or []
+
+
+class GeocodeProvider:
+    provider_name = "unknown"
+
+    def resolve(self, lat: float, lon: float) -> GeocodeResult:
+        raise NotImplementedError("Subclasses must implement resolve")
+
+    async def aresolve(self, lat: float, lon: float) -> GeocodeResult:
+        """
+        Async interface used by the ASGI order path. The default runs the
+        (CPU-bound) sync resolve in the thread pool so the event loop stays free.
+        """
+        return await sync_to_async(self.resolve, thread_sensitive=False)(lat, lon)
+
+    def resolve_many(self, points):
+        """
+        GeocodeResults for a list of (lat, lon), in order. Backends that can
+        answer a batch in one call (local_nys) override this.
+        """
+        return [self.resolve(lat, lon) for lat, lon in points]
+
+    def warm_up(self):
+        """
+        Load whatever the first resolve would otherwise load.
+        """
+
+
+def provider_class(name=None):
+    name = name or settings.GEOCODER_BACKEND
+    path = GEOCODER_BACKENDS.get(name, name)
+    try:
+        cls = import_string(path)
+    except ImportError as e:
+        raise ImproperlyConfigured(f"Cannot load geocoder backend {name!r}: {e}")
+    if not (isinstance(cls, type) and issubclass(cls, GeocodeProvider)):
+        raise ImproperlyConfigured(f"{path} is not a GeocodeProvider")
+    return cls
+
+
+def get_geocoder(name=None):
+    """
+    The shared provider instance for a backend (default: GEOCODER_BACKEND).
+    """
+    name = name or settings.GEOCODER_BACKEND
+    provider = _instances.get(name)
+    if provider is None:
+        with _instances_lock:
+            provider = _instances.get(name)
+            if provider is None:
+                provider = _instances[name] = provider_class(name)()
+    return provider
+
+
+def __getattr__(name):
+    # `from tax_service.geocoders import VectorPolygonProvider` still works,
+    # importing just that backend.
+    for path in GEOCODER_BACKENDS.values():
+        if path.rsplit(".", 1)[1] == name:
+            return import_string(path)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
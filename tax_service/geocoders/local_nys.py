@@ -0,0 +1,123 @@
+"""
+Offline nearest-city geocoder on the reverse_geocoder (GeoNames cities1000)
+KD-tree.
+
+Points are answered in batches: resolve_many() sends a whole import batch
+through one rg.search call, and the county of every matched city comes from
+a table normalized once from the dataset instead of string heuristics on
+every lookup. warm_up() (run at worker start) builds the tree and the table.
+"""
+
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+import reverse_geocoder as rg
+
+from . import GeocodeProvider, GeocodeResult
+
+# The KD-Tree dataset frequently leaves admin2 blank for NYC boroughs.
+NYC_BOROUGH_COUNTIES = {
+    "New York City": "New York County",
+    "New York": "New York County",
+    "Manhattan": "New York County",
+    "Brooklyn": "Kings County",
+    "Queens": "Queens County",
+    "Bronx": "Bronx County",
+    "Staten Island": "Richmond County",
+}
+
+
+def normalize_county(admin1, admin2, name):
+    if not admin2:
+        return NYC_BOROUGH_COUNTIES.get(name, "Unknown County")
+    # Normalize "Kings" -> "Kings County" to strictly match DB seed
+    if "County" not in admin2 and admin1 == "New York":
+        return f"{admin2} County"
+    return admin2
+
+
+class LocalNYSProvider(GeocodeProvider):
+    provider_name = "local_nys"
+
+    # (admin1, admin2, name) -> normalized county, shared by all instances
+    _counties = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _load(cls):
+        """
+        Build the KD-tree (mode=1: single process, Celery daemons cannot
+        spawn children) and the county table for the US cities in it.
+        """
+        if cls._counties is None:
+            with cls._lock:
+                if cls._counties is None:
+                    geocoder = rg.RGeocoder(mode=1, verbose=False)
+                    cls._counties = {
+                        (loc["admin1"], loc["admin2"], loc["name"]): normalize_county(
+                            loc["admin1"], loc["admin2"], loc["name"]
+                        )
+                        for loc in geocoder.locations
+                        if loc["cc"] == "US"
+                    }
+        return cls._counties
+
+    def warm_up(self):
+        self._load()
+
+    def resolve(self, lat: float, lon: float) -> GeocodeResult:
+        return self.resolve_many([(lat, lon)])[0]
+
+    def resolve_many(self, points):
+        if not points:
+            return []
+        counties = self._load()
+        # Search the rounded point, like the other providers, so every point
+        # in a ~11m cell gets the same city (see utils/spatial.py).
+        rounded = [
+            (
+                Decimal(str(lat)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP),
+                Decimal(str(lon)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP),
+            )
+            for lat, lon in points
+        ]
+        # Search returns one dictionary per point. For example:
+        # {'lat': '41.92704', 'lon': '-73.99736', 'name': 'Kingston', 'admin1': 'New York', 'admin2': 'Ulster County', 'cc': 'US'}
+        matches = rg.search(
+            [(float(lat), float(lon)) for lat, lon in rounded], mode=1, verbose=False
+        )
+
+        results = []
+        for (lat_rounded, lon_rounded), match in zip(rounded, matches):
+            if not match:
+                results.append(
+                    GeocodeResult(
+                        state="Unknown State",
+                        county="Unknown County",
+                        locality="Unknown Locality",
+                        raw_response={"match": {}},
+                        lat_rounded=lat_rounded,
+                        lon_rounded=lon_rounded,
+                    )
+                )
+                continue
+
+            state = match.get("admin1", "Unknown State")
+            locality = match.get("name", "Unknown Locality")
+            admin2 = match.get("admin2", "")
+            key = (state, admin2, locality)
+            county = counties.get(key)
+            if county is None:
+                # Outside the US: not precomputed
+                county = normalize_county(*key)
+            results.append(
+                GeocodeResult(
+                    state=state,
+                    county=county,
+                    locality=locality,
+                    raw_response={"match": dict(match)},
+                    lat_rounded=lat_rounded,
+                    lon_rounded=lon_rounded,
+                )
+            )
+        return results
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import requests
+from django.conf import settings
+
+from ..models import GeocodeCache
+from . import GeocodeProvider, GeocodeResult
+
+
+class NominatimProvider(GeocodeProvider):
+    provider_name = "nominatim"
+
+    def __init__(self, url=None, min_interval=None):
+        # settings.NOMINATIM_URL can point at `python manage.py fake_nominatim`
+        self.url = url or settings.NOMINATIM_URL
+        self.min_interval = (
+            settings.NOMINATIM_MIN_INTERVAL if min_interval is None else min_interval
+        )
+
+    def resolve(self, lat: float, lon: float) -> GeocodeResult:
+        # Round to 4 decimal places (approx 11m precision)
+        lat_rounded = Decimal(str(lat)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+        lon_rounded = Decimal(str(lon)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+
+        cache_key = f"{self.provider_name}_{lat_rounded}_{lon_rounded}"
+
+        # 1. Check Local DB Cache
+        cached = GeocodeCache.objects.filter(cache_key=cache_key).first()
+        if cached:
+            return GeocodeResult(
+                state=cached.state,
+                county=cached.county,
+                locality=cached.locality,
+                raw_response=cached.raw_response,
+                lat_rounded=lat_rounded,
+                lon_rounded=lon_rounded,
+            )
+
+        # 2. Hard Rate Limit for single requests (Simplistic sleep to respect 1 req/sec)
+        # Note: In a true highly-concurrent API, you replace this with Redis-backed rate limiting.
+        time.sleep(self.min_interval)
+
+        headers = {"User-Agent": "NYSTaxCalculator/1.0 (denischernokur@example.com)"}
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "format": "json",
+            "zoom": 18,
+            "addressdetails": 1,
+        }
+
+        # 3. Call Nominatim
+        response = requests.get(self.url, params=params, headers=headers, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        result = self._parse_response(data, lat_rounded, lon_rounded)
+
+        # 5. Save to Cache
+        GeocodeCache.objects.create(
+            cache_key=cache_key,
+            provider=self.provider_name,
+            lat_rounded=lat_rounded,
+            lon_rounded=lon_rounded,
+            state=result.state,
+            county=result.county,
+            locality=result.locality,
+            raw_response=result.raw_response,
+        )
+
+        return result
+
+    def _parse_response(self, data, lat_rounded, lon_rounded) -> GeocodeResult:
+        address = data.get("address", {})
+
+        # 4. Normalize extraction
+        # Nominatim returns varying keys for locality/city
+        state = address.get("state", "")
+        county = address.get("county", "")
+        locality = (
+            address.get("city")
+            or address.get("town")
+            or address.get("village")
+            or address.get("hamlet")
+        )
+
+        if not state:
+            # Maybe outside US or ocean
+            state = "UNKNOWN"
+            county = "UNKNOWN"
+
+        return GeocodeResult(
+            state=state,
+            county=county,
+            locality=locality,
+            raw_response=data,
+            lat_rounded=lat_rounded,
+            lon_rounded=lon_rounded,
+        )
+
+    async def aresolve(self, lat: float, lon: float) -> GeocodeResult:
+        """
+        Non-blocking variant: async ORM for the cache, asyncio.sleep for the
+        rate limit and the HTTP call in a worker thread.
+        """
+        lat_rounded = Decimal(str(lat)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+        lon_rounded = Decimal(str(lon)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+
+        cache_key = f"{self.provider_name}_{lat_rounded}_{lon_rounded}"
+
+        cached = await GeocodeCache.objects.filter(cache_key=cache_key).afirst()
+        if cached:
+            return GeocodeResult(
+                state=cached.state,
+                county=cached.county,
+                locality=cached.locality,
+                raw_response=cached.raw_response,
+                lat_rounded=lat_rounded,
+                lon_rounded=lon_rounded,
+            )
+
+        await asyncio.sleep(self.min_interval)
+
+        headers = {"User-Agent": "NYSTaxCalculator/1.0 (denischernokur@example.com)"}
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "format": "json",
+            "zoom": 18,
+            "addressdetails": 1,
+        }
+        response = await asyncio.to_thread(
+            requests.get, self.url, params=params, headers=headers, timeout=10
+        )
+        response.raise_for_status()
+        result = self._parse_response(response.json(), lat_rounded, lon_rounded)
+
+        await GeocodeCache.objects.aupdate_or_create(
+            cache_key=cache_key,
+            defaults=dict(
+                provider=self.provider_name,
+                lat_rounded=lat_rounded,
+                lon_rounded=lon_rounded,
+                state=result.state,
+                county=result.county,
+                locality=result.locality,
+                raw_response=result.raw_response,
+            ),
+        )
+
+        return result
@@ -0,0 +1,87 @@
+import json
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+
+from ..utils.boundaries import BoundaryIndex, BoundaryLayer
+from . import GeocodeProvider, GeocodeResult
+
+logger = logging.getLogger(__name__)
+
+
+class VectorPolygonProvider(GeocodeProvider):
+    """
+    100% Offline geocoder. Визначає штат, округ, місто та спеціальні
+    податкові округи (напр. MCTD) за координатами через ієрархічний
+    point-in-polygon пошук по шарах GeoJSON (settings.BOUNDARY_LAYERS).
+    Не потребує зовнішніх API чи додаткових C-бібліотек.
+    """
+
+    provider_name = "vector_polygon"
+    _index_cache = None  # Синглтон — завантажується один раз
+
+    @classmethod
+    def _load_index(cls):
+        """
+        Boundary layers from settings.BOUNDARY_LAYERS, indexed per parent
+        jurisdiction. Prebuilt trees (python manage.py build_boundary_index)
+        are loaded from BOUNDARY_INDEX_DIR, missing ones are built on first use.
+        """
+        if cls._index_cache is None:
+            layers = []
+            for config in settings.BOUNDARY_LAYERS:
+                config = dict(config)
+                path = config.pop("path")
+                with open(path, "r") as f:
+                    layer = BoundaryLayer(geojson_data=json.load(f), **config)
+                layers.append(layer)
+                logger.info(
+                    f"Loaded {len(layer.features)} {layer.level} boundaries from {path}"
+                )
+            cls._index_cache = BoundaryIndex(
+                layers, index_dir=getattr(settings, "BOUNDARY_INDEX_DIR", None)
+            )
+        return cls._index_cache
+
+    def warm_up(self):
+        self._load_index()
+
+    def resolve(self, lat: float, lon: float) -> GeocodeResult:
+        lat_rounded = Decimal(str(lat)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+        lon_rounded = Decimal(str(lon)).quantize(
+            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        )
+
+        stack = self._load_index().lookup(float(lon_rounded), float(lat_rounded))
+
+        if stack:
+            county = stack.features["county"]
+            raw_response = {
+                "feature": {"name": stack.county, "geoid": county.get("geoid", "")}
+            }
+            if stack.locality:
+                raw_response["locality"] = stack.features["locality"]
+            if stack.special_districts:
+                raw_response["special_districts"] = stack.special_districts
+            return GeocodeResult(
+                state=stack.state,
+                county=stack.county,
+                locality=stack.locality,
+                raw_response=raw_response,
+                lat_rounded=lat_rounded,
+                lon_rounded=lon_rounded,
+                special_districts=stack.special_districts,
+            )
+
+        # Координати поза всіма округами → 0% податок (no nexus)
+        return GeocodeResult(
+            state="Out of State",
+            county="",
+            locality=None,
+            raw_response={"error": "Point not within any county polygon"},
+            lat_rounded=lat_rounded,
+            lon_rounded=lon_rounded,
+        )
@@ -0,0 +1,238 @@
+"""
+Idempotency-Key support for order creation.
+
+The first request with a key inserts an IdempotencyKey row in PROCESSING
+state before any geocoding or tax work, so among concurrent duplicates only
+the one that wins the unique insert computes the order. Its response is
+then stored on the row and cached in Redis for IDEMPOTENCY_CACHE_SECONDS,
+unless it is transient (5xx, or a retry-later 409), in which case the claim
+is dropped and the next retry runs again:
+
+- a repeat is answered from Redis, falling back to the row;
+- a duplicate arriving while the first request is still running polls for
+  its result for up to IDEMPOTENCY_WAIT_SECONDS, then gets 409;
+- reusing a key with a different request body gets 422;
+- a PROCESSING row older than IDEMPOTENCY_LOCK_SECONDS (its owner died) is
+  taken over, and rows older than IDEMPOTENCY_KEY_TTL_HOURS are treated as
+  expired (purge them with `python manage.py purge_idempotency_keys`).
+
+Redis is only a fast path; without it (IDEMPOTENCY_REDIS_URL empty or
+unreachable) the row alone gives the same guarantees.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Retry-later answers (e.g. 409 while the external_id's order is still
+# being written); like 5xx they are never stored against the key
+TRANSIENT_STATUSES = (
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+)
+# Pause between checks while a duplicate waits for the in-flight request
+POLL_INTERVAL = 0.05
+# After a Redis error the cache is skipped for this many seconds
+REDIS_RETRY_SECONDS = 30
+
+_redis_client = None
+_redis_down_until = 0.0
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = f"{HEADER} was already used with a different request body."
+    default_code = "idempotency_key_reused"
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = f"A request with this {HEADER} is still being processed."
+    default_code = "idempotency_key_in_progress"
+
+
+class StoredResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+
+def request_fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------- redis
+def _redis():
+    global _redis_client
+    if not settings.IDEMPOTENCY_REDIS_URL or time.monotonic() < _redis_down_until:
+        return None
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(
+            settings.IDEMPOTENCY_REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+    return _redis_client
+
+
+def _redis_failed(error):
+    global _redis_down_until
+    logger.warning(
+        f"Idempotency cache unavailable ({error}), "
+        f"using the database for {REDIS_RETRY_SECONDS}s"
+    )
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+def _cache_key(key):
+    return f"idempotency:{key}"
+
+
+def _cache_get(key):
+    client = _redis()
+    if client is None:
+        return None
+    try:
+        raw = client.get(_cache_key(key))
+    except Exception as e:
+        _redis_failed(e)
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _cache_set(record):
+    client = _redis()
+    if client is None:
+        return
+    value = {
+        "fingerprint": record.request_hash,
+        "status": record.response_status,
+        "body": record.response_body,
+    }
+    try:
+        client.set(
+            _cache_key(record.key),
+            json.dumps(value, cls=DjangoJSONEncoder),
+            ex=settings.IDEMPOTENCY_CACHE_SECONDS,
+        )
+    except Exception as e:
+        _redis_failed(e)
+
+
+# ------------------------------------------------------------------- claims
+def _take_over(record, fingerprint, now):
+    """
+    Claim an expired or abandoned row. The conditional update makes sure
+    only one of several waiting duplicates wins.
+    """
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, locked_at=record.locked_at, status=record.status
+    ).update(
+        request_hash=fingerprint,
+        status="PROCESSING",
+        response_status=None,
+        response_body=None,
+        created_at=now,
+        locked_at=now,
+    )
+    if taken:
+        record.refresh_from_db()
+        return record
+    return None
+
+
+def claim(key, fingerprint):
+    """
+    Returns (record, None) when this request owns the key and must do the
+    work, or (None, StoredResponse) when it should replay a stored response.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        cached = _cache_get(key)
+        if cached is not None:
+            if cached["fingerprint"] != fingerprint:
+                raise KeyReused()
+            return None, StoredResponse(cached["status"], cached["body"])
+
+        now = timezone.now()
+        record, created = IdempotencyKey.objects.get_or_create(
+            key=key, defaults={"request_hash": fingerprint, "locked_at": now}
+        )
+        if created:
+            return record, None
+
+        expired = record.created_at < now - timedelta(
+            hours=settings.IDEMPOTENCY_KEY_TTL_HOURS
+        )
+        abandoned = record.status == "PROCESSING" and record.locked_at < now - timedelta(
+            seconds=settings.IDEMPOTENCY_LOCK_SECONDS
+        )
+        if expired or abandoned:
+            owned = _take_over(record, fingerprint, now)
+            if owned is not None:
+                return owned, None
+            continue
+
+        if record.request_hash != fingerprint:
+            raise KeyReused()
+        if record.status == "COMPLETED":
+            _cache_set(record)
+            return None, StoredResponse(record.response_status, record.response_body)
+
+        if time.monotonic() >= deadline:
+            raise RequestInProgress()
+        time.sleep(POLL_INTERVAL)
+
+
+def is_final(status_code):
+    """
+    Whether a response may be replayed for the key: successes and
+    deterministic client errors, not 5xx or retry-later conflicts.
+    """
+    return status_code < 500 and status_code not in TRANSIENT_STATUSES
+
+
+def complete(record, status_code, body):
+    """
+    Store the response for replay, or release the claim when the response
+    is transient so a retry with the same key runs the request again.
+    """
+    if not is_final(status_code):
+        release(record)
+        return
+    record.status = "COMPLETED"
+    record.response_status = status_code
+    record.response_body = body
+    record.save(update_fields=["status", "response_status", "response_body"])
+    _cache_set(record)
+
+
+def release(record):
+    """
+    The owner failed: drop the claim so a retry runs the request again.
+    """
+    IdempotencyKey.objects.filter(pk=record.pk, status="PROCESSING").delete()
+
+
+def purge_expired(now=None):
+    cutoff = (now or timezone.now()) - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,532 @@
+"""
+End-to-end load generation against a running instance.
+
+`python manage.py loadtest` replays a mix of traffic for --duration seconds:
+
+- order streams (POST /api/orders/, the async path or either quote path)
+  from a configurable geographic distribution, optionally paced to a target
+  request rate;
+- concurrent CSV uploads of mixed sizes, each followed until its ImportJob
+  finishes, for import rows/sec;
+- dashboard pollers (summary with If-None-Match, plus the changes feed).
+
+The report has p50/p95/p99 and error rates per endpoint, import throughput,
+and the Postgres / Redis operations the run caused (pg_stat_database and
+INFO deltas, read through this project's DATABASES and --redis-url, so run it
+with the same settings as the instance under test).
+
+FakeNominatim (`python manage.py fake_nominatim`) stands in for the public
+Nominatim API, with configurable latency, errors and a 429 rate limit; point
+NOMINATIM_URL at it and use GEOCODER_BACKEND=nominatim. docker-compose
+provides Postgres and Redis, and the fake under the "loadtest" profile.
+"""
+
+import itertools
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
+
+from .utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# --order-endpoint choice: (report name, path). Quotes rate without saving,
+# so they isolate the request path from the order write.
+ORDER_ENDPOINTS = {
+    "sync": ("orders", "/api/orders/"),
+    "async": ("async_orders", "/api/async/orders/"),
+    "sync-quote": ("order_quote", "/api/orders/quote/"),
+    "async-quote": ("async_order_quote", "/api/async/orders/quote/"),
+}
+# Multi-endpoint choices; each request picks one of them at random.
+ORDER_ENDPOINT_GROUPS = {
+    "both": ["sync", "async"],
+    "all": list(ORDER_ENDPOINTS),
+}
+IMPORT_URL = "/api/orders/import_csv/"
+IMPORT_STATUS_URL = "/api/imports/{id}/"
+SUMMARY_URL = "/api/dashboard/summary/"
+CHANGES_URL = "/api/orders/changes/"
+
+# Seconds between ImportJob status checks while an upload is followed
+IMPORT_POLL_INTERVAL = 1.0
+
+# lat_min, lat_max, lon_min, lon_max
+NYS_BOUNDS = (40.5, 45.0, -79.7, -72.0)
+# New Jersey / Pennsylvania, clear of the NYS border
+OUT_OF_STATE_BOUNDS = (39.0, 40.4, -75.5, -74.2)
+
+# (lat, lon, spread in degrees, weight)
+GEO_CLUSTERS = {
+    "cities": [
+        (40.7128, -74.0060, 0.08, 55),  # New York City
+        (40.7891, -73.1350, 0.25, 15),  # Long Island
+        (41.0339, -73.7629, 0.10, 6),  # Westchester
+        (42.8864, -78.8784, 0.08, 6),  # Buffalo
+        (43.1566, -77.6088, 0.08, 5),  # Rochester
+        (43.0481, -76.1474, 0.06, 4),  # Syracuse
+        (42.6526, -73.7562, 0.06, 4),  # Albany
+    ],
+    "nyc": [
+        (40.7831, -73.9712, 0.03, 30),  # Manhattan
+        (40.6782, -73.9442, 0.05, 30),  # Brooklyn
+        (40.7282, -73.7949, 0.06, 25),  # Queens
+        (40.8448, -73.8648, 0.04, 10),  # Bronx
+        (40.5795, -74.1502, 0.04, 5),  # Staten Island
+    ],
+}
+GEO_DISTRIBUTIONS = ("uniform", *GEO_CLUSTERS)
+
+
+class GeoDistribution:
+    """
+    Order coordinates: uniform over NYS or gaussian clusters around
+    population centres, with a share of out-of-state deliveries.
+    """
+
+    def __init__(self, name="cities", out_of_state=0.0):
+        self.clusters = GEO_CLUSTERS.get(name)
+        self.out_of_state = out_of_state
+        if self.clusters:
+            self.weights = list(itertools.accumulate(c[3] for c in self.clusters))
+
+    def sample(self, rng):
+        if rng.random() < self.out_of_state:
+            return self._uniform(rng, OUT_OF_STATE_BOUNDS)
+        if not self.clusters:
+            return self._uniform(rng, NYS_BOUNDS)
+        lat, lon, spread, _ = rng.choices(self.clusters, cum_weights=self.weights)[0]
+        return round(rng.gauss(lat, spread), 6), round(rng.gauss(lon, spread), 6)
+
+    @staticmethod
+    def _uniform(rng, bounds):
+        lat_min, lat_max, lon_min, lon_max = bounds
+        return round(rng.uniform(lat_min, lat_max), 6), round(rng.uniform(lon_min, lon_max), 6)
+
+
+def order_payload(rng, geo):
+    lat, lon = geo.sample(rng)
+    # Basket sizes are long-tailed: mostly small, a few large orders
+    subtotal = min(rng.lognormvariate(3.7, 0.8), 5000)
+    return {"lat": lat, "lon": lon, "subtotal": f"{subtotal:.2f}"}
+
+
+def make_csv(rng, geo, rows, prefix):
+    """
+    An import file with unique external ids, so uploads are never deduplicated.
+    """
+    now = datetime.now()
+    lines = ["external_id,lat,lon,subtotal,timestamp"]
+    for i in range(rows):
+        payload = order_payload(rng, geo)
+        stamp = now - timedelta(seconds=rng.randint(0, 30 * 86400))
+        lines.append(
+            f"{prefix}-{i},{payload['lat']},{payload['lon']},{payload['subtotal']},"
+            f"{stamp.isoformat(timespec='seconds')}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# ------------------------------------------------------------------ recording
+class Recorder:
+    """
+    Thread-safe latency and status samples per endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency, status))
+
+    def summary(self, elapsed):
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [latency for latency, _ in samples]
+            errors = sum(1 for _, status in samples if status is None or status >= 400)
+            statuses = {}
+            for _, status in samples:
+                key = str(status or "error")
+                statuses[key] = statuses.get(key, 0) + 1
+            report[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": errors / len(samples),
+                "rps": len(samples) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "statuses": statuses,
+            }
+        return report
+
+
+def database_counters():
+    """
+    Cumulative pg_stat_database counters of the configured database, or
+    None on backends without them.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    fields = (
+        "xact_commit",
+        "xact_rollback",
+        "tup_returned",
+        "tup_fetched",
+        "tup_inserted",
+        "tup_updated",
+        "tup_deleted",
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(fields)} FROM pg_stat_database "
+            "WHERE datname = current_database()"
+        )
+        return dict(zip(fields, cursor.fetchone()))
+
+
+def redis_counters(url):
+    """
+    Total and per-command call counts of the Redis server at url, or None.
+    """
+    if not url:
+        return None
+    import redis
+
+    try:
+        client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        stats = client.info("stats")
+        commands = client.info("commandstats")
+    except redis.RedisError as e:
+        logger.warning(f"Redis counters unavailable ({e})")
+        return None
+    counters = {"total": stats["total_commands_processed"]}
+    for name, values in commands.items():
+        counters[name.removeprefix("cmdstat_")] = values["calls"]
+    return counters
+
+
+def counter_delta(before, after):
+    if before is None or after is None:
+        return None
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+# ------------------------------------------------------------------ load test
+class LoadTest:
+    def __init__(
+        self,
+        base_url,
+        duration=60.0,
+        geo=None,
+        order_endpoint="sync",
+        order_concurrency=10,
+        order_rate=None,
+        uploads=0,
+        upload_rows=(1000,),
+        upload_concurrency=2,
+        import_timeout=600.0,
+        pollers=0,
+        poll_interval=5.0,
+        seed=42,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.duration = duration
+        self.geo = geo or GeoDistribution()
+        self.order_paths = [
+            ORDER_ENDPOINTS[name]
+            for name in ORDER_ENDPOINT_GROUPS.get(order_endpoint, [order_endpoint])
+        ]
+        self.order_concurrency = order_concurrency
+        self.order_rate = order_rate
+        self.uploads = uploads
+        self.upload_rows = list(upload_rows)
+        self.upload_concurrency = upload_concurrency
+        self.import_timeout = import_timeout
+        self.pollers = pollers
+        self.poll_interval = poll_interval
+        self.seed = seed
+        self.run_id = uuid.uuid4().hex[:8]
+        self.recorder = Recorder()
+        self.imports = []
+        self._imports_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        import requests
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _request(self, endpoint, method, path, **kwargs):
+        import requests
+
+        started = time.perf_counter()
+        try:
+            response = self._session().request(
+                method, self.base_url + path, timeout=120, **kwargs
+            )
+        except requests.RequestException:
+            self.recorder.record(endpoint, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - started, response.status_code)
+        return response
+
+    # --------------------------------------------------------------- workers
+    def _orders(self, worker, deadline):
+        rng = random.Random(f"{self.seed}-order-{worker}")
+        interval = self.order_concurrency / self.order_rate if self.order_rate else 0
+        next_at = time.monotonic() + rng.uniform(0, interval)
+        while time.monotonic() < deadline:
+            if interval:
+                pause = next_at - time.monotonic()
+                if pause > 0:
+                    time.sleep(pause)
+                next_at += interval
+            endpoint, path = rng.choice(self.order_paths)
+            self._request(endpoint, "POST", path, json=order_payload(rng, self.geo))
+
+    def _poller(self, worker, deadline):
+        etag = None
+        cursor = None
+        while time.monotonic() < deadline:
+            headers = {"If-None-Match": etag} if etag else {}
+            response = self._request("dashboard_summary", "GET", SUMMARY_URL, headers=headers)
+            if response is not None and response.status_code == 200:
+                etag = response.headers.get("ETag")
+
+            params = {"since": cursor} if cursor else {}
+            response = self._request("order_changes", "GET", CHANGES_URL, params=params)
+            if response is not None and response.status_code == 200:
+                cursor = response.json().get("next_cursor", cursor)
+            time.sleep(self.poll_interval)
+
+    def _upload(self, index):
+        rng = random.Random(f"{self.seed}-upload-{index}")
+        rows = self.upload_rows[index % len(self.upload_rows)]
+        content = make_csv(rng, self.geo, rows, f"lt-{self.run_id}-{index}")
+        started = time.monotonic()
+        response = self._request(
+            "import_csv",
+            "POST",
+            IMPORT_URL,
+            files={"file": (f"loadtest-{self.run_id}-{index}.csv", content, "text/csv")},
+        )
+        result = {"rows": rows, "status": "UPLOAD_FAILED"}
+        if response is not None and response.status_code < 400:
+            job = self._follow(response.json()["id"], started)
+            result.update(job)
+        with self._imports_lock:
+            self.imports.append(result)
+
+    def _follow(self, job_id, started):
+        path = IMPORT_STATUS_URL.format(id=job_id)
+        deadline = started + self.import_timeout
+        job = {}
+        while time.monotonic() < deadline:
+            response = self._request("import_status", "GET", path)
+            if response is not None and response.status_code == 200:
+                job = response.json()
+                if job["status"] in ("COMPLETED", "FAILED"):
+                    break
+            time.sleep(IMPORT_POLL_INTERVAL)
+        else:
+            return {"id": job_id, "status": "TIMEOUT"}
+
+        processing = None
+        if job.get("started_at") and job.get("finished_at"):
+            processing = (
+                datetime.fromisoformat(job["finished_at"])
+                - datetime.fromisoformat(job["started_at"])
+            ).total_seconds()
+        return {
+            "id": job_id,
+            "status": job["status"],
+            "processed_rows": job.get("processed_rows", 0),
+            "failed_rows": job.get("failed_rows", 0),
+            "processing_seconds": processing,
+            "end_to_end_seconds": time.monotonic() - started,
+        }
+
+    def _uploads(self, queue):
+        while True:
+            with self._imports_lock:
+                index = next(queue, None)
+            if index is None:
+                return
+            self._upload(index)
+
+    # ------------------------------------------------------------------ run
+    def run(self, redis_url=None):
+        db_before = database_counters()
+        redis_before = redis_counters(redis_url)
+
+        started = time.monotonic()
+        deadline = started + self.duration
+        threads = [
+            threading.Thread(target=self._orders, args=(i, deadline), daemon=True)
+            for i in range(self.order_concurrency)
+        ]
+        threads += [
+            threading.Thread(target=self._poller, args=(i, deadline), daemon=True)
+            for i in range(self.pollers)
+        ]
+        queue = iter(range(self.uploads))
+        threads += [
+            threading.Thread(target=self._uploads, args=(queue,), daemon=True)
+            for _ in range(min(self.upload_concurrency, self.uploads))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        # pg_stat counters are flushed by backends up to a second late
+        time.sleep(1)
+        return {
+            "elapsed_seconds": elapsed,
+            "endpoints": self.recorder.summary(min(elapsed, self.duration)),
+            "imports": self._import_summary(),
+            "database": counter_delta(db_before, database_counters()),
+            "redis": counter_delta(redis_before, redis_counters(redis_url)),
+        }
+
+    def _import_summary(self):
+        done = [job for job in self.imports if job["status"] == "COMPLETED"]
+        rates = [
+            job["processed_rows"] / job["processing_seconds"]
+            for job in done
+            if job.get("processing_seconds")
+        ]
+        statuses = {}
+        for job in self.imports:
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "jobs": len(self.imports),
+            "statuses": statuses,
+            "rows": sum(job.get("processed_rows", 0) for job in done),
+            "failed_rows": sum(job.get("failed_rows", 0) for job in done),
+            "rows_per_second_median": statistics.median(rates) if rates else 0.0,
+            "rows_per_second_total": (
+                sum(job["processed_rows"] for job in done)
+                / max(job["end_to_end_seconds"] for job in done)
+                if done
+                else 0.0
+            ),
+            "jobs_detail": self.imports,
+        }
+
+
+# ---------------------------------------------------------- fake Nominatim
+class FakeNominatim(ThreadingHTTPServer):
+    """
+    Answers GET /reverse like Nominatim (format=json, addressdetails=1),
+    resolving points with the offline vector_polygon backend. Every response
+    waits latency_ms +/- jitter_ms; beyond rate_limit requests/sec (0 = no
+    limit) it answers 429, and error_rate of requests fail with 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=200, jitter_ms=50, rate_limit=0, error_rate=0.0):
+        super().__init__(address, _NominatimHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.stats = {"served": 0, "throttled": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit)
+        self._refilled = time.monotonic()
+        self._rng = random.Random()
+
+    def admit(self):
+        """
+        'ok', 'throttled' or 'failed' for the next request (token bucket).
+        """
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit
+                )
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return "throttled"
+                self._tokens -= 1
+            if self._rng.random() < self.error_rate:
+                self.stats["failed"] += 1
+                return "failed"
+            self.stats["served"] += 1
+            return "ok"
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    @staticmethod
+    def lookup(lat, lon):
+        from .geocoders import get_geocoder
+
+        result = get_geocoder("vector_polygon").resolve(lat, lon)
+        if not result.county:
+            return {"error": "Unable to geocode"}
+        address = {"state": result.state, "county": result.county, "country_code": "us"}
+        if result.locality:
+            address["city"] = result.locality
+        return {
+            "lat": str(lat),
+            "lon": str(lon),
+            "display_name": ", ".join(
+                filter(None, [result.locality, result.county, result.state])
+            ),
+            "address": address,
+        }
+
+
+class _NominatimHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/reverse":
+            return self._send(404, {"error": "Not found"})
+        time.sleep(self.server.delay())
+
+        outcome = self.server.admit()
+        if outcome == "throttled":
+            return self._send(429, {"error": "Too many requests"})
+        if outcome == "failed":
+            return self._send(500, {"error": "Internal error"})
+
+        query = parse_qs(url.query)
+        try:
+            lat, lon = float(query["lat"][0]), float(query["lon"][0])
+        except (KeyError, ValueError):
+            return self._send(400, {"error": "lat and lon are required"})
+        self._send(200, self.server.lookup(lat, lon))
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
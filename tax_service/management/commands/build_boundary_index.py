@@ -0,0 +1,55 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tax_service.geocoders.vector_polygon import VectorPolygonProvider
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the per-group boundary quadtrees used by VectorPolygonProvider "
+        "for every layer in settings.BOUNDARY_LAYERS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.BOUNDARY_INDEX_DIR,
+            help="Directory to write the binary index artifacts to",
+        )
+        parser.add_argument(
+            "--max-depth",
+            type=int,
+            default=10,
+            help="Maximum subdivision depth for cells crossed by a boundary",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete artifacts that no longer match any boundary group",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        started = time.monotonic()
+        index = VectorPolygonProvider._load_index()
+        index.index_dir = None  # always rebuild, never reuse stale artifacts
+        index.max_depth = options["max_depth"]
+        paths = index.save_artifacts(output)
+        elapsed = time.monotonic() - started
+
+        if options["prune"]:
+            keep = {os.path.basename(p) for p in paths}
+            for name in os.listdir(output):
+                if name.endswith(".qtree") and name not in keep:
+                    os.remove(os.path.join(output, name))
+                    self.stdout.write(f"Removed stale {name}")
+
+        size = sum(os.path.getsize(p) for p in paths)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built {len(paths)} boundary trees for {index.group_count} groups "
+                f"in {elapsed:.1f}s ({size} bytes) -> {output}"
+            )
+        )
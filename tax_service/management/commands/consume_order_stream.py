@@ -0,0 +1,107 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tax_service.utils.stats import percentile
+from tax_service.streams import StreamConsumer, entry_age_ms, get_stream_client
+
+# Seconds between throughput/latency log lines
+REPORT_INTERVAL = 10
+# Pause after a failed batch before trying again
+ERROR_BACKOFF = 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Consumes order events from a Redis Stream as part of a consumer group, "
+        "inserting them in micro-batches; run more processes to scale out"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--redis-url", default=None)
+        parser.add_argument("--stream", default=None, help="Default: ORDER_STREAM_KEY")
+        parser.add_argument("--group", default=None, help="Default: ORDER_STREAM_GROUP")
+        parser.add_argument("--consumer", default=None, help="Default: <hostname>:<pid>")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--window-ms", type=int, default=None)
+        parser.add_argument("--claim-idle-ms", type=int, default=None)
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Exit after this many non-empty batches (for testing)",
+        )
+
+    def handle(self, *args, **options):
+        consumer = StreamConsumer(
+            get_stream_client(options["redis_url"]),
+            stream=options["stream"],
+            group=options["group"],
+            consumer=options["consumer"],
+            batch_size=options["batch_size"],
+            window_ms=options["window_ms"],
+            claim_idle_ms=options["claim_idle_ms"],
+        )
+        consumer.ensure_group()
+        consumer.service.geocoder.warm_up()
+
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            # Finish (and ack) the current batch, then exit
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(
+            f"Consumer {consumer.consumer} reading {consumer.stream} "
+            f"(group {consumer.group}, batch {consumer.batch_size}, "
+            f"window {consumer.window * 1000:.0f}ms)"
+        )
+        totals = {"written": 0, "duplicates": 0, "dead": 0, "batches": 0}
+        latencies = []
+        reported_at = time.monotonic()
+        while not stopping.is_set():
+            close_old_connections()
+            try:
+                entries, (written, duplicates, dead) = consumer.step()
+            except Exception as e:
+                self.stderr.write(f"Batch failed, entries stay pending: {e}")
+                time.sleep(ERROR_BACKOFF)
+                continue
+            if entries:
+                now = time.time()
+                latencies.extend(entry_age_ms(entry_id, now) for entry_id, _ in entries)
+                totals["written"] += written
+                totals["duplicates"] += duplicates
+                totals["dead"] += dead
+                totals["batches"] += 1
+
+            if time.monotonic() - reported_at >= REPORT_INTERVAL and latencies:
+                self._report(totals, latencies, time.monotonic() - reported_at)
+                latencies = []
+                reported_at = time.monotonic()
+            if options["max_batches"] and totals["batches"] >= options["max_batches"]:
+                break
+
+        if latencies:
+            self._report(totals, latencies, time.monotonic() - reported_at)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stopped: {totals['written']} orders written, {totals['duplicates']} "
+                f"duplicates, {totals['dead']} dead-lettered in {totals['batches']} batches."
+            )
+        )
+
+    def _report(self, totals, latencies, elapsed):
+        self.stdout.write(
+            f"{len(latencies) / elapsed:.0f} entries/s, end-to-end latency "
+            f"p50 {percentile(latencies, 50):.0f}ms p95 {percentile(latencies, 95):.0f}ms "
+            f"p99 {percentile(latencies, 99):.0f}ms; totals: {totals['written']} written, "
+            f"{totals['duplicates']} duplicates, {totals['dead']} dead-lettered"
+        )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from tax_service.loadtest import FakeNominatim
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves a local stand-in for the Nominatim reverse API with configurable "
+        "latency, errors and rate limiting. Point NOMINATIM_URL at "
+        "http://<host>:<port>/reverse and set GEOCODER_BACKEND=nominatim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8088)
+        parser.add_argument("--latency-ms", type=float, default=200.0)
+        parser.add_argument("--jitter-ms", type=float, default=50.0)
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0,
+            help="Requests per second before answering 429 (0 = unlimited; Nominatim allows 1)",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500"
+        )
+
+    def handle(self, *args, **options):
+        server = FakeNominatim(
+            (options["host"], options["port"]),
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            rate_limit=options["rate_limit"],
+            error_rate=options["error_rate"],
+        )
+        server.lookup(40.7128, -74.0060)  # load the boundary index before serving
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fake Nominatim on http://{options['host']}:{options['port']}/reverse"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"served {server.stats['served']}, throttled {server.stats['throttled']}, "
+                f"failed {server.stats['failed']}"
+            )
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tax_service.write_behind import OrderWriteBuffer, RedisBackend
+
+
+class Command(BaseCommand):
+    help = (
+        "Drains every Redis write-behind order buffer, including lists left "
+        "behind by processes that did not shut down cleanly"
+    )
+
+    def handle(self, *args, **options):
+        url = settings.ORDER_WRITE_BEHIND_REDIS_URL
+        total = 0
+        for key in RedisBackend.registered(url):
+            backend = RedisBackend(url, key=key)
+            written = OrderWriteBuffer(
+                backend, max_rows=settings.ORDER_WRITE_BEHIND_MAX_ROWS
+            ).flush()
+            backend.unregister()
+            total += written
+            self.stdout.write(f"{key}: {written} orders written")
+
+        self.stdout.write(self.style.SUCCESS(f"Flushed {total} buffered orders."))
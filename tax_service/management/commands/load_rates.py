@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tax_service.models import RateSet
+from tax_service.rates import RateFileError, activate, load_rates, read_rate_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a versioned rate file (CSV or JSON) as a new rate set and atomically "
+        "makes it the active one; --activate switches back to an older set"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="CSV or JSON rate file")
+        parser.add_argument(
+            "--set-version",
+            dest="rate_version",
+            default=None,
+            help="Version label (default: from the JSON file, else a content hash)",
+        )
+        parser.add_argument(
+            "--no-activate",
+            action="store_true",
+            help="Load the set without switching rating over to it",
+        )
+        parser.add_argument(
+            "--allow-missing-counties",
+            action="store_true",
+            help="Accept a file without a rate for every county boundary",
+        )
+        parser.add_argument(
+            "--activate", dest="activate_version", default=None, help="Activate an existing version"
+        )
+        parser.add_argument("--list", action="store_true", help="List stored rate sets")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for rate_set in RateSet.objects.order_by("-created_at"):
+                marker = "*" if rate_set.is_active else " "
+                self.stdout.write(
+                    f"{marker} {rate_set.version:<30} {rate_set.row_count:>7} rows  "
+                    f"{rate_set.created_at:%Y-%m-%d %H:%M}  {rate_set.source}"
+                )
+            return
+
+        if options["activate_version"]:
+            try:
+                rate_set = activate(options["activate_version"])
+            except RateSet.DoesNotExist:
+                raise CommandError(f"No rate set {options['activate_version']!r}")
+            self.stdout.write(self.style.SUCCESS(f"Rate set {rate_set.version} is now active."))
+            return
+
+        if not options["path"]:
+            raise CommandError("Give a rate file path, --activate VERSION or --list")
+
+        started = time.monotonic()
+        try:
+            records, file_version = read_rate_file(options["path"])
+            rate_set, created = load_rates(
+                records,
+                version=options["rate_version"] or file_version,
+                source=options["path"],
+                activate_set=not options["no_activate"],
+                require_counties=not options["allow_missing_counties"],
+            )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        except RateFileError as e:
+            for error in e.errors:
+                self.stderr.write(error)
+            raise CommandError(f"Rate file rejected ({len(e.errors)} error(s) shown)")
+        elapsed = time.monotonic() - started
+
+        if created:
+            message = f"Loaded {rate_set.row_count} rates as {rate_set.version} in {elapsed:.2f}s"
+        else:
+            message = f"Rates are identical to existing set {rate_set.version}"
+        message += "; active." if rate_set.is_active else "; not active."
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,172 @@
+import json
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tax_service.loadtest import (
+    GEO_DISTRIBUTIONS,
+    ORDER_ENDPOINT_GROUPS,
+    ORDER_ENDPOINTS,
+    FakeNominatim,
+    GeoDistribution,
+    LoadTest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays mixed traffic (orders, CSV imports, dashboard polling) against a "
+        "running instance and reports per-endpoint latency percentiles, error "
+        "rates, import rows/sec and the Postgres/Redis operations it caused"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--duration", type=float, default=60.0, help="Seconds of traffic")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--geo", choices=GEO_DISTRIBUTIONS, default="cities")
+        parser.add_argument(
+            "--out-of-state", type=float, default=0.02, help="Share of orders outside NYS"
+        )
+
+        parser.add_argument(
+            "--order-endpoint",
+            choices=[*ORDER_ENDPOINTS, *ORDER_ENDPOINT_GROUPS],
+            default="sync",
+            help="both = sync and async orders, all = also both quote paths",
+        )
+        parser.add_argument("--order-concurrency", type=int, default=10)
+        parser.add_argument(
+            "--order-rate",
+            type=float,
+            default=None,
+            help="Target orders per second across all workers (default: as fast as possible)",
+        )
+
+        parser.add_argument("--uploads", type=int, default=0, help="CSV imports to submit")
+        parser.add_argument(
+            "--upload-rows",
+            default="1000,20000",
+            help="Comma-separated file sizes in rows, used in rotation",
+        )
+        parser.add_argument("--upload-concurrency", type=int, default=2)
+        parser.add_argument("--import-timeout", type=float, default=600.0)
+
+        parser.add_argument("--pollers", type=int, default=2, help="Dashboard pollers")
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+
+        parser.add_argument(
+            "--redis-url",
+            default=settings.CELERY_BROKER_URL,
+            help="Redis server whose command counts are reported ('' to skip)",
+        )
+        parser.add_argument(
+            "--fake-nominatim-port",
+            type=int,
+            default=None,
+            help="Also serve a fake Nominatim on this port for the duration of the run",
+        )
+        parser.add_argument("--fake-latency-ms", type=float, default=200.0)
+        parser.add_argument("--fake-rate-limit", type=float, default=0)
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+
+    def handle(self, *args, **options):
+        try:
+            upload_rows = [int(n) for n in options["upload_rows"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--upload-rows must be comma-separated integers")
+        if options["uploads"] and not upload_rows:
+            raise CommandError("--upload-rows is empty")
+
+        fake = None
+        if options["fake_nominatim_port"]:
+            fake = FakeNominatim(
+                ("0.0.0.0", options["fake_nominatim_port"]),
+                latency_ms=options["fake_latency_ms"],
+                rate_limit=options["fake_rate_limit"],
+            )
+            threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+        test = LoadTest(
+            options["base_url"],
+            duration=options["duration"],
+            geo=GeoDistribution(options["geo"], options["out_of_state"]),
+            order_endpoint=options["order_endpoint"],
+            order_concurrency=options["order_concurrency"],
+            order_rate=options["order_rate"],
+            uploads=options["uploads"],
+            upload_rows=upload_rows,
+            upload_concurrency=options["upload_concurrency"],
+            import_timeout=options["import_timeout"],
+            pollers=options["pollers"],
+            poll_interval=options["poll_interval"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"Load test {test.run_id} against {test.base_url} for {test.duration:.0f}s"
+        )
+        report = test.run(redis_url=options["redis_url"])
+        if fake is not None:
+            fake.shutdown()
+            report["fake_nominatim"] = fake.stats
+
+        self._print(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['json_path']}")
+
+    def _print(self, report):
+        self.stdout.write(
+            f"\n{'endpoint':<18} {'requests':>9} {'err %':>6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name, stats in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<18} {stats['requests']:>9} {stats['error_rate'] * 100:>6.1f} "
+                f"{stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+                f"{stats['p99_ms']:>8.1f}"
+            )
+            failures = {
+                k: v
+                for k, v in stats["statuses"].items()
+                if k == "error" or int(k) >= 400
+            }
+            if failures:
+                self.stdout.write(f"{'':<18} failures: {failures}")
+
+        imports = report["imports"]
+        if imports["jobs"]:
+            self.stdout.write(
+                f"\nimports: {imports['jobs']} jobs {imports['statuses']}, "
+                f"{imports['rows']} rows ({imports['failed_rows']} failed), "
+                f"{imports['rows_per_second_median']:.0f} rows/s per job (median), "
+                f"{imports['rows_per_second_total']:.0f} rows/s overall"
+            )
+
+        database = report["database"]
+        if database is None:
+            self.stdout.write("\ndatabase: counters need PostgreSQL")
+        else:
+            self.stdout.write(
+                "\ndatabase: " + ", ".join(f"{k} {v}" for k, v in database.items())
+            )
+
+        redis = report["redis"]
+        if redis is None:
+            self.stdout.write("redis: unavailable")
+        else:
+            commands = sorted(
+                ((k, v) for k, v in redis.items() if k != "total"),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:8]
+            self.stdout.write(
+                f"redis: {redis.get('total', 0)} commands ("
+                + ", ".join(f"{k} {v}" for k, v in commands)
+                + ")"
+            )
+
+        if "fake_nominatim" in report:
+            self.stdout.write(f"fake nominatim: {report['fake_nominatim']}")
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from tax_service.partitions import (
+    apply_retention,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates upcoming monthly order partitions and, with --retain-months, "
+        "drops (optionally archiving) months past the retention window. "
+        "Meant to run daily from cron or Celery beat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Months after the current one to pre-create partitions for",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            default=None,
+            help="Keep this many full months before the current one",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=None,
+            help="Write each removed month to <dir>/<partition>.csv.gz first",
+        )
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            for name in ensure_partitions(months_ahead=options["ahead"]):
+                self.stdout.write(f"Created {name}")
+        else:
+            self.stdout.write(
+                "Order table is not partitioned; only retention will be applied."
+            )
+
+        if options["retain_months"] is not None:
+            for month, archived in apply_retention(
+                options["retain_months"], archive_dir=options["archive_dir"]
+            ):
+                suffix = f" ({archived} rows archived)" if archived is not None else ""
+                self.stdout.write(f"Removed {month}{suffix}")
+
+        if is_partitioned():
+            self.stdout.write(
+                self.style.SUCCESS(f"{len(list_partitions())} monthly partitions present.")
+            )
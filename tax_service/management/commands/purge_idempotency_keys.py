@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tax_service.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes Idempotency-Key records older than IDEMPOTENCY_KEY_TTL_HOURS. "
+        "Meant to run daily from cron or Celery beat."
+    )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Purged {deleted} idempotency keys older than "
+                f"{settings.IDEMPOTENCY_KEY_TTL_HOURS}h"
+            )
+        )
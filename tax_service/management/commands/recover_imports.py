@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tax_service.scheduler import recover_stalled_imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Restarts large imports with no chunk claimed for IMPORT_CHUNK_CLAIM_TIMEOUT "
+        "(lost slice tasks) and finalizes ones with nothing left to process. "
+        "Meant to run every few minutes from cron or Celery beat."
+    )
+
+    def handle(self, *args, **options):
+        recovered = recover_stalled_imports()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recovered {len(recovered)} import jobs stalled for over "
+                f"{settings.IMPORT_CHUNK_CLAIM_TIMEOUT}s"
+                + (f": {', '.join(map(str, recovered))}" if recovered else "")
+            )
+        )
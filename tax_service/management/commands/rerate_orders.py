@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from tax_service.models import RerateJob
+from tax_service.tasks import rerate_orders_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes tax for stored orders of a jurisdiction and period from their "
+        "geo_* fields, e.g. after a TaxRateAdmin correction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--state", default="New York")
+        parser.add_argument("--county", default="")
+        parser.add_argument("--locality", default=None)
+        parser.add_argument("--from", dest="period_start", default=None)
+        parser.add_argument("--to", dest="period_end", default=None)
+        parser.add_argument(
+            "--async",
+            dest="run_async",
+            action="store_true",
+            help="Queue the job on Celery instead of running it in this process",
+        )
+
+    def _parse(self, value):
+        if not value:
+            return None
+        dt = parse_datetime(value)
+        if dt is None:
+            raise CommandError(f"Invalid datetime: {value}")
+        return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+    def handle(self, *args, **options):
+        job = RerateJob.objects.create(
+            state=options["state"],
+            county=options["county"],
+            locality=options["locality"],
+            period_start=self._parse(options["period_start"]),
+            period_end=self._parse(options["period_end"]),
+        )
+
+        if options["run_async"]:
+            rerate_orders_task.delay(job.id)
+            self.stdout.write(self.style.SUCCESS(f"Queued RerateJob {job.id}."))
+            return
+
+        rerate_orders_task(job.id)
+        job.refresh_from_db()
+        message = (
+            f"RerateJob {job.id} {job.status}: {job.matched_orders} orders matched, "
+            f"{job.changed_orders} changed, tax delta {job.tax_delta}."
+        )
+        if job.status == "COMPLETED":
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stderr.write(self.style.ERROR(message))
@@ -1,68 +1,41 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from decimal import Decimal
-from tax_service.models import TaxRateAdmin
+
+from tax_service.rates import (
+    SEED_RATE_FILE,
+    SEED_SOURCE,
+    active_rate_set,
+    content_hash,
+    load_rates,
+    parse_rates,
+    read_rate_file,
+)
 
 
 class Command(BaseCommand):
     help = "Seeds the database with foundational New York State sales tax jurisdictions"
 
     def handle(self, *args, **kwargs):
-        # always run this to sync data since arrays get updated
-        pass
-
-        # Use a fixed historical date so rates apply to orders with ANY timestamp,
-        # including past-dated CSV imports. This was the root cause of tax=0 bug:
-        # timezone.now() meant rates only matched orders from "right now" onwards.
-        from datetime import datetime
-
-        valid_from_date = timezone.make_aware(datetime(2020, 1, 1))
-
-        # New York State Base Rate is 4%
-        state_rate = Decimal("0.0400")
-
-        rates = [
-            {"county": "Albany County", "rate_county": "0.0400"},
-            {"county": "Allegany County", "rate_county": "0.0450"},
-            {"county": "Bronx County", "rate_county": "0.0488"},
-            {"county": "Broome County", "rate_county": "0.0400"},
-            {"county": "Cattaraugus County", "rate_county": "0.0475"},
-            {"county": "Cayuga County", "rate_county": "0.0400"},
-            {"county": "Chautauqua County", "rate_county": "0.0400"},
-            {"county": "Chemung County", "rate_county": "0.0400"},
-            {"county": "Dutchess County", "rate_county": "0.0413"},
-            {"county": "Erie County", "rate_county": "0.0475"},
-            {"county": "Kings County", "rate_county": "0.0488"},
-            {"county": "Nassau County", "rate_county": "0.0488"},
-            {"county": "New York County", "rate_county": "0.0488"},
-            {"county": "Niagara County", "rate_county": "0.0475"},
-            {"county": "Oneida County", "rate_county": "0.0475"},
-            {"county": "Orange County", "rate_county": "0.0413"},
-            {"county": "Putnam County", "rate_county": "0.0413"},
-            {"county": "Queens County", "rate_county": "0.0488"},
-            {"county": "Richmond County", "rate_county": "0.0488"},
-            {"county": "Rockland County", "rate_county": "0.0413"},
-            {"county": "Suffolk County", "rate_county": "0.0463"},
-            {"county": "Westchester County", "rate_county": "0.0438"},
-            # Generic State fallback (if county is unknown but state is NY) 0% county tax
-            {"county": "", "rate_county": "0.0000"},
-        ]
-
-        TaxRateAdmin.objects.all().delete()  # ensure idempotency for script reruns
-        created = 0
-        for data in rates:
-            TaxRateAdmin.objects.create(
-                state="New York",
-                county=data["county"],
-                locality=None,
-                rate_state=state_rate,
-                rate_county=Decimal(data["rate_county"]),
-                rate_locality=Decimal("0.0000"),
-                rate_special=None,
-                valid_from=valid_from_date,
-            )
-            created += 1
-
-        self.stdout.write(
-            self.style.SUCCESS(f"Successfully seeded {created} NYS tax rates.")
+        # Rates live in data/rates/nys_rates.csv (all 62 counties, valid from
+        # 2020-01-01 so past-dated CSV imports are rated too). Loading creates
+        # a new rate set and flips to it atomically; rows are never deleted,
+        # so concurrent orders always see a complete table.
+        records, _ = read_rate_file(SEED_RATE_FILE)
+        digest = content_hash(parse_rates(records))
+
+        # Don't override a rate file loaded by an operator with `load_rates`
+        active = active_rate_set()
+        activate = active is None or active.source == SEED_SOURCE
+        rate_set, created = load_rates(
+            records,
+            version=f"seed-{digest[:12]}",
+            source=SEED_SOURCE,
+            activate_set=activate,
         )
+
+        if not created:
+            message = f"NYS tax rates already seeded as {rate_set.version}"
+        else:
+            message = f"Successfully seeded {rate_set.row_count} NYS tax rates as {rate_set.version}"
+        if not rate_set.is_active:
+            message += f" (not activated: {active.version} is active)"
+        self.stdout.write(self.style.SUCCESS(f"{message}."))
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each process imports before it can serve its first request / task.
+# Every run is a fresh interpreter under `python -X importtime`.
+TARGETS = {
+    "web": (
+        "from config.asgi import application\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    "worker": (
+        "import django\n"
+        "from config.celery import app\n"
+        "django.setup()\n"
+        "app.loader.import_default_modules()\n"
+    ),
+}
+
+# Modules worth knowing about when a process loads them
+WATCHED = (
+    "celery",
+    "tax_service.tasks",
+    "tax_service.services",
+    "requests",
+    "pyarrow",
+    "reverse_geocoder",
+    "redis",
+)
+
+
+def parse_importtime(stderr):
+    """
+    -X importtime lines -> [(module, self_us, cumulative_us, depth)].
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), own, cumulative, depth))
+    return imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures web and worker startup in fresh interpreters with "
+        "`python -X importtime`, lists the slowest imports and fails when a "
+        "target exceeds its budget (STARTUP_BUDGET_WEB_MS / STARTUP_BUDGET_WORKER_MS)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=[*TARGETS, "all"], default="all")
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Fresh interpreters per target; the fastest run is reported",
+        )
+        parser.add_argument(
+            "--top", type=int, default=15, help="Number of slowest imports to list"
+        )
+        parser.add_argument(
+            "--budget-ms",
+            type=int,
+            default=None,
+            help="Budget for every target, overriding the settings",
+        )
+
+    def _measure(self, target):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "config.settings"
+        ))
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", TARGETS[target]],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            tail = "\n".join(
+                line for line in proc.stderr.splitlines()
+                if not line.startswith("import time:")
+            )[-2000:]
+            raise CommandError(f"{target} startup failed:\n{tail}")
+        return elapsed_ms, parse_importtime(proc.stderr)
+
+    def handle(self, *args, **options):
+        targets = list(TARGETS) if options["target"] == "all" else [options["target"]]
+        budgets = {
+            "web": settings.STARTUP_BUDGET_WEB_MS,
+            "worker": settings.STARTUP_BUDGET_WORKER_MS,
+        }
+        over = []
+
+        for target in targets:
+            runs = [self._measure(target) for _ in range(max(options["runs"], 1))]
+            elapsed_ms, imports = min(runs, key=lambda run: run[0])
+            budget = options["budget_ms"] or budgets[target]
+            import_ms = sum(own for _, own, _, _ in imports) / 1000
+            loaded = {name for name, _, _, _ in imports}
+
+            self.stdout.write(
+                f"{target}: {elapsed_ms:.0f} ms wall, {import_ms:.0f} ms in "
+                f"{len(imports)} imports (budget {budget} ms)"
+            )
+            self.stdout.write("  cumulative ms    self ms  module")
+            slowest = sorted(imports, key=lambda i: i[2], reverse=True)[: options["top"]]
+            for name, own, cumulative, depth in slowest:
+                self.stdout.write(
+                    f"  {cumulative / 1000:13.1f} {own / 1000:10.1f}  {'  ' * depth}{name}"
+                )
+            self.stdout.write(
+                "  loaded: " + (", ".join(m for m in WATCHED if m in loaded) or "-")
+            )
+
+            if elapsed_ms > budget:
+                over.append(f"{target} {elapsed_ms:.0f} ms > {budget} ms")
+                self.stdout.write(self.style.ERROR(f"{target} is over budget"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{target} is within budget"))
+
+        if over:
+            raise CommandError("Startup over budget: " + "; ".join(over))
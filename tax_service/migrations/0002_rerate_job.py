@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RerateJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(max_length=50)),
+                ('county', models.CharField(blank=True, default='', max_length=100)),
+                ('locality', models.CharField(blank=True, max_length=100, null=True)),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('period_end', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('matched_orders', models.IntegerField(default=0)),
+                ('changed_orders', models.IntegerField(default=0)),
+                ('tax_delta', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('error_report', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rerate_job',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRerate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(db_index=True)),
+                ('old_composite_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('new_composite_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('old_tax_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('new_tax_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('rerate_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deltas', to='tax_service.reratejob')),
+            ],
+            options={
+                'db_table': 'order_rerate',
+            },
+        ),
+    ]
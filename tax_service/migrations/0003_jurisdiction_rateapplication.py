@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0002_rerate_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Jurisdiction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('state', models.CharField(max_length=100)),
+                ('county', models.CharField(max_length=100)),
+                ('locality', models.CharField(blank=True, max_length=100, null=True)),
+                ('source', models.CharField(max_length=50)),
+                ('raw_response', models.JSONField()),
+            ],
+            options={
+                'db_table': 'jurisdiction',
+                'indexes': [models.Index(fields=['state', 'county', 'locality'], name='jurisdictio_state_e0b139_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RateApplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('composite_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('jurisdictions', models.JSONField()),
+                ('components', models.JSONField()),
+            ],
+            options={
+                'db_table': 'rate_application',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='jurisdiction',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='tax_service.jurisdiction'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='rate_application',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='tax_service.rateapplication'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+"""
+Moves the repeated geo_* / jurisdictions / breakdown payload of existing
+orders into the Jurisdiction and RateApplication dimension tables.
+
+Runs non-atomically in pk-ordered chunks so a large table is not held in
+one transaction; it is safe to re-run since only unlinked orders are read.
+"""
+
+from django.db import migrations, transaction
+
+from tax_service.utils.interning import content_hash, rate_application_hash
+
+CHUNK_SIZE = 5000
+
+
+def jurisdiction_hash(state, county, locality, source, raw_response):
+    # The hash as of this migration; 0018 rekeys to the normalized identity.
+    return content_hash([state, county, locality, source, raw_response])
+
+
+def backfill(apps, schema_editor):
+    Order = apps.get_model("tax_service", "Order")
+    Jurisdiction = apps.get_model("tax_service", "Jurisdiction")
+    RateApplication = apps.get_model("tax_service", "RateApplication")
+
+    jurisdiction_ids = {}
+    application_ids = {}
+
+    def intern(model, ids, digest, values):
+        if digest not in ids:
+            obj, _ = model.objects.get_or_create(content_hash=digest, defaults=values)
+            ids[digest] = obj.pk
+        return ids[digest]
+
+    pending = Order.objects.filter(jurisdiction__isnull=True).order_by("pk")
+    last_pk = 0
+    while True:
+        chunk = list(
+            pending.filter(pk__gt=last_pk).only(
+                "id",
+                "geo_state",
+                "geo_county",
+                "geo_locality",
+                "geo_source",
+                "geo_raw_response",
+                "composite_rate",
+                "jurisdictions",
+                "breakdown",
+            )[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        with transaction.atomic():
+            for order in chunk:
+                geo = {
+                    "state": order.geo_state,
+                    "county": order.geo_county,
+                    "locality": order.geo_locality,
+                    "source": order.geo_source,
+                    "raw_response": order.geo_raw_response,
+                }
+                order.jurisdiction_id = intern(
+                    Jurisdiction, jurisdiction_ids, jurisdiction_hash(**geo), geo
+                )
+
+                rate = {
+                    "composite_rate": order.composite_rate,
+                    "jurisdictions": order.jurisdictions,
+                    "components": [
+                        {"name": b["name"], "rate": b["rate"]} for b in order.breakdown
+                    ],
+                }
+                order.rate_application_id = intern(
+                    RateApplication, application_ids, rate_application_hash(**rate), rate
+                )
+
+            Order.objects.bulk_update(chunk, ["jurisdiction", "rate_application"])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tax_service', '0003_jurisdiction_rateapplication'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
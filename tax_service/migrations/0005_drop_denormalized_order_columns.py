@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0004_backfill_order_dimensions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='order',
+            name='breakdown',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='geo_county',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='geo_locality',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='geo_raw_response',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='geo_source',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='geo_state',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='jurisdictions',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='jurisdiction',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='tax_service.jurisdiction'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='rate_application',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='tax_service.rateapplication'),
+        ),
+    ]
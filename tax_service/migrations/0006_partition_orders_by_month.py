@@ -0,0 +1,96 @@
+"""
+Converts the order table into a table range-partitioned by month on
+order_timestamp (Postgres only; a no-op on other backends).
+
+Postgres requires the partition key in every unique constraint, so the
+primary key becomes (id, order_timestamp); ids still come from a single
+sequence and stay globally unique. Existing indexes and foreign keys are
+recreated under their original names so later Django migrations match.
+Rows are copied in one statement while the table is locked - schedule
+this migration in a maintenance window on large installations.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+
+from tax_service.utils.periods import add_months, month_start, partition_name
+
+TABLE = "order"
+STAGING = "order_partitioned"
+MONTHS_AHEAD = 3
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    qn = schema_editor.connection.ops.quote_name
+    now = datetime.now(dt_timezone.utc)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f"{TABLE}_pkey"],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [qn(TABLE)],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            f"SELECT MIN(order_timestamp), MAX(id) FROM {qn(TABLE)}"
+        )
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(
+            f"CREATE TABLE {qn(STAGING)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (order_timestamp)"
+        )
+        cursor.execute(
+            f"CREATE TABLE {qn(TABLE + '_default')} PARTITION OF {qn(STAGING)} DEFAULT"
+        )
+        start = month_start(oldest or now)
+        last = add_months(month_start(now), MONTHS_AHEAD)
+        while start <= last:
+            end = add_months(start, 1)
+            cursor.execute(
+                f"CREATE TABLE {qn(partition_name(TABLE, start))} "
+                f"PARTITION OF {qn(STAGING)} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            start = end
+
+        cursor.execute(f"INSERT INTO {qn(STAGING)} SELECT * FROM {qn(TABLE)}")
+        # Drops the identity sequence, indexes and constraints with it
+        cursor.execute(f"DROP TABLE {qn(TABLE)}")
+        cursor.execute(f"ALTER TABLE {qn(STAGING)} RENAME TO {qn(TABLE)}")
+
+        sequence = f"{TABLE}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, (max_id or 0) + 1])
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s)",
+            [sequence],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_pkey')} "
+            f"PRIMARY KEY (id, order_timestamp)"
+        )
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0005_drop_denormalized_order_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
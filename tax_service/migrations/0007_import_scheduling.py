@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0006_partition_orders_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.IntegerField()),
+                ('start_index', models.IntegerField()),
+                ('length', models.IntegerField()),
+                ('payload', models.BinaryField()),
+                ('claimed', models.BooleanField(default=False)),
+                ('errors', models.JSONField(default=list)),
+            ],
+            options={
+                'db_table': 'import_chunk',
+            },
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='active_slices',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='estimated_rows',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='queue',
+            field=models.CharField(choices=[('small', 'Small'), ('large', 'Large')], default='small', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='staging_done',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['queue', 'status', 'created_at'], name='import_job_queue_9df521_idx'),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='tax_service.importjob'),
+        ),
+        migrations.AddConstraint(
+            model_name='importchunk',
+            constraint=models.UniqueConstraint(fields=('job', 'seq'), name='import_chunk_job_seq'),
+        ),
+    ]
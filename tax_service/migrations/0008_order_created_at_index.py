@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0007_import_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_e19252_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0009_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='retries',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ImportFailedRows',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_count', models.IntegerField()),
+                ('payload', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='failed_row_sets', to='tax_service.importjob')),
+            ],
+            options={
+                'db_table': 'import_failed_rows',
+            },
+        ),
+    ]
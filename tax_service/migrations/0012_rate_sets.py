@@ -0,0 +1,70 @@
+"""
+Versioned rate sets. Existing tax_rate_admin rows become the "initial"
+set, which is made active so rating continues unchanged.
+"""
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def adopt_existing_rates(apps, schema_editor):
+    RateSet = apps.get_model("tax_service", "RateSet")
+    TaxRateAdmin = apps.get_model("tax_service", "TaxRateAdmin")
+
+    rows = TaxRateAdmin.objects.order_by("pk")
+    if not rows.exists():
+        return
+    digest = hashlib.sha256()
+    for values in rows.values_list(
+        "state", "county", "locality", "rate_state", "rate_county",
+        "rate_locality", "rate_special", "valid_from", "valid_to",
+    ):
+        digest.update(repr(values).encode("utf-8"))
+    rate_set = RateSet.objects.create(
+        version="initial",
+        source="seed_taxes",
+        content_hash=digest.hexdigest(),
+        row_count=rows.count(),
+        is_active=True,
+    )
+    rows.update(rate_set=rate_set)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0011_import_upload_dedupe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=100, unique=True)),
+                ('source', models.CharField(blank=True, default='', max_length=255)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('row_count', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rate_set',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='rate_set_single_active')],
+            },
+        ),
+        migrations.AddField(
+            model_name='taxrateadmin',
+            name='rate_set',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='tax_service.rateset'),
+        ),
+        migrations.RunPython(adopt_existing_rates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='taxrateadmin',
+            name='rate_set',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='tax_service.rateset'),
+        ),
+    ]
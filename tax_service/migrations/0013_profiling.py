@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0012_rate_sets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=255)),
+                ('mode', models.CharField(choices=[('sampling', 'Sampling'), ('cprofile', 'cProfile')], max_length=20)),
+                ('duration_ms', models.FloatField(default=0)),
+                ('samples', models.IntegerField(default=0)),
+                ('overhead', models.FloatField(default=0)),
+                ('payload', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='tax_service.importjob')),
+            ],
+            options={
+                'db_table': 'profile_report',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0013_profiling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='geocode_ms',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='geocode_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='geocode_rows',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='geocode_saved_ms',
+            field=models.FloatField(default=0),
+        ),
+    ]
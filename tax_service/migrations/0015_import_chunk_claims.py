@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0014_import_geocode_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importchunk',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='done',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+Unpartitioned claim table for Order.external_id. Existing orders get a
+claim each; where an external_id was stored more than once (different
+timestamps) the oldest order keeps it.
+"""
+
+from django.db import migrations, models
+
+BACKFILL_BATCH = 5000
+
+
+def claim_existing_external_ids(apps, schema_editor):
+    Order = apps.get_model("tax_service", "Order")
+    OrderExternalId = apps.get_model("tax_service", "OrderExternalId")
+
+    batch = []
+    for external_id, order_id in (
+        Order.objects.filter(external_id__isnull=False)
+        .exclude(external_id="")
+        .order_by("pk")
+        .values_list("external_id", "pk")
+        .iterator(chunk_size=BACKFILL_BATCH)
+    ):
+        batch.append(OrderExternalId(external_id=external_id, order_id=order_id))
+        if len(batch) >= BACKFILL_BATCH:
+            OrderExternalId.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        OrderExternalId.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_service', '0015_import_chunk_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderExternalId',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=64, unique=True)),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'order_external_id',
+            },
+        ),
+        migrations.RunPython(claim_existing_external_ids, migrations.RunPython.noop),
+    ]
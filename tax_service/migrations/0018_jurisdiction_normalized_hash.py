@@ -0,0 +1,83 @@
+"""
+Rekeys Jurisdiction rows on (state, county, locality, special districts)
+instead of the whole geocoder payload, merging the rows that collapse onto
+one key: their orders are repointed to one kept row and the rest deleted.
+
+Runs non-atomically in pk-ordered chunks like 0004; it is safe to re-run
+since rows already on their new hash are left alone.
+"""
+
+from django.db import migrations, transaction
+
+from tax_service.utils.interning import jurisdiction_hash
+
+CHUNK_SIZE = 5000
+
+
+def rehash(apps, schema_editor):
+    Order = apps.get_model("tax_service", "Order")
+    Jurisdiction = apps.get_model("tax_service", "Jurisdiction")
+
+    keepers = {}  # new hash -> pk of the row kept for it
+    last_pk = 0
+    while True:
+        chunk = list(
+            Jurisdiction.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("id", "content_hash", "state", "county", "locality", "raw_response")[
+                :CHUNK_SIZE
+            ]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        digests = {}
+        for row in chunk:
+            districts = (
+                row.raw_response.get("special_districts", [])
+                if isinstance(row.raw_response, dict)
+                else []
+            )
+            digests[row.pk] = jurisdiction_hash(
+                row.state, row.county, row.locality, districts
+            )
+        # A row already on a new hash (interned since deploy, possibly with a
+        # higher pk) must stay the keeper, or the rehash would violate unique.
+        keepers.update(
+            Jurisdiction.objects.filter(
+                content_hash__in=set(digests.values()) - keepers.keys()
+            ).values_list("content_hash", "pk")
+        )
+
+        rehashed = []
+        duplicates = {}  # keeper pk -> [duplicate pks]
+        for row in chunk:
+            digest = digests[row.pk]
+            keeper = keepers.setdefault(digest, row.pk)
+            if keeper != row.pk:
+                duplicates.setdefault(keeper, []).append(row.pk)
+            elif row.content_hash != digest:
+                row.content_hash = digest
+                rehashed.append(row)
+
+        with transaction.atomic():
+            for keeper, pks in duplicates.items():
+                Order.objects.filter(jurisdiction_id__in=pks).update(
+                    jurisdiction_id=keeper
+                )
+                Jurisdiction.objects.filter(pk__in=pks).delete()
+            Jurisdiction.objects.bulk_update(rehashed, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tax_service', '0017_order_created_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(rehash, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+from .utils.interning import jurisdiction_hash, rate_application_hash
 
 
 class GeocodeCache(models.Model):
@@ -19,7 +21,42 @@ class GeocodeCache(models.Model):
         db_table = "geocode_cache"
 
 
+class RateSet(models.Model):
+    """
+    One loaded version of the rate table. Orders are rated against the rows
+    of the single active set; loading a new version never touches the rows
+    of the active one, and activation flips is_active in one transaction.
+    """
+
+    version = models.CharField(max_length=100, unique=True)
+    source = models.CharField(max_length=255, blank=True, default="")
+    content_hash = models.CharField(max_length=64, db_index=True)
+    row_count = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "rate_set"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["is_active"],
+                condition=models.Q(is_active=True),
+                name="rate_set_single_active",
+            ),
+        ]
+
+    def __str__(self):
+        return self.version
+
+
+class TaxRateQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(rate_set__is_active=True)
+
+
 class TaxRateAdmin(models.Model):
+    rate_set = models.ForeignKey(RateSet, on_delete=models.CASCADE, related_name="rates")
     state = models.CharField(max_length=50, db_index=True)
     county = models.CharField(max_length=100, db_index=True)
     locality = models.CharField(max_length=100, null=True, blank=True, db_index=True)
@@ -34,6 +71,8 @@ class TaxRateAdmin(models.Model):
     valid_from = models.DateTimeField()
     valid_to = models.DateTimeField(null=True, blank=True)
 
+    objects = TaxRateQuerySet.as_manager()
+
     class Meta:
         db_table = "tax_rate_admin"
         indexes = [
@@ -43,27 +82,210 @@ class TaxRateAdmin(models.Model):
         ]
 
 
+class InternedManager(models.Manager):
+    """
+    get-or-create by content hash, with a small per-process cache so hot
+    dimension rows are resolved without a query.
+    """
+
+    CACHE_LIMIT = 10_000
+
+    def __init__(self):
+        super().__init__()
+        self._cache = {}
+
+    def _remember(self, instance):
+        if len(self._cache) >= self.CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[instance.content_hash] = instance
+        return instance
+
+    def intern(self, instance):
+        instance.content_hash = instance.compute_hash()
+        cached = self._cache.get(instance.content_hash)
+        if cached is not None:
+            return cached
+        obj, _ = self.get_or_create(
+            content_hash=instance.content_hash, defaults=instance.content()
+        )
+        # Only cache rows that survived their transaction.
+        transaction.on_commit(lambda: self._remember(obj))
+        return obj
+
+    async def aintern(self, instance):
+        instance.content_hash = instance.compute_hash()
+        cached = self._cache.get(instance.content_hash)
+        if cached is not None:
+            return cached
+        obj, _ = await self.aget_or_create(
+            content_hash=instance.content_hash, defaults=instance.content()
+        )
+        return self._remember(obj)
+
+
+class Jurisdiction(models.Model):
+    """
+    Deduplicated geocoding outcome shared by every order resolved to it.
+    Interned by (state, county, locality, special districts); source and
+    raw_response are kept from the first order that resolved to it.
+    """
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    state = models.CharField(max_length=100)
+    county = models.CharField(max_length=100)
+    locality = models.CharField(max_length=100, null=True, blank=True)
+    source = models.CharField(max_length=50)  # 'cache', 'nominatim'
+    raw_response = models.JSONField()
+
+    objects = InternedManager()
+
+    class Meta:
+        db_table = "jurisdiction"
+        indexes = [models.Index(fields=["state", "county", "locality"])]
+
+    def content(self):
+        return {
+            "state": self.state,
+            "county": self.county,
+            "locality": self.locality,
+            "source": self.source,
+            "raw_response": self.raw_response,
+        }
+
+    def compute_hash(self):
+        return jurisdiction_hash(
+            self.state, self.county, self.locality, self.special_districts
+        )
+
+    @property
+    def special_districts(self):
+        if isinstance(self.raw_response, dict):
+            return self.raw_response.get("special_districts", [])
+        return []
+
+
+class RateApplication(models.Model):
+    """
+    Deduplicated rate outcome: composite rate, applied jurisdictions and the
+    per-component rates. Component tax amounts depend on the order subtotal
+    and are derived on read (see breakdown_for).
+    """
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    composite_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    jurisdictions = models.JSONField()  # List of jurisdictions applied
+    components = models.JSONField()  # [{"name": ..., "rate": ...}, ...]
+
+    objects = InternedManager()
+
+    class Meta:
+        db_table = "rate_application"
+
+    def content(self):
+        return {
+            "composite_rate": self.composite_rate,
+            "jurisdictions": self.jurisdictions,
+            "components": self.components,
+        }
+
+    def compute_hash(self):
+        return rate_application_hash(**self.content())
+
+    def breakdown_for(self, subtotal):
+        subtotal = Decimal(str(subtotal))
+        return [
+            {
+                "name": c["name"],
+                "rate": c["rate"],
+                "tax_amount": str(
+                    (subtotal * Decimal(c["rate"])).quantize(
+                        Decimal("0.01"), rounding=ROUND_HALF_UP
+                    )
+                ),
+            }
+            for c in self.components
+        ]
+
+
 class Order(models.Model):
     lat = models.DecimalField(max_digits=9, decimal_places=6)
     lon = models.DecimalField(max_digits=9, decimal_places=6)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2)
     order_timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
-    geo_state = models.CharField(max_length=100)
-    geo_county = models.CharField(max_length=100)
-    geo_locality = models.CharField(max_length=100, null=True, blank=True)
-    geo_source = models.CharField(max_length=50)  # 'cache', 'nominatim'
-    geo_raw_response = models.JSONField()
+    jurisdiction = models.ForeignKey(
+        Jurisdiction, on_delete=models.PROTECT, related_name="orders"
+    )
+    rate_application = models.ForeignKey(
+        RateApplication, on_delete=models.PROTECT, related_name="orders"
+    )
 
     composite_rate = models.DecimalField(max_digits=6, decimal_places=4)
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
-    jurisdictions = models.JSONField()  # List of jurisdictions applied
-    breakdown = models.JSONField()  # Detailed breakdown of rates
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Client-supplied order id; retried API calls and re-uploaded import
+    # rows carrying one are not inserted twice.
+    external_id = models.CharField(max_length=64, null=True, blank=True)
+    # Stamped when the order is built, not by the INSERT, so a write-behind
+    # order keeps the value its 201 response showed.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = "order"
+        # Default API ordering and the /orders/changes/ cursor
+        indexes = [models.Index(fields=["created_at", "id"])]
+        constraints = [
+            # A unique index on the partitioned table must include the
+            # partition key; a retried row carries the same timestamp.
+            models.UniqueConstraint(
+                fields=["external_id", "order_timestamp"],
+                condition=models.Q(external_id__isnull=False),
+                name="order_external_id_uniq",
+            )
+        ]
+
+    # Denormalized view kept for the API, admin and exports.
+    @property
+    def geo_state(self):
+        return self.jurisdiction.state
+
+    @property
+    def geo_county(self):
+        return self.jurisdiction.county
+
+    @property
+    def geo_locality(self):
+        return self.jurisdiction.locality
+
+    @property
+    def geo_source(self):
+        return self.jurisdiction.source
+
+    @property
+    def geo_raw_response(self):
+        return self.jurisdiction.raw_response
+
+    @property
+    def jurisdictions(self):
+        return self.rate_application.jurisdictions
+
+    @property
+    def breakdown(self):
+        return self.rate_application.breakdown_for(self.subtotal)
+
+    def intern_dimensions(self):
+        """
+        Swap in-memory Jurisdiction/RateApplication for their shared rows.
+        Must run before the order is saved.
+        """
+        self.jurisdiction = Jurisdiction.objects.intern(self.jurisdiction)
+        self.rate_application = RateApplication.objects.intern(self.rate_application)
+
+    async def aintern_dimensions(self):
+        self.jurisdiction = await Jurisdiction.objects.aintern(self.jurisdiction)
+        self.rate_application = await RateApplication.objects.aintern(
+            self.rate_application
+        )
 
 
 class ImportJob(models.Model):
@@ -73,15 +295,216 @@ class ImportJob(models.Model):
         ("COMPLETED", "Completed"),
         ("FAILED", "Failed"),
     ]
+    QUEUE_CHOICES = [
+        ("small", "Small"),
+        ("large", "Large"),
+    ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    queue = models.CharField(max_length=10, choices=QUEUE_CHOICES, default="small")
+    estimated_rows = models.IntegerField(default=0)  # upload-time estimate
     total_rows = models.IntegerField(default=0)
     processed_rows = models.IntegerField(default=0)
     success_rows = models.IntegerField(default=0)
     failed_rows = models.IntegerField(default=0)
+    duplicate_rows = models.IntegerField(default=0)  # external_id already imported
+    retries = models.IntegerField(default=0)  # retry_failed runs
     error_report = models.JSONField(default=list)
+    # Large jobs: chunks are staged first, then consumed by up to
+    # IMPORT_MAX_SLICES_PER_JOB concurrent chunk tasks.
+    staging_done = models.BooleanField(default=False)
+    active_slices = models.IntegerField(default=0)
+    # Upload deduplication (see uploads.py): sha256 of the uploaded bytes,
+    # and of its first HEAD_BYTES to find files this one appends to.
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    head_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    size_bytes = models.BigIntegerField(default=0)
+    # Appended uploads only import the new tail; its rows are numbered
+    # after the rows of the job it extends.
+    appended_to = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.SET_NULL, related_name="appends"
+    )
+    row_offset = models.IntegerField(default=0)
+    # Run the job's tasks under the profiler (see profiling.py)
+    profile = models.BooleanField(default=False)
+    # Geocoding dedupe (see utils/spatial.py): rows sent to geocoding, unique
+    # rounded points actually resolved, and time spent / estimated saved.
+    geocode_rows = models.IntegerField(default=0)
+    geocode_points = models.IntegerField(default=0)
+    geocode_ms = models.FloatField(default=0)
+    geocode_saved_ms = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = "import_job"
+        indexes = [models.Index(fields=["queue", "status", "created_at"])]
+        constraints = [
+            # Concurrent uploads of the same file attach to one running job
+            models.UniqueConstraint(
+                fields=["content_hash"],
+                condition=models.Q(status__in=("PENDING", "PROCESSING"))
+                & ~models.Q(content_hash=""),
+                name="import_job_active_content_hash",
+            )
+        ]
+
+
+class ImportChunk(models.Model):
+    """
+    One staged chunk of a large import: raw column values, zlib-compressed
+    JSON. The payload is cleared once processed (done); errors are kept
+    until the job is finalized. claimed_by is the id of the slice task that
+    claimed it, so a redelivered task resumes its own chunk; attempts counts
+    claims, so a chunk that keeps killing workers is eventually given up.
+    """
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name="chunks")
+    seq = models.IntegerField()
+    start_index = models.IntegerField()
+    length = models.IntegerField()
+    payload = models.BinaryField()
+    claimed = models.BooleanField(default=False)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=255, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    done = models.BooleanField(default=False)
+    errors = models.JSONField(default=list)
+
+    class Meta:
+        db_table = "import_chunk"
+        constraints = [
+            models.UniqueConstraint(fields=["job", "seq"], name="import_chunk_job_seq")
+        ]
+
+
+class ImportFailedRows(models.Model):
+    """
+    Original column values of the rows of one import chunk that failed,
+    zlib-compressed JSON like ImportChunk.payload plus a "row" column with
+    their 1-based row indices. Kept so POST /api/imports/{id}/retry_failed/
+    can reprocess just these rows.
+    """
+
+    job = models.ForeignKey(
+        ImportJob, on_delete=models.CASCADE, related_name="failed_row_sets"
+    )
+    row_count = models.IntegerField()
+    payload = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "import_failed_rows"
+
+
+class ProfileReport(models.Model):
+    """
+    Output of one profiled request or import task: zlib-compressed
+    collapsed stacks (sampling) or marshalled pstats (cprofile).
+    """
+
+    MODE_CHOICES = [
+        ("sampling", "Sampling"),
+        ("cprofile", "cProfile"),
+    ]
+    job = models.ForeignKey(
+        ImportJob, null=True, blank=True, on_delete=models.CASCADE, related_name="profiles"
+    )
+    label = models.CharField(max_length=255)
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES)
+    duration_ms = models.FloatField(default=0)
+    samples = models.IntegerField(default=0)  # sampling mode only
+    overhead = models.FloatField(default=0)  # sampler time / wall time
+    payload = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "profile_report"
+
+
+class RerateJob(models.Model):
+    """
+    Recomputes tax for stored orders of one jurisdiction after a rate
+    correction, reusing the stored geo_* fields instead of geocoding again.
+    """
+
+    state = models.CharField(max_length=50)
+    county = models.CharField(max_length=100, blank=True, default="")
+    locality = models.CharField(max_length=100, null=True, blank=True)
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(
+        max_length=20, choices=ImportJob.STATUS_CHOICES, default="PENDING"
+    )
+    matched_orders = models.IntegerField(default=0)
+    changed_orders = models.IntegerField(default=0)
+    tax_delta = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error_report = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "rerate_job"
+
+
+class OrderRerate(models.Model):
+    """
+    Audit delta for one order changed by a RerateJob. order_id is kept as a
+    plain column so truncating orders never cascades into the audit trail.
+    """
+
+    rerate_job = models.ForeignKey(
+        RerateJob, on_delete=models.CASCADE, related_name="deltas"
+    )
+    order_id = models.BigIntegerField(db_index=True)
+    old_composite_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    new_composite_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    old_tax_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    new_tax_amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = "order_rerate"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key of a POST /api/orders/ request. The row is inserted
+    before any work is done, so the unique key decides which of several
+    concurrent duplicates computes the order; the others replay its
+    stored response.
+    """
+
+    STATUS_CHOICES = [
+        ("PROCESSING", "Processing"),
+        ("COMPLETED", "Completed"),
+    ]
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PROCESSING")
+    response_status = models.IntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    locked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "idempotency_key"
+
+
+class OrderExternalId(models.Model):
+    """
+    Claim on an Order.external_id. The order table is partitioned by
+    order_timestamp, so its own unique index can only cover
+    (external_id, order_timestamp); this unpartitioned table makes the
+    external_id itself unique. Synchronous inserts write the claim in the
+    order's transaction; write-behind and async inserts write it first, so
+    order_id can briefly name a row that is not committed yet.
+    """
+
+    external_id = models.CharField(max_length=64, unique=True)
+    order_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "order_external_id"
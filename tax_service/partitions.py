@@ -0,0 +1,184 @@
+"""
+Monthly range partitions of the order table on order_timestamp.
+
+On Postgres the table is declaratively partitioned (migration 0006): one
+partition per month plus order_default for rows outside every range.
+SQLite has no partitioning, so in development retention falls back to
+deleting (and optionally archiving) rows by timestamp range.
+"""
+
+import csv
+import gzip
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Order
+from .utils.periods import add_months, month_start, partition_name as _partition_name
+
+logger = logging.getLogger(__name__)
+
+TABLE = Order._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def partition_name(start):
+    return _partition_name(TABLE, start)
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """
+    [(name, lower_bound, upper_bound)] of monthly partitions, oldest first.
+    """
+    if not is_partitioned():
+        return []
+    prefix = f"{TABLE}_p"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s ORDER BY c.relname",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix) :].split("_")
+        start = datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc)
+        partitions.append((name, start, add_months(start, 1)))
+    return partitions
+
+
+def create_partition(start):
+    """
+    Create the monthly partition starting at `start`. Rows that already
+    landed in the default partition for that month are moved into it, which
+    a plain CREATE ... PARTITION OF would reject.
+    """
+    start = month_start(start)
+    end = add_months(start, 1)
+    name = partition_name(start)
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} "
+            f"(LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+            f"WHERE order_timestamp >= %s AND order_timestamp < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    logger.info(f"Created order partition {name} [{start:%Y-%m}]")
+    return True
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """
+    Make sure partitions exist from the current month through months_ahead.
+    Returns the names of newly created partitions.
+    """
+    if not is_partitioned():
+        return []
+    current = month_start(now or datetime.now(dt_timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        if create_partition(start):
+            created.append(partition_name(start))
+    return created
+
+
+def _archive_rows(path, cursor_rows, header):
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        count = 0
+        for row in cursor_rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def apply_retention(keep_months, archive_dir=None, now=None):
+    """
+    Remove order data older than keep_months full months. With archive_dir,
+    each month is first written to <archive_dir>/<partition>.csv.gz.
+
+    Postgres: whole partitions are detached and dropped (no row-level
+    DELETE, no table bloat). SQLite: rows are deleted by range.
+    Returns [(month_label, rows_archived_or_None)].
+    """
+    cutoff = add_months(month_start(now or datetime.now(dt_timezone.utc)), -keep_months)
+    qn = connection.ops.quote_name
+    removed = []
+
+    if is_partitioned():
+        targets = [(n, s, e) for n, s, e in list_partitions() if e <= cutoff]
+    else:
+        oldest = Order.objects.order_by("order_timestamp").values_list(
+            "order_timestamp", flat=True
+        ).first()
+        targets = []
+        if oldest is not None:
+            start = month_start(oldest)
+            while add_months(start, 1) <= cutoff:
+                targets.append((partition_name(start), start, add_months(start, 1)))
+                start = add_months(start, 1)
+
+    for name, start, end in targets:
+        archived = None
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT * FROM {qn(TABLE)} "
+                    f"WHERE order_timestamp >= %s AND order_timestamp < %s ORDER BY id",
+                    [start, end],
+                )
+                header = [col[0] for col in cursor.description]
+                archived = _archive_rows(
+                    os.path.join(archive_dir, f"{name}.csv.gz"), cursor, header
+                )
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if is_partitioned():
+                cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            else:
+                Order.objects.filter(
+                    order_timestamp__gte=start, order_timestamp__lt=end
+                ).delete()
+
+        logger.info(f"Retention removed {name} (archived rows: {archived})")
+        removed.append((f"{start:%Y-%m}", archived))
+    return removed
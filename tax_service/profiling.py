@@ -0,0 +1,265 @@
+"""
+Opt-in profiling of API requests and import jobs.
+
+Staff users add ?profile=1 to an order endpoint (ProfiledViewMixin); import
+jobs uploaded that way get ImportJob.profile, and every task that works on
+them (whole-file import, chunk slice, retry) runs under the profiler. Each
+run is stored as a ProfileReport: the response carries its download URL in
+X-Profile-Url, and GET /api/imports/{id}/profile/ merges a job's reports.
+
+Two modes (PROFILE_MODE):
+
+- "sampling" (default): a background thread samples the profiled thread's
+  stack every PROFILE_SAMPLE_INTERVAL_MS and counts collapsed stacks
+  ("outer;inner;leaf count", the input format of flamegraph.pl and
+  speedscope). The sampler backs off whenever its own time would exceed
+  PROFILE_MAX_OVERHEAD of wall time, and stops after PROFILE_MAX_SECONDS,
+  so a single production job can be profiled safely.
+- "cprofile": deterministic cProfile, saved as .pstats. Much higher
+  overhead, and only one can run per process at a time; a second concurrent
+  request falls back to sampling.
+"""
+
+import cProfile
+import logging
+import marshal
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import ProfileReport
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_URL_HEADER = "X-Profile-Url"
+# Deepest stack recorded; deeper frames are cut at the root end
+MAX_STACK_DEPTH = 200
+# Back-off ceiling for the sampling interval
+MAX_SAMPLE_INTERVAL = 1.0
+
+# cProfile hooks are process-wide on Python 3.12+
+_cprofile_lock = threading.Lock()
+
+
+def profile_requested(request):
+    """
+    True for ?profile=1 from a staff user; everyone else is ignored.
+    """
+    if request.query_params.get(PROFILE_PARAM, "").lower() not in ("1", "true", "yes"):
+        return False
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}"
+
+
+class Sampler(threading.Thread):
+    """
+    Samples one thread's stack until stop() or PROFILE_MAX_SECONDS.
+    """
+
+    def __init__(self, thread_id, interval, max_overhead, max_seconds):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.busy = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        deadline = time.perf_counter() + self.max_seconds
+        interval = self.interval
+        while not self._stopped.wait(interval):
+            started = time.perf_counter()
+            if started > deadline:
+                logger.info(f"Profiler stopped after {self.max_seconds}s")
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            frame = None  # don't keep the profiled thread's frames alive
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+            cost = time.perf_counter() - started
+            self.busy += cost
+            # Keep cost / (cost + interval) under max_overhead
+            interval = min(
+                max(self.interval, cost / self.max_overhead - cost), MAX_SAMPLE_INTERVAL
+            )
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profiler:
+    """
+    with Profiler("label") as profiler: ...; profiler.save() stores the
+    ProfileReport. Profiles the calling thread only.
+    """
+
+    def __init__(self, label, mode=None, job_id=None):
+        self.label = label
+        self.mode = mode or settings.PROFILE_MODE
+        self.job_id = job_id
+        self._sampler = None
+        self._cprofile = None
+        self._started = None
+        self.duration = 0.0
+
+    def __enter__(self):
+        if self.mode == "cprofile":
+            if _cprofile_lock.acquire(blocking=False):
+                self._cprofile = cProfile.Profile()
+            else:
+                logger.info(f"cProfile busy, sampling {self.label} instead")
+                self.mode = "sampling"
+        if self.mode == "sampling":
+            self._sampler = Sampler(
+                threading.get_ident(),
+                settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+                settings.PROFILE_MAX_OVERHEAD,
+                settings.PROFILE_MAX_SECONDS,
+            )
+        self._started = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        else:
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            _cprofile_lock.release()
+        else:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self._started
+        return False
+
+    def payload(self):
+        if self._cprofile is not None:
+            self._cprofile.create_stats()
+            return marshal.dumps(self._cprofile.stats)
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self._sampler.stacks.most_common()
+        ).encode("utf-8")
+
+    def save(self):
+        sampler = self._sampler
+        return ProfileReport.objects.create(
+            job_id=self.job_id,
+            label=self.label[:255],
+            mode=self.mode,
+            duration_ms=self.duration * 1000,
+            samples=sampler.samples if sampler else 0,
+            overhead=sampler.busy / self.duration if sampler and self.duration else 0,
+            payload=zlib.compress(self.payload()),
+        )
+
+
+class profile_job:
+    """
+    Context manager for import tasks: profiles the block when the job has
+    ImportJob.profile set, and stores the report on the job. Profiling
+    problems are logged, never raised into the import.
+    """
+
+    def __init__(self, job, label):
+        self.profiler = Profiler(label, job_id=job.id) if job.profile else None
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.profiler.__enter__()
+        return self.profiler
+
+    def __exit__(self, *exc_info):
+        if self.profiler is None:
+            return False
+        self.profiler.__exit__(*exc_info)
+        try:
+            self.profiler.save()
+        except Exception as e:
+            logger.warning(f"Could not store profile for {self.profiler.label}: {e}")
+        return False
+
+
+class ProfiledViewMixin:
+    """
+    DRF viewset mixin: ?profile=1 from a staff user profiles the request
+    (after authentication) and links the report in the response headers.
+    If the report cannot be stored, the response goes out without them.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._profiler = None
+        if profile_requested(request):
+            self._profiler = Profiler(f"{request.method} {request.path}").__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        profiler = getattr(self, "_profiler", None)
+        if profiler is not None:
+            self._profiler = None
+            profiler.__exit__(None, None, None)
+            try:
+                report = profiler.save()
+            except Exception as e:
+                # The request itself succeeded; answer it without the links.
+                logger.warning(f"Could not store profile for {profiler.label}: {e}")
+            else:
+                response[PROFILE_ID_HEADER] = str(report.id)
+                response[PROFILE_URL_HEADER] = request.build_absolute_uri(
+                    reverse("profile-download", args=[report.id])
+                )
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# ------------------------------------------------------------------ download
+class _LoadedStats:
+    # pstats.Stats accepts any object with create_stats() and .stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def merge_reports(reports):
+    """
+    Combine reports of one mode into a single file. Returns
+    (content, filename suffix, content type).
+    """
+    reports = list(reports)
+    if reports[0].mode == "cprofile":
+        import pstats
+
+        merged = pstats.Stats(_LoadedStats(marshal.loads(zlib.decompress(reports[0].payload))))
+        for report in reports[1:]:
+            merged.add(_LoadedStats(marshal.loads(zlib.decompress(report.payload))))
+        return marshal.dumps(merged.stats), "pstats", "application/octet-stream"
+
+    stacks = Counter()
+    for report in reports:
+        for line in zlib.decompress(report.payload).decode("utf-8").splitlines():
+            stack, _, count = line.rpartition(" ")
+            stacks[stack] += int(count)
+    content = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return content.encode("utf-8"), "collapsed.txt", "text/plain; charset=utf-8"
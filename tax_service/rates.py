@@ -0,0 +1,321 @@
+"""
+Versioned rate tables.
+
+load_rates() validates a rate file and bulk-inserts it as a new RateSet in
+one transaction; activation flips RateSet.is_active, also in one
+transaction. Rate lookups (TaxRateAdmin.objects.active()) join on the active
+set, so every query sees exactly one complete table: loading never leaves
+readers with an empty or half-written one. Older sets stay in the database,
+so `python manage.py load_rates --activate <version>` rolls back instantly.
+
+A file has the columns state, county, locality, rate_state, rate_county,
+rate_locality, rate_special, valid_from, valid_to. An empty county is the
+state-wide fallback; locality holds a city or a special district name
+("MCTD"). A special district row has one per county it covers and carries
+only rate_special, which rating adds on top of the city or county rate.
+Dates are ISO 8601, a bare date meaning midnight in TIME_ZONE.
+JSON files hold {"version": ..., "rates": [{column: value}, ...]} or a bare
+list of rows.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RateSet, TaxRateAdmin
+
+logger = logging.getLogger(__name__)
+
+RATE_COLUMNS = (
+    "state",
+    "county",
+    "locality",
+    "rate_state",
+    "rate_county",
+    "rate_locality",
+    "rate_special",
+    "valid_from",
+    "valid_to",
+)
+REQUIRED_COLUMNS = ("state", "rate_state", "rate_county", "valid_from")
+RATE_FIELDS = ("rate_state", "rate_county", "rate_locality", "rate_special")
+# Errors listed before a bad file is rejected
+MAX_ERRORS = 50
+BULK_BATCH_SIZE = 2000
+SEED_SOURCE = "seed_taxes"
+SEED_RATE_FILE = os.path.join(settings.BASE_DIR, "data", "rates", "nys_rates.csv")
+
+
+class RateFileError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors[:MAX_ERRORS]
+        super().__init__("; ".join(self.errors))
+
+
+def read_rate_file(path):
+    """
+    Returns (records, version) where version is the one named in a JSON
+    file, else None.
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    if str(path).lower().endswith(".json"):
+        return parse_json(text)
+    return parse_csv(text), None
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None:
+        raise RateFileError(["Rate file is empty"])
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    return list(reader)
+
+
+def parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise RateFileError([f"Invalid JSON: {e}"])
+    if isinstance(data, list):
+        return data, None
+    if not isinstance(data, dict) or not isinstance(data.get("rates"), list):
+        raise RateFileError(['JSON rate file needs a "rates" list'])
+    return data["rates"], data.get("version")
+
+
+# ---------------------------------------------------------------- validation
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _rate(value):
+    rate = Decimal(str(value).strip())
+    if not rate.is_finite() or rate < 0 or rate >= 1:
+        raise ValueError("must be a fraction between 0 and 1")
+    if rate.as_tuple().exponent < -4:
+        raise ValueError("has more than 4 decimal places")
+    return rate
+
+
+def _moment(value):
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    else:
+        moment = datetime.fromisoformat(str(value).strip())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_rates(records):
+    """
+    Raw records -> list of TaxRateAdmin field dicts. Raises RateFileError
+    listing every bad row, and any rows whose validity periods overlap.
+    """
+    rates, errors = [], []
+    # Historical files repeat the same few period boundaries on every row
+    moments = {}
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            errors.append(f"Row {number}: not an object")
+            continue
+        record = {str(k).strip().lower(): v for k, v in record.items()}
+        missing = [c for c in REQUIRED_COLUMNS if _blank(record.get(c))]
+        if missing:
+            errors.append(f"Row {number}: missing {', '.join(missing)}")
+            continue
+        try:
+            row = {
+                "state": str(record["state"]).strip(),
+                "county": str(record.get("county") or "").strip(),
+                "locality": str(record.get("locality") or "").strip() or None,
+            }
+            for field in RATE_FIELDS:
+                value = record.get(field)
+                if _blank(value):
+                    row[field] = None if field == "rate_special" else Decimal("0.0000")
+                else:
+                    try:
+                        row[field] = _rate(value)
+                    except (InvalidOperation, ValueError) as e:
+                        detail = "is not a number" if isinstance(e, InvalidOperation) else e
+                        raise ValueError(f"{field} {value!r} {detail}")
+            for field in ("valid_from", "valid_to"):
+                value = record.get(field)
+                try:
+                    if _blank(value):
+                        row[field] = None
+                    elif isinstance(value, str):
+                        if value not in moments:
+                            moments[value] = _moment(value)
+                        row[field] = moments[value]
+                    else:
+                        row[field] = _moment(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{field} {value!r} is not an ISO 8601 date")
+        except ValueError as e:
+            errors.append(f"Row {number}: {e}")
+            continue
+        if row["valid_to"] is not None and row["valid_to"] < row["valid_from"]:
+            errors.append(f"Row {number}: valid_to is before valid_from")
+            continue
+        if row["rate_special"] is not None:
+            error = _special_district_error(row)
+            if error:
+                errors.append(f"Row {number}: {error}")
+                continue
+        row["_number"] = number
+        rates.append(row)
+
+    errors.extend(_overlaps(rates))
+    if errors:
+        raise RateFileError(errors)
+    for row in rates:
+        del row["_number"]
+    return rates
+
+
+def _special_district_error(row):
+    if not row["county"] or not row["locality"]:
+        return "rate_special needs a county and the district name in locality"
+    if any(row[field] for field in ("rate_state", "rate_county", "rate_locality")):
+        return "a special district row carries only rate_special (other rates must be 0)"
+    return None
+
+
+def _overlaps(rates):
+    # Lookups treat valid_to as inclusive, so periods must not even touch
+    periods = {}
+    for row in rates:
+        key = (row["state"].lower(), row["county"].lower(), (row["locality"] or "").lower())
+        periods.setdefault(key, []).append(row)
+    errors = []
+    for rows in periods.values():
+        rows.sort(key=lambda r: r["valid_from"])
+        for previous, current in zip(rows, rows[1:]):
+            if previous["valid_to"] is None or previous["valid_to"] >= current["valid_from"]:
+                errors.append(
+                    f"Row {current['_number']}: overlaps row {previous['_number']} "
+                    f"({current['state']} / {current['county'] or '-'} / "
+                    f"{current['locality'] or '-'})"
+                )
+    return errors
+
+
+def boundary_counties():
+    """
+    (state, county) of every feature in the county boundary layers.
+    """
+    counties = set()
+    for config in settings.BOUNDARY_LAYERS:
+        if config["level"] != "county":
+            continue
+        with open(config["path"], "r") as f:
+            features = json.load(f).get("features", [])
+        name_property = config.get("name_property", "name")
+        state_property = config.get("state_property", "state")
+        for feature in features:
+            properties = feature.get("properties") or {}
+            state = config.get("state") or properties.get(state_property)
+            county = properties.get(name_property)
+            if state and county:
+                counties.add((state, county))
+    return counties
+
+
+def coverage_errors(rates, counties):
+    covered = {
+        (row["state"].lower(), row["county"].lower())
+        for row in rates
+        if not row["locality"]
+    }
+    missing = sorted(
+        f"{county} ({state})"
+        for state, county in counties
+        if (state.lower(), county.lower()) not in covered
+    )
+    if missing:
+        return [f"No county rate for {len(missing)} counties: {', '.join(missing)}"]
+    return []
+
+
+def content_hash(rates):
+    digest = hashlib.sha256()
+    for row in sorted(
+        [[str(row[c]) if row[c] is not None else "" for c in RATE_COLUMNS] for row in rates]
+    ):
+        digest.update(json.dumps(row).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# --------------------------------------------------------------- load / flip
+def activate(rate_set):
+    """
+    Make rate_set (a RateSet or version string) the active one.
+    """
+    with transaction.atomic():
+        # Serializes concurrent activations on the current active row
+        list(RateSet.objects.select_for_update().filter(is_active=True))
+        if isinstance(rate_set, str):
+            rate_set = RateSet.objects.get(version=rate_set)
+        RateSet.objects.filter(is_active=True).exclude(pk=rate_set.pk).update(
+            is_active=False
+        )
+        rate_set.is_active = True
+        rate_set.activated_at = timezone.now()
+        rate_set.save(update_fields=["is_active", "activated_at"])
+    logger.info(f"Rate set {rate_set.version} is now active")
+    return rate_set
+
+
+def active_rate_set():
+    return RateSet.objects.filter(is_active=True).first()
+
+
+def load_rates(records, version=None, source="", activate_set=True, require_counties=True):
+    """
+    Validate records and store them as a new RateSet, activated unless
+    activate_set is False. A file identical to an existing set reuses it.
+    Returns (rate_set, created).
+    """
+    rates = parse_rates(records)
+    if require_counties:
+        errors = coverage_errors(rates, boundary_counties())
+        if errors:
+            raise RateFileError(errors)
+    digest = content_hash(rates)
+
+    existing = RateSet.objects.filter(content_hash=digest).order_by("-created_at").first()
+    if existing is not None:
+        if activate_set and not existing.is_active:
+            activate(existing)
+        return existing, False
+
+    version = version or f"rates-{digest[:12]}"
+    if RateSet.objects.filter(version=version).exists():
+        raise RateFileError([f"Version {version!r} already exists with different rates"])
+
+    with transaction.atomic():
+        rate_set = RateSet.objects.create(
+            version=version, source=source[:255], content_hash=digest, row_count=len(rates)
+        )
+        TaxRateAdmin.objects.bulk_create(
+            [TaxRateAdmin(rate_set=rate_set, **row) for row in rates],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        if activate_set:
+            activate(rate_set)
+    logger.info(f"Loaded rate set {version}: {len(rates)} rates")
+    return rate_set, True
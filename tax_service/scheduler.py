@@ -0,0 +1,451 @@
+"""
+Import job scheduling.
+
+Jobs are routed at upload time by their estimated row count:
+
+- small jobs go to IMPORT_SMALL_QUEUE and run as one task, so a same-day
+  upload never waits behind a backfill;
+- large jobs go to IMPORT_LARGE_QUEUE. Their rows are first staged as
+  ImportChunk rows, then consumed one chunk per task by at most
+  IMPORT_MAX_SLICES_PER_JOB concurrent "slices". Every slice re-enqueues
+  itself at the back of the queue after a chunk, so active large jobs share
+  the large workers round-robin instead of first-come-first-served.
+
+Slice tasks are acked late, so a chunk whose worker dies is redelivered;
+a claim older than IMPORT_CHUNK_CLAIM_TIMEOUT is taken over by any slice,
+and `python manage.py recover_imports` restarts jobs whose slice messages
+were lost. A chunk still unrecorded after IMPORT_CHUNK_MAX_ATTEMPTS claims
+is reported as failed rows, which retry_failed_rows can reprocess.
+
+Run workers with prefetch 1 (CELERY_WORKER_PREFETCH_MULTIPLIER) so queued
+chunk tasks are not reserved ahead of other jobs.
+"""
+
+import json
+import logging
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ImportChunk, ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Chunks written per bulk_create while staging
+STAGE_BATCH = 20
+# Completed jobs sampled for the throughput estimate
+THROUGHPUT_SAMPLE = 20
+
+
+def route(estimated_rows):
+    return "small" if estimated_rows <= settings.IMPORT_SMALL_JOB_ROWS else "large"
+
+
+def queue_name(queue):
+    if queue == "large":
+        return settings.IMPORT_LARGE_QUEUE
+    return settings.IMPORT_SMALL_QUEUE
+
+
+def submit_import(job, kind, estimated_rows, **task_kwargs):
+    """
+    Route and enqueue an ImportJob. kind is "csv" or "parquet"; task_kwargs
+    are passed through to the import task (file_content / payload / compression).
+    """
+    from .tasks import import_orders_task, import_parquet_task, stage_import_task
+
+    job.estimated_rows = estimated_rows
+    job.queue = route(estimated_rows)
+    job.save(update_fields=["estimated_rows", "queue"])
+
+    if job.queue == "small":
+        task = import_parquet_task if kind == "parquet" else import_orders_task
+        task.apply_async((job.id,), task_kwargs, queue=queue_name("small"))
+    else:
+        stage_import_task.apply_async(
+            (job.id, kind), task_kwargs, queue=queue_name("large")
+        )
+    logger.info(f"ImportJob {job.id}: ~{estimated_rows} rows -> {job.queue} queue")
+    return job
+
+
+# ------------------------------------------------------------------ staging
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_chunk(values):
+    payload = {
+        name: [_jsonable(v) for v in column] for name, column in values.items()
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_chunk(payload):
+    return json.loads(zlib.decompress(bytes(payload)).decode("utf-8"))
+
+
+def start_slices(job):
+    from .tasks import import_chunk_task
+
+    slices = settings.IMPORT_MAX_SLICES_PER_JOB
+    ImportJob.objects.filter(pk=job.pk).update(active_slices=slices)
+    for _ in range(slices):
+        import_chunk_task.apply_async((job.id,), queue=queue_name("large"))
+
+
+def stage_chunks(job, columns):
+    """
+    Store (values, length) chunks for the slices to consume. Slices are
+    started after the first batch, so processing overlaps staging.
+    """
+    seq = 0
+    start_index = job.row_offset + 1
+    pending = []
+    started = False
+
+    def flush():
+        nonlocal started
+        ImportChunk.objects.bulk_create(pending)
+        pending.clear()
+        if not started:
+            start_slices(job)
+            started = True
+
+    for values, length in columns:
+        pending.append(
+            ImportChunk(
+                job=job,
+                seq=seq,
+                start_index=start_index,
+                length=length,
+                payload=encode_chunk(values),
+            )
+        )
+        seq += 1
+        start_index += length
+        if len(pending) >= STAGE_BATCH:
+            flush()
+    if pending:
+        flush()
+
+    ImportJob.objects.filter(pk=job.pk).update(
+        staging_done=True, total_rows=start_index - 1 - job.row_offset
+    )
+    if not started:
+        finalize(job.pk)
+    return seq
+
+
+# ------------------------------------------------------------------ slices
+def _claim_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(seconds=settings.IMPORT_CHUNK_CLAIM_TIMEOUT)
+
+
+def claim_chunk(job_id, worker_id=""):
+    """
+    Atomically claim a chunk of a job, or None. worker_id is the slice
+    task's id: a redelivered task (acks_late) first resumes the chunk it had
+    claimed. Otherwise the lowest unclaimed chunk is taken, then any chunk
+    whose claim is older than IMPORT_CHUNK_CLAIM_TIMEOUT without being
+    recorded. A chunk is claimed at most IMPORT_CHUNK_MAX_ATTEMPTS times;
+    finalize() reports one that was never recorded as failed rows.
+    """
+    now = timezone.now()
+    claimable = ImportChunk.objects.filter(
+        job_id=job_id, done=False, attempts__lt=settings.IMPORT_CHUNK_MAX_ATTEMPTS
+    )
+    claim = {
+        "claimed": True,
+        "claimed_at": now,
+        "claimed_by": worker_id[:255],
+        "attempts": F("attempts") + 1,
+    }
+    if worker_id:
+        own = claimable.filter(claimed_by=worker_id).values_list("pk", flat=True).first()
+        if own is not None and claimable.filter(pk=own, claimed_by=worker_id).update(**claim):
+            return ImportChunk.objects.get(pk=own)
+
+    while True:
+        candidate = (
+            claimable.filter(claimed=False)
+            .order_by("seq")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if candidate is None:
+            break
+        if claimable.filter(pk=candidate, claimed=False).update(**claim):
+            return ImportChunk.objects.get(pk=candidate)
+
+    while True:
+        stale = (
+            claimable.filter(claimed=True, claimed_at__lt=_claim_cutoff(now))
+            .order_by("seq")
+            .values_list("pk", "claimed_at")
+            .first()
+        )
+        if stale is None:
+            return None
+        pk, claimed_at = stale
+        if claimable.filter(pk=pk, claimed_at=claimed_at).update(**claim):
+            logger.warning(f"ImportJob {job_id}: reclaimed stale chunk {pk}")
+            return ImportChunk.objects.get(pk=pk)
+
+
+def record_chunk(chunk, success, errors, duplicates=0, geo_stats=None):
+    """
+    Store a processed chunk's errors and add its counts to the job. Returns
+    False (and changes nothing) when the chunk was already recorded by a
+    slice that reclaimed it.
+    """
+    if not ImportChunk.objects.filter(pk=chunk.pk, done=False).update(
+        done=True, errors=errors, payload=b""
+    ):
+        logger.warning(f"ImportJob {chunk.job_id}: chunk {chunk.seq} was already recorded")
+        return False
+    counters = {}
+    if geo_stats is not None and geo_stats.rows:
+        counters = {
+            "geocode_rows": F("geocode_rows") + geo_stats.rows,
+            "geocode_points": F("geocode_points") + geo_stats.points,
+            "geocode_ms": F("geocode_ms") + geo_stats.seconds * 1000,
+            "geocode_saved_ms": F("geocode_saved_ms") + geo_stats.saved_seconds * 1000,
+        }
+    ImportJob.objects.filter(pk=chunk.job_id).update(
+        processed_rows=F("processed_rows") + chunk.length,
+        success_rows=F("success_rows") + success,
+        duplicate_rows=F("duplicate_rows") + duplicates,
+        failed_rows=F("failed_rows") + len(errors),
+        **counters,
+    )
+    return True
+
+
+def release_slice(job_id):
+    """
+    Called by a slice that found no chunk left after staging finished.
+    The last slice out finalizes the job.
+    """
+    ImportJob.objects.filter(pk=job_id).update(active_slices=F("active_slices") - 1)
+    if ImportJob.objects.filter(pk=job_id, active_slices__lte=0).exists():
+        finalize(job_id)
+
+
+def _unfinished(job_id, now=None):
+    """
+    Unrecorded chunks a slice may still record: unclaimed, claimed within
+    the timeout, or stale with attempts left.
+    """
+    return (
+        ImportChunk.objects.filter(job_id=job_id, done=False)
+        .exclude(
+            attempts__gte=settings.IMPORT_CHUNK_MAX_ATTEMPTS,
+            claimed_at__lt=_claim_cutoff(now),
+        )
+    )
+
+
+def _abandon_chunks(job_id):
+    """
+    Report the rows of chunks no slice ever recorded as failed, keeping
+    their values for retry_failed_rows. Returns (rows, errors).
+    """
+    from .failed_rows import store_failed_rows
+
+    rows = 0
+    errors = []
+    for chunk in ImportChunk.objects.filter(job_id=job_id, done=False).order_by("seq"):
+        row_index = range(chunk.start_index, chunk.start_index + chunk.length)
+        chunk_errors = [
+            {
+                "row": row,
+                "error": f"Chunk not processed: worker lost after {chunk.attempts} attempt(s)",
+            }
+            for row in row_index
+        ]
+        store_failed_rows(job_id, decode_chunk(chunk.payload), row_index, chunk_errors)
+        logger.error(f"ImportJob {job_id}: chunk {chunk.seq} ({chunk.length} rows) abandoned")
+        rows += chunk.length
+        errors.extend(chunk_errors)
+    return rows, errors
+
+
+def finalize(job_id):
+    """
+    Complete a job once every chunk is recorded or abandoned. Returns
+    without finalizing while a slice may still record a chunk.
+    """
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update().get(pk=job_id)
+        if job.status != "PROCESSING" or _unfinished(job_id).exists():
+            return job
+        abandoned_rows, abandoned_errors = _abandon_chunks(job_id)
+        errors = []
+        for chunk_errors in (
+            ImportChunk.objects.filter(job_id=job_id, done=True)
+            .order_by("seq")
+            .values_list("errors", flat=True)
+        ):
+            errors.extend(chunk_errors)
+        if abandoned_errors:
+            errors = sorted(errors + abandoned_errors, key=lambda e: e.get("row", 0))
+        job.status = "COMPLETED"
+        job.processed_rows += abandoned_rows
+        job.failed_rows += abandoned_rows
+        job.total_rows = job.processed_rows
+        job.error_report = errors
+        job.finished_at = timezone.now()
+        job.save()
+        ImportChunk.objects.filter(job_id=job_id).delete()
+    logger.info(f"ImportJob {job_id} completed ({job.processed_rows} rows)")
+    return job
+
+
+def recover_stalled_imports(now=None):
+    """
+    Restart slices of large jobs that have stopped making progress: staged,
+    started more than IMPORT_CHUNK_CLAIM_TIMEOUT ago, and no chunk claimed
+    since. That happens when slice messages are lost; a job with nothing
+    left to process is finalized directly. Returns the recovered job ids.
+    """
+    cutoff = _claim_cutoff(now)
+    stalled = (
+        ImportJob.objects.filter(
+            queue="large", status="PROCESSING", staging_done=True, started_at__lt=cutoff
+        )
+        .exclude(chunks__claimed_at__gte=cutoff)
+        .distinct()
+    )
+    recovered = []
+    for job in stalled:
+        if _unfinished(job.pk, now).exists():
+            logger.warning(f"ImportJob {job.pk}: no progress, restarting slices")
+            start_slices(job)
+        else:
+            finalize(job.pk)
+        recovered.append(job.pk)
+    return recovered
+
+
+# --------------------------------------------------------------- reporting
+def queue_position(job):
+    """
+    1-based position among PENDING jobs of the same queue, None once started.
+    """
+    if job.status != "PENDING":
+        return None
+    return (
+        ImportJob.objects.filter(
+            queue=job.queue, status="PENDING", created_at__lt=job.created_at
+        ).count()
+        + 1
+    )
+
+
+def throughput(queue):
+    """
+    Rows per second of recently completed jobs in a queue, falling back to
+    IMPORT_ROWS_PER_SECOND before there is any history.
+    """
+    recent = (
+        ImportJob.objects.filter(
+            queue=queue,
+            status="COMPLETED",
+            started_at__isnull=False,
+            finished_at__isnull=False,
+        )
+        .order_by("-finished_at")
+        .values_list("processed_rows", "started_at", "finished_at")[:THROUGHPUT_SAMPLE]
+    )
+    rows = seconds = 0
+    for processed, started, finished in recent:
+        rows += processed
+        seconds += (finished - started).total_seconds()
+    if rows and seconds > 0:
+        return rows / seconds
+    return settings.IMPORT_ROWS_PER_SECOND
+
+
+def _remaining(job):
+    return max((job.total_rows or job.estimated_rows) - job.processed_rows, 0)
+
+
+def _estimate(job, now, rate, active_large, ahead):
+    if job.queue == "large" and job.status == "PROCESSING":
+        return now + timedelta(seconds=_remaining(job) * max(active_large, 1) / rate)
+    if job.status == "PROCESSING":
+        ahead = 0
+    return now + timedelta(seconds=(max(ahead, 0) + _remaining(job)) / rate)
+
+
+def eta(job, now=None):
+    """
+    Estimated completion time. Pending jobs wait for the rows of every job
+    ahead of them in the same queue; large jobs split the queue's throughput
+    with the other active large jobs (round-robin).
+    """
+    if job.status in ("COMPLETED", "FAILED"):
+        return None
+    now = now or timezone.now()
+    rate = throughput(job.queue)
+
+    if job.queue == "large" and job.status == "PROCESSING":
+        active = ImportJob.objects.filter(queue="large", status="PROCESSING").count()
+        return _estimate(job, now, rate, active, 0)
+
+    ahead = 0
+    if job.status == "PENDING":
+        ahead = (
+            ImportJob.objects.filter(queue=job.queue, status__in=("PENDING", "PROCESSING"))
+            .filter(created_at__lt=job.created_at)
+            .aggregate(rows=Sum(F("estimated_rows") - F("processed_rows")))["rows"]
+            or 0
+        )
+    return _estimate(job, now, rate, 0, ahead)
+
+
+def queue_report(jobs, now=None):
+    """
+    {job id: (queue_position, eta)} for a page of jobs, from one query over
+    the waiting jobs and one throughput query per queue, instead of
+    queue_position() and eta() per job.
+    """
+    now = now or timezone.now()
+    jobs = [job for job in jobs if job.status in ("PENDING", "PROCESSING")]
+    if not jobs:
+        return {}
+    waiting = list(
+        ImportJob.objects.filter(status__in=("PENDING", "PROCESSING")).values_list(
+            "queue", "status", "created_at", "estimated_rows", "processed_rows"
+        )
+    )
+    active_large = sum(
+        1 for queue, status, *_ in waiting if queue == "large" and status == "PROCESSING"
+    )
+    rates = {queue: throughput(queue) for queue in {job.queue for job in jobs}}
+
+    report = {}
+    for job in jobs:
+        position = None
+        ahead = 0
+        if job.status == "PENDING":
+            earlier = [
+                row for row in waiting if row[0] == job.queue and row[2] < job.created_at
+            ]
+            position = sum(1 for row in earlier if row[1] == "PENDING") + 1
+            ahead = sum(estimated - processed for *_, estimated, processed in earlier)
+        report[job.pk] = (
+            position,
+            _estimate(job, now, rates[job.queue], active_large, ahead),
+        )
+    return report
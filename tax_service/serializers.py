@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import scheduler
 from .models import Order, ImportJob
 
 
@@ -7,19 +8,78 @@ class OrderCreateSerializer(serializers.Serializer):
     lon = serializers.FloatField()
     subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
     timestamp = serializers.DateTimeField(required=False)
+    external_id = serializers.CharField(max_length=64, required=False)
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    # Flattened from the Jurisdiction/RateApplication dimension rows so the
+    # API keeps its original shape.
+    geo_state = serializers.CharField(source="jurisdiction.state", read_only=True)
+    geo_county = serializers.CharField(source="jurisdiction.county", read_only=True)
+    geo_locality = serializers.CharField(
+        source="jurisdiction.locality", read_only=True, allow_null=True
+    )
+    geo_source = serializers.CharField(source="jurisdiction.source", read_only=True)
+    geo_raw_response = serializers.JSONField(
+        source="jurisdiction.raw_response", read_only=True
+    )
+    jurisdictions = serializers.JSONField(
+        source="rate_application.jurisdictions", read_only=True
+    )
+    breakdown = serializers.JSONField(read_only=True)
+
     class Meta:
         model = Order
-        fields = "__all__"
+        fields = [
+            "id",
+            "lat",
+            "lon",
+            "subtotal",
+            "order_timestamp",
+            "geo_state",
+            "geo_county",
+            "geo_locality",
+            "geo_source",
+            "geo_raw_response",
+            "composite_rate",
+            "tax_amount",
+            "total_amount",
+            "jurisdictions",
+            "breakdown",
+            "external_id",
+            "created_at",
+        ]
 
 
 class ImportJobSerializer(serializers.ModelSerializer):
+    queue_position = serializers.SerializerMethodField()
+    eta = serializers.SerializerMethodField()
+    dedupe_ratio = serializers.SerializerMethodField()
+
     class Meta:
         model = ImportJob
         fields = "__all__"
 
+    def _queue_entry(self, obj):
+        # Lists pass scheduler.queue_report() for the whole page in the context
+        report = self.context.get("queue_report")
+        if report is None:
+            return scheduler.queue_position(obj), scheduler.eta(obj)
+        return report.get(obj.pk, (None, None))
+
+    def get_queue_position(self, obj):
+        return self._queue_entry(obj)[0]
+
+    def get_eta(self, obj):
+        eta = self._queue_entry(obj)[1]
+        return eta.isoformat() if eta else None
+
+    def get_dedupe_ratio(self, obj):
+        # Share of geocoded rows answered by another row's rounded point
+        if not obj.geocode_rows:
+            return 0.0
+        return round(1 - obj.geocode_points / obj.geocode_rows, 4)
+
 
 class ImportJobCreateSerializer(serializers.Serializer):
     file = serializers.FileField()
@@ -1,8 +1,17 @@
+import copy
 from decimal import Decimal, ROUND_HALF_UP
 from django.db import transaction, models
 from django.utils import timezone
-from .models import Order, TaxRateAdmin
-from .geocoders import GeocodeProvider, GeocodeResult, VectorPolygonProvider
+from . import external_ids
+from .models import (
+    Jurisdiction,
+    Order,
+    OrderExternalId,
+    OrderRerate,
+    RateApplication,
+    TaxRateAdmin,
+)
+from .geocoders import GeocodeProvider, GeocodeResult, get_geocoder
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,19 +19,44 @@ logger = logging.getLogger(__name__)
 
 class TaxCalculationService:
     def __init__(self, geocoder=None):
-        self.geocoder = geocoder or VectorPolygonProvider()
+        self.geocoder = geocoder or get_geocoder()
 
     @transaction.atomic
     def process_order(
-        self, lat: float, lon: float, subtotal: str, order_timestamp=None
+        self,
+        lat: float,
+        lon: float,
+        subtotal: str,
+        order_timestamp=None,
+        external_id=None,
+        geo_result=None,
     ) -> Order:
+        order = self.quote(lat, lon, subtotal, order_timestamp, external_id, geo_result)
+        # 6. Create Order; a duplicate external_id fails on the claim and rolls back
+        order.intern_dimensions()
+        order.save(force_insert=True)
+        external_ids.claim([order])
+        return order
+
+    def quote(
+        self,
+        lat: float,
+        lon: float,
+        subtotal: str,
+        order_timestamp=None,
+        external_id=None,
+        geo_result=None,
+    ) -> Order:
+        """
+        Computes the full tax result as an unsaved Order. geo_result skips
+        geocoding when the point was already resolved (batch imports).
+        """
         if order_timestamp is None:
             order_timestamp = timezone.now()
 
-        subtotal_dec = Decimal(str(subtotal))
-
         # 1. Resolve Geo limits
-        geo_result = self.geocoder.resolve(lat, lon)
+        if geo_result is None:
+            geo_result = self.geocoder.resolve(lat, lon)
 
         # 2. Fetch Rate explicitly
         rate_record = self.fetch_rate(
@@ -30,8 +64,110 @@ class TaxCalculationService:
             county=geo_result.county,
             locality=geo_result.locality,
             date=order_timestamp,
+            special_districts=geo_result.special_districts,
+        )
+
+        return self.build_order(
+            lat, lon, subtotal, order_timestamp, geo_result, rate_record, external_id
+        )
+
+    async def aprocess_order(
+        self, lat: float, lon: float, subtotal: str, order_timestamp=None, external_id=None
+    ) -> Order:
+        order = await self.aquote(lat, lon, subtotal, order_timestamp, external_id)
+        await order.aintern_dimensions()
+        # No transaction here: claim the external_id first, attach the order after
+        claim = None
+        if external_id:
+            claim = await OrderExternalId.objects.acreate(external_id=external_id)
+        try:
+            await order.asave(force_insert=True)
+        except Exception:
+            if claim is not None:
+                await claim.adelete()
+            raise
+        if claim is not None:
+            await OrderExternalId.objects.filter(pk=claim.pk).aupdate(order_id=order.pk)
+        return order
+
+    async def aquote(
+        self, lat: float, lon: float, subtotal: str, order_timestamp=None, external_id=None
+    ) -> Order:
+        """
+        Async counterpart of quote for the ASGI path: non-blocking geocoding
+        and async ORM rate lookup.
+        """
+        if order_timestamp is None:
+            order_timestamp = timezone.now()
+
+        geo_result = await self.geocoder.aresolve(lat, lon)
+        rate_record = await self.afetch_rate(
+            state=geo_result.state,
+            county=geo_result.county,
+            locality=geo_result.locality,
+            date=order_timestamp,
+            special_districts=geo_result.special_districts,
+        )
+
+        return self.build_order(
+            lat, lon, subtotal, order_timestamp, geo_result, rate_record, external_id
+        )
+
+    def build_order(
+        self, lat, lon, subtotal, order_timestamp, geo_result, rate_record, external_id=None
+    ):
+        subtotal_dec = Decimal(str(subtotal))
+
+        composite_rate, tax_amount, total_amount, jurisdictions, breakdown = (
+            self.compute_tax(subtotal_dec, rate_record)
         )
 
+        # Determine source (was it cached or fresh hit?)
+        # Since our NominatimProvider saves to DB during fresh request but we didn't explicitly separate cache-hit vs miss in return,
+        # we can just log the provider name as the source format.
+        geo_source = getattr(
+            self.geocoder, "provider_name", "unknown"
+        )  # Dynamically pull the provider name
+
+        return Order(
+            lat=lat,
+            lon=lon,
+            subtotal=subtotal_dec,
+            order_timestamp=order_timestamp,
+            jurisdiction=Jurisdiction(
+                state=geo_result.state,
+                county=geo_result.county,
+                locality=geo_result.locality,
+                source=geo_source,
+                raw_response=geo_result.raw_response,
+            ),
+            rate_application=self.rate_application(
+                composite_rate, jurisdictions, breakdown
+            ),
+            composite_rate=composite_rate,
+            tax_amount=tax_amount,
+            total_amount=total_amount,
+            external_id=external_id,
+        )
+
+    @staticmethod
+    def rate_application(composite_rate, jurisdictions, breakdown):
+        """
+        Unsaved RateApplication for a compute_tax result; per-order component
+        amounts are dropped since they are derived from the subtotal.
+        """
+        return RateApplication(
+            composite_rate=composite_rate,
+            jurisdictions=jurisdictions,
+            components=[{"name": b["name"], "rate": b["rate"]} for b in breakdown],
+        )
+
+    @staticmethod
+    def compute_tax(subtotal_dec, rate_record):
+        """
+        Pure tax math for a subtotal under a rate record (or None for no nexus).
+        Returns (composite_rate, tax_amount, total_amount, jurisdictions, breakdown).
+        """
         if not rate_record:
             # Fallback for out-of-state or completely unknown zones
             # We treat this as 0% tax nexus.
@@ -86,7 +222,10 @@ class TaxCalculationService:
                 )
 
             if rate_record.rate_special and rate_record.rate_special > 0:
-                jurisdictions.append("Special District")
+                jurisdictions.extend(
+                    getattr(rate_record, "special_district_names", None)
+                    or ["Special District"]
+                )
                 special_tax = (subtotal_dec * rate_record.rate_special).quantize(
                     Decimal("0.01"), rounding=ROUND_HALF_UP
                 )
@@ -104,55 +243,231 @@ class TaxCalculationService:
         )
         total_amount = subtotal_dec + tax_amount
 
-        # Determine source (was it cached or fresh hit?)
-        # Since our NominatimProvider saves to DB during fresh request but we didn't explicitly separate cache-hit vs miss in return,
-        # we can just log the provider name as the source format.
-        geo_source = getattr(
-            self.geocoder, "provider_name", "unknown"
-        )  # Dynamically pull the provider name
-
-        # 6. Create Order
-        order = Order.objects.create(
-            lat=lat,
-            lon=lon,
-            subtotal=subtotal_dec,
-            order_timestamp=order_timestamp,
-            geo_state=geo_result.state,
-            geo_county=geo_result.county,
-            geo_locality=geo_result.locality,
-            geo_source=geo_source,
-            geo_raw_response=geo_result.raw_response,
-            composite_rate=composite_rate,
-            tax_amount=tax_amount,
-            total_amount=total_amount,
-            jurisdictions=jurisdictions,
-            breakdown=breakdown,
-        )
+        return composite_rate, tax_amount, total_amount, jurisdictions, breakdown
 
-        return order
-
-    def fetch_rate(self, state, county, locality, date):
+    def _rate_lookups(self, state, county, locality, date, special_districts=()):
+        """
+        Returns (base lookups, district lookups). Base lookups are rate
+        querysets in match priority order: exact locality, county-level
+        rate, then state-only fallback; the fallbacks skip special district
+        rows. District lookups hold one queryset per special district (rows
+        whose locality is the district name, e.g. "MCTD", with rate_special
+        set); their rate_special is added on top of the base.
+        """
         # Base query for the exact date interval
         # If State is not NY (e.g., 'New York' vs something else), handle properly according to actual state nomenclature
         # We assume the database is pre-filled with correctly normalized names.
 
-        qs = TaxRateAdmin.objects.filter(
+        qs = TaxRateAdmin.objects.active().filter(
             state__iexact=state, valid_from__lte=date
         ).filter(models.Q(valid_to__isnull=True) | models.Q(valid_to__gte=date))
+        # Special district rows are never a base rate
+        base = qs.filter(rate_special__isnull=True)
 
+        lookups = []
         # Try matching exact locality first
         if locality:
-            exact_match = qs.filter(
-                county__iexact=county, locality__iexact=locality
-            ).first()
-            if exact_match:
-                return exact_match
+            lookups.append(qs.filter(county__iexact=county, locality__iexact=locality))
 
         # Fallback to county-level generic rate (locality is null or empty, or any default locality seeded for the county)
-        base_county_match = qs.filter(county__iexact=county).first()
-
-        if base_county_match:
-            return base_county_match
+        lookups.append(base.filter(county__iexact=county))
 
         # Complete fallback (just state match)
-        return qs.first()
+        lookups.append(base)
+
+        districts = [
+            qs.filter(county__iexact=county, locality__iexact=district)
+            for district in special_districts or ()
+        ]
+        return lookups, districts
+
+    @staticmethod
+    def with_special_districts(rate_record, districts):
+        """
+        The base rate record with the rate_special of every matched special
+        district added, as an unsaved copy naming the districts in
+        special_district_names. None stays None (no nexus).
+        """
+        districts = [d for d in districts if d is not None]
+        if rate_record is None or not districts:
+            return rate_record
+        combined = copy.copy(rate_record)
+        combined.rate_special = (rate_record.rate_special or Decimal("0.0000")) + sum(
+            (d.rate_special or Decimal("0.0000") for d in districts), Decimal("0.0000")
+        )
+        combined.special_district_names = [d.locality for d in districts]
+        return combined
+
+    def fetch_rate(self, state, county, locality, date, special_districts=()):
+        lookups, districts = self._rate_lookups(
+            state, county, locality, date, special_districts
+        )
+        for lookup in lookups:
+            match = lookup.first()
+            if match:
+                return self.with_special_districts(match, [d.first() for d in districts])
+        return None
+
+    async def afetch_rate(self, state, county, locality, date, special_districts=()):
+        lookups, districts = self._rate_lookups(
+            state, county, locality, date, special_districts
+        )
+        for lookup in lookups:
+            match = await lookup.afirst()
+            if match:
+                return self.with_special_districts(
+                    match, [await d.afirst() for d in districts]
+                )
+        return None
+
+
+class RateMatcher:
+    """
+    In-memory mirror of TaxCalculationService.fetch_rate over a preloaded
+    rate table, so bulk jobs don't issue one rate query per order.
+    """
+
+    def __init__(self, rates):
+        self._by_state = {}
+        self._by_county = {}
+        self._by_locality = {}
+        # fetch_rate's .first() on an unordered queryset picks the lowest pk
+        for rate in sorted(rates, key=lambda r: r.pk):
+            state, county = rate.state.lower(), rate.county.lower()
+            if rate.rate_special is None:
+                # Special district rows are only added on top of a base rate
+                self._by_state.setdefault(state, []).append(rate)
+                self._by_county.setdefault((state, county), []).append(rate)
+            if rate.locality:
+                key = (state, county, rate.locality.lower())
+                self._by_locality.setdefault(key, []).append(rate)
+
+    @staticmethod
+    def _first_valid(candidates, date):
+        for rate in candidates:
+            if rate.valid_from <= date and (rate.valid_to is None or rate.valid_to >= date):
+                return rate
+        return None
+
+    def _locality(self, state, county, name, date):
+        return self._first_valid(
+            self._by_locality.get((state, county, name.lower()), []), date
+        )
+
+    def match(self, state, county, locality, date, special_districts=()):
+        state, county = (state or "").lower(), (county or "").lower()
+        base = (
+            (locality and self._locality(state, county, locality, date))
+            or self._first_valid(self._by_county.get((state, county), []), date)
+            or self._first_valid(self._by_state.get(state, []), date)
+        )
+        return TaxCalculationService.with_special_districts(
+            base,
+            [self._locality(state, county, name, date) for name in special_districts or ()],
+        )
+
+
+class OrderRerateService:
+    """
+    Re-rates stored orders of a RerateJob's jurisdiction and period in
+    pk-ordered chunks: rates are matched in memory, each chunk is written with
+    one bulk_update and its audit deltas with one bulk_create.
+    """
+
+    UPDATE_FIELDS = [
+        "composite_rate",
+        "tax_amount",
+        "total_amount",
+        "rate_application",
+    ]
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+
+    def affected_orders(self, job):
+        qs = Order.objects.filter(jurisdiction__state__iexact=job.state)
+        if job.county:
+            qs = qs.filter(jurisdiction__county__iexact=job.county)
+        if job.locality:
+            qs = qs.filter(jurisdiction__locality__iexact=job.locality)
+        if job.period_start:
+            qs = qs.filter(order_timestamp__gte=job.period_start)
+        if job.period_end:
+            qs = qs.filter(order_timestamp__lte=job.period_end)
+        return qs
+
+    def run(self, job):
+        matcher = RateMatcher(TaxRateAdmin.objects.active().filter(state__iexact=job.state))
+        qs = (
+            self.affected_orders(job)
+            .select_related("jurisdiction", "rate_application")
+            .only(
+                "id",
+                "subtotal",
+                "order_timestamp",
+                "jurisdiction__state",
+                "jurisdiction__county",
+                "jurisdiction__locality",
+                "jurisdiction__raw_response",
+                "rate_application__content_hash",
+                *self.UPDATE_FIELDS,
+            )
+            .order_by("pk")
+        )
+
+        last_pk = 0
+        while True:
+            chunk = list(qs.filter(pk__gt=last_pk)[: self.chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            changed, deltas, tax_delta = [], [], Decimal("0.00")
+            for order in chunk:
+                rate_record = matcher.match(
+                    order.jurisdiction.state,
+                    order.jurisdiction.county,
+                    order.jurisdiction.locality,
+                    order.order_timestamp,
+                    order.jurisdiction.special_districts,
+                )
+                composite_rate, tax_amount, total_amount, jurisdictions, breakdown = (
+                    TaxCalculationService.compute_tax(order.subtotal, rate_record)
+                )
+                application = TaxCalculationService.rate_application(
+                    composite_rate, jurisdictions, breakdown
+                )
+                if (
+                    tax_amount == order.tax_amount
+                    and application.compute_hash()
+                    == order.rate_application.content_hash
+                ):
+                    continue
+
+                deltas.append(
+                    OrderRerate(
+                        rerate_job=job,
+                        order_id=order.pk,
+                        old_composite_rate=order.composite_rate,
+                        new_composite_rate=composite_rate,
+                        old_tax_amount=order.tax_amount,
+                        new_tax_amount=tax_amount,
+                    )
+                )
+                tax_delta += tax_amount - order.tax_amount
+                order.composite_rate = composite_rate
+                order.tax_amount = tax_amount
+                order.total_amount = total_amount
+                order.rate_application = RateApplication.objects.intern(application)
+                changed.append(order)
+
+            with transaction.atomic():
+                if changed:
+                    Order.objects.bulk_update(changed, self.UPDATE_FIELDS)
+                    OrderRerate.objects.bulk_create(deltas)
+                job.matched_orders += len(chunk)
+                job.changed_orders += len(changed)
+                job.tax_delta += tax_delta
+                job.save(update_fields=["matched_orders", "changed_orders", "tax_delta"])
+
+        return job
@@ -0,0 +1,68 @@
+"""
+WhiteNoise for both handler modes.
+
+WhiteNoiseMiddleware (6.x) is sync-only, so under ASGI Django would adapt
+the middleware chain around it and run every async view through
+async_to_sync, holding a thread per in-flight request. This subclass is
+async-capable: in async mode the file lookup (an in-memory dict unless
+WHITENOISE_AUTOREFRESH) runs inline, and opening and reading the file go to
+the thread pool one block at a time. Under WSGI it behaves exactly like
+WhiteNoiseMiddleware.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseFileResponse, WhiteNoiseMiddleware
+
+# Bytes per read when streaming a file to an ASGI server
+BLOCK_SIZE = 64 * 1024
+
+
+async def _file_blocks(file, block_size=BLOCK_SIZE):
+    if file is None:
+        # HEAD and 304 responses have no body
+        return
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while block := await read(block_size):
+            yield block
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(
+                request.path_info
+            )
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+
+        # get_response opens the file (or picks the compressed variant)
+        response = await sync_to_async(static_file.get_response, thread_sensitive=False)(
+            request.method, request.META
+        )
+        http_response = WhiteNoiseFileResponse(
+            _file_blocks(response.file), status=int(response.status)
+        )
+        del http_response["content-type"]
+        for key, value in response.headers:
+            http_response[key] = value
+        return http_response
@@ -0,0 +1,295 @@
+"""
+Redis Streams ingestion for continuous order feeds.
+
+Producers XADD one entry per delivery to ORDER_STREAM_KEY with the fields
+of POST /api/orders/ (lat, lon, subtotal, timestamp, external_id). Each
+`python manage.py consume_order_stream` process is one consumer of the
+ORDER_STREAM_GROUP consumer group; Redis hands every entry to exactly one
+consumer, so throughput scales by starting more consumers.
+
+A consumer collects entries into micro-batches of up to
+ORDER_STREAM_BATCH_SIZE, waiting at most ORDER_STREAM_WINDOW_MS after the
+first entry of a batch, then runs the import path on the whole batch:
+column validation, one resolve_many call over the unique rounded points
+(utils/spatial.py), in-memory rate matching against the active rate set,
+and one bulk_create. Entries are XACKed only after that transaction
+commits.
+
+Delivery is at-least-once. Entries a crashed consumer read but never acked
+stay pending; after ORDER_STREAM_CLAIM_IDLE_MS any live consumer XCLAIMs
+and processes them. Include external_id in events: a redelivered entry
+whose order was already committed is then counted as a duplicate instead
+of inserted twice. Invalid entries, and entries delivered
+ORDER_STREAM_MAX_DELIVERIES times without success, are copied to
+"<stream>:dead" with the error and acked.
+"""
+
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import external_ids
+from .models import Order, RateSet, TaxRateAdmin
+from .services import RateMatcher, TaxCalculationService
+from .utils.columnar import parse_columns
+from .utils.spatial import resolve_unique
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ("lat", "lon", "subtotal", "timestamp", "external_id")
+DEAD_LETTER_SUFFIX = ":dead"
+# Approximate cap on the dead-letter stream
+DEAD_LETTER_MAXLEN = 100_000
+
+
+def get_stream_client(url=None):
+    import redis
+
+    return redis.Redis.from_url(url or settings.ORDER_STREAM_REDIS_URL, decode_responses=True)
+
+
+def publish_order(client, stream=None, maxlen=None, **fields):
+    """
+    XADD one order event; returns its stream id.
+    """
+    event = {k: str(v) for k, v in fields.items() if k in EVENT_FIELDS and v is not None}
+    return client.xadd(
+        stream or settings.ORDER_STREAM_KEY, event, maxlen=maxlen, approximate=True
+    )
+
+
+def entry_age_ms(entry_id, now=None):
+    # Stream ids start with the XADD time in milliseconds
+    now = time.time() if now is None else now
+    return now * 1000 - int(entry_id.split("-", 1)[0])
+
+
+class ActiveRates:
+    """
+    RateMatcher over the active rate set, rebuilt when a different set is
+    activated (see rates.py), at the cost of one small query per batch.
+    """
+
+    def __init__(self):
+        self._rate_set_id = None
+        self._matcher = None
+
+    def matcher(self):
+        active = RateSet.objects.filter(is_active=True).values_list("id", flat=True).first()
+        if self._matcher is None or active != self._rate_set_id:
+            self._matcher = RateMatcher(TaxRateAdmin.objects.filter(rate_set_id=active))
+            self._rate_set_id = active
+        return self._matcher
+
+
+class StreamConsumer:
+    def __init__(
+        self,
+        client,
+        stream=None,
+        group=None,
+        consumer=None,
+        batch_size=None,
+        window_ms=None,
+        block_ms=1000,
+        claim_idle_ms=None,
+        max_deliveries=None,
+        service=None,
+    ):
+        self.client = client
+        self.stream = stream or settings.ORDER_STREAM_KEY
+        self.group = group or settings.ORDER_STREAM_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size or settings.ORDER_STREAM_BATCH_SIZE
+        if window_ms is None:
+            window_ms = settings.ORDER_STREAM_WINDOW_MS
+        self.window = window_ms / 1000
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms or settings.ORDER_STREAM_CLAIM_IDLE_MS
+        self.max_deliveries = max_deliveries or settings.ORDER_STREAM_MAX_DELIVERIES
+        self.dead_letter_stream = f"{self.stream}{DEAD_LETTER_SUFFIX}"
+        self.service = service or TaxCalculationService()
+        self.rates = ActiveRates()
+        self._last_reclaim = 0.0
+
+    def ensure_group(self):
+        import redis
+
+        try:
+            # New groups start at the end of the stream; backfills go through import_csv
+            self.client.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    # ------------------------------------------------------------- reading
+    def read_batch(self, limit=None):
+        """
+        Up to limit (default batch_size) new entries: blocks up to block_ms
+        for the first, then at most the batching window for the rest.
+        """
+        limit = limit or self.batch_size
+        entries = []
+        deadline = None
+        while len(entries) < limit:
+            if deadline is None:
+                block = self.block_ms
+            else:
+                block = int((deadline - time.monotonic()) * 1000)
+                if block <= 0:
+                    break
+            response = self.client.xreadgroup(
+                self.group,
+                self.consumer,
+                {self.stream: ">"},
+                count=limit - len(entries),
+                block=block,
+            )
+            if not response:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.window
+            entries.extend(response[0][1])
+        return entries
+
+    def reclaim(self):
+        """
+        Claim entries other consumers left pending longer than
+        claim_idle_ms. Ones already delivered max_deliveries times are
+        dead-lettered instead. Returns the entries to process.
+        """
+        pending = self.client.xpending_range(
+            self.stream,
+            self.group,
+            min="-",
+            max="+",
+            count=self.batch_size,
+            idle=self.claim_idle_ms,
+        )
+        if not pending:
+            return []
+        claimed = self.client.xclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            self.claim_idle_ms,
+            [p["message_id"] for p in pending],
+        )
+        exhausted = {
+            p["message_id"] for p in pending if p["times_delivered"] >= self.max_deliveries
+        }
+        entries, dead = [], {}
+        for entry_id, fields in claimed:
+            if entry_id in exhausted:
+                dead[entry_id] = (
+                    fields or {},
+                    f"Not processed after {self.max_deliveries} deliveries",
+                )
+            else:
+                entries.append((entry_id, fields or {}))
+        if dead:
+            self._acknowledge([], dead)
+        if claimed:
+            logger.info(
+                f"Reclaimed {len(entries)} pending entries, dead-lettered {len(dead)}"
+            )
+        return entries
+
+    # ---------------------------------------------------------- processing
+    def process(self, entries):
+        """
+        Rate and insert one micro-batch, then ack it. Returns
+        (written, duplicates, dead_lettered). Raises (without acking) when
+        geocoding or the database fails, so the entries are retried.
+        """
+        if not entries:
+            return 0, 0, 0
+        columns = {
+            name: [fields.get(name) for _, fields in entries] for name in EVENT_FIELDS
+        }
+        batch, rejected = parse_columns(columns, len(entries), start_index=0)
+        dead = {
+            entries[e["row"]][0]: (entries[e["row"]][1], e["error"]) for e in rejected
+        }
+
+        seen = external_ids.claimed(batch.external_id)
+        rows = []
+        for row in batch.rows():
+            external_id = row[5]
+            if external_id in seen:
+                continue
+            if external_id:
+                seen.add(external_id)
+            rows.append(row)
+        duplicates = len(batch) - len(rows)
+
+        geo_results = resolve_unique(
+            self.service.geocoder, [(row[1], row[2]) for row in rows]
+        )
+        matcher = self.rates.matcher()
+        orders = []
+        for (index, lat, lon, subtotal, order_timestamp, external_id), geo in zip(
+            rows, geo_results
+        ):
+            rate_record = matcher.match(
+                geo.state, geo.county, geo.locality, order_timestamp, geo.special_districts
+            )
+            order = self.service.build_order(
+                lat, lon, subtotal, order_timestamp, geo, rate_record, external_id
+            )
+            order.intern_dimensions()
+            orders.append(order)
+
+        written = len(orders)
+        try:
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                external_ids.claim(orders)
+        except IntegrityError:
+            # Another consumer (or import) claimed some external_id first
+            written = 0
+            for order in orders:
+                order.pk = None
+                try:
+                    with transaction.atomic():
+                        Order.objects.bulk_create([order])
+                        external_ids.claim([order])
+                    written += 1
+                except IntegrityError:
+                    duplicates += 1
+
+        self._acknowledge([entry_id for entry_id, _ in entries], dead)
+        return written, duplicates, len(dead)
+
+    def _acknowledge(self, entry_ids, dead):
+        pipe = self.client.pipeline(transaction=True)
+        for entry_id, (fields, error) in dead.items():
+            pipe.xadd(
+                self.dead_letter_stream,
+                {**fields, "entry_id": entry_id, "error": error, "consumer": self.consumer},
+                maxlen=DEAD_LETTER_MAXLEN,
+                approximate=True,
+            )
+        ids = list(entry_ids) + [entry_id for entry_id in dead if entry_id not in entry_ids]
+        if ids:
+            pipe.xack(self.stream, self.group, *ids)
+        pipe.execute()
+
+    def step(self):
+        """
+        One loop iteration: reclaim stale entries (at most every half
+        claim_idle_ms), then read and process a micro-batch. Returns the
+        processed entries and process()'s counts.
+        """
+        entries = []
+        now = time.monotonic()
+        if now - self._last_reclaim >= self.claim_idle_ms / 2000:
+            self._last_reclaim = now
+            entries = self.reclaim()
+        if len(entries) < self.batch_size:
+            entries += self.read_batch(self.batch_size - len(entries))
+        return entries, self.process(entries)
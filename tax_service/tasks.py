@@ -1,102 +1,143 @@
+import base64
+import contextlib
 import csv
 import io
 import traceback
 from django.utils import timezone
-from django.utils.dateparse import parse_datetime
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from celery import shared_task
-from .models import ImportJob
-from .services import TaxCalculationService
+from .models import ImportJob, RerateJob
+from .services import OrderRerateService, TaxCalculationService
+from . import external_ids, scheduler
+from .failed_rows import read_patch, retry_failed_rows, store_failed_rows
+from .profiling import profile_job
+from .utils.columnar import parse_columns, resolve_columns, split_columns
+from .utils.compression import open_text_stream
+from .utils.spatial import GeocodeStats, resolve_unique
 import logging
 
 logger = logging.getLogger(__name__)
 
+IMPORT_BATCH_SIZE = 500
 
-def process_batch(task_self, service, job_id, batch):
+
+def process_batch(task_self, service, job_id, batch, geo_stats=None):
+    """
+    Runs the already parsed and validated rows of a ColumnarBatch through
+    the tax service. Only geocoding/DB failures can be reported from here.
+
+    Rows whose external_id was already imported (or repeats earlier in the
+    batch) are skipped without geocoding and counted as duplicates. The
+    other points are deduplicated by rounded coordinate and the unique ones
+    geocoded together, in Hilbert order, with one resolve_many call
+    (counted in geo_stats); if that fails, each row is geocoded on its own
+    so errors stay per row. Returns (success_count, duplicate_count, errors).
+    """
     success_count = 0
+    duplicate_count = 0
     errors = []
 
-    for row_idx, row in batch:
+    seen = external_ids.claimed(batch.external_id)
+
+    rows = list(batch.rows())
+    pending = [row for row in rows if row[5] not in seen]
+    try:
+        resolved = resolve_unique(
+            service.geocoder, [(row[1], row[2]) for row in pending], geo_stats
+        )
+        geo_results = {row[0]: geo for row, geo in zip(pending, resolved)}
+    except Exception as e:
+        logger.warning(f"Batch geocoding failed ({e}), resolving rows one by one")
+        geo_results = {}
+
+    for row_idx, lat, lon, subtotal, order_timestamp, external_id in rows:
+        if external_id in seen:
+            duplicate_count += 1
+            continue
         try:
             with transaction.atomic():
-                lat = float(row.get("lat") or row.get("latitude"))
-                lon = float(row.get("lon") or row.get("longitude"))
-                subtotal = row.get("subtotal") or row.get("amount") or "0.00"
-                timestamp_str = row.get("timestamp") or row.get("date")
-                if timestamp_str:
-                    dt = parse_datetime(timestamp_str)
-                    if dt and timezone.is_naive(dt):
-                        order_timestamp = timezone.make_aware(dt)
-                    else:
-                        order_timestamp = dt or timezone.now()
-                else:
-                    order_timestamp = timezone.now()
-
                 service.process_order(
-                    lat=lat, lon=lon, subtotal=subtotal, order_timestamp=order_timestamp
+                    lat=lat,
+                    lon=lon,
+                    subtotal=subtotal,
+                    order_timestamp=order_timestamp,
+                    external_id=external_id,
+                    geo_result=geo_results.get(row_idx),
                 )
                 success_count += 1
+        except IntegrityError as e:
+            # A concurrent import claimed the same external_id first
+            if external_id and external_ids.claimed([external_id]):
+                duplicate_count += 1
+            else:
+                errors.append({"row": row_idx, "error": str(e)})
         except Exception as e:
             errors.append({"row": row_idx, "error": str(e)})
+        if external_id:
+            seen.add(external_id)
 
-    return success_count, errors
+    return success_count, duplicate_count, errors
 
 
-@shared_task(bind=True)
-def import_orders_task(self, job_id, file_content):
+def _start_job(job_id, total_rows=None):
     try:
         job = ImportJob.objects.get(id=job_id)
     except ImportJob.DoesNotExist:
         logger.error(f"ImportJob {job_id} not found.")
-        return
+        return None
 
     job.status = "PROCESSING"
     job.started_at = timezone.now()
-    # Pre-compute total rows approximately
-    total_lines = len(file_content.strip().split("\n")) - 1
-    job.total_rows = max(total_lines, 0)
+    if total_rows is not None:
+        job.total_rows = max(total_rows, 0)
     job.save()
+    return job
 
+
+def run_import(task_self, job, chunks):
+    """
+    Shared driver for every import format. chunks yields
+    ({"lat": [...], ...}, chunk_length) column chunks in file order.
+    """
     service = TaxCalculationService()
-    batch_size = 500
-    batch = []
+    start_index = job.row_offset + 1
 
     total_processed = 0
     total_success = 0
+    total_duplicates = 0
     total_failed = 0
     errors = []
+    geo_stats = GeocodeStats()
 
     try:
-        f = io.StringIO(file_content)
-        reader = csv.DictReader(f)
-
-        for row_idx, row in enumerate(reader, start=1):
-            batch.append((row_idx, row))
-
-            if len(batch) >= batch_size:
-                s, f_err = process_batch(self, service, job_id, batch)
-                total_success += s
-                errors.extend(f_err)
-                total_failed += len(f_err)
-                total_processed += len(batch)
-                batch = []
-
-                job.processed_rows = total_processed
-                job.save(update_fields=["processed_rows"])
-
-        if batch:
-            s, f_err = process_batch(self, service, job_id, batch)
+        for values, length in chunks:
+            parsed, rejected = parse_columns(values, length, start_index=start_index)
+            s, d, f_err = process_batch(task_self, service, job.id, parsed, geo_stats)
+            f_err = sorted(rejected + f_err, key=lambda e: e["row"])
+            store_failed_rows(
+                job.id, values, range(start_index, start_index + length), f_err
+            )
+            start_index += length
             total_success += s
+            total_duplicates += d
             errors.extend(f_err)
             total_failed += len(f_err)
-            total_processed += len(batch)
+            total_processed += length
+
+            job.processed_rows = total_processed
+            job.save(update_fields=["processed_rows"])
 
         job.status = "COMPLETED"
         job.total_rows = total_processed
         job.processed_rows = total_processed
         job.success_rows = total_success
+        job.duplicate_rows = total_duplicates
         job.failed_rows = total_failed
         job.error_report = errors
+        job.geocode_rows = geo_stats.rows
+        job.geocode_points = geo_stats.points
+        job.geocode_ms = geo_stats.seconds * 1000
+        job.geocode_saved_ms = geo_stats.saved_seconds * 1000
         job.finished_at = timezone.now()
         job.save()
 
@@ -108,3 +149,219 @@ def import_orders_task(self, job_id, file_content):
         )
         job.finished_at = timezone.now()
         job.save()
+
+
+def iter_csv_columns(f, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Yields ({"lat": [...], ...}, length) raw string column chunks.
+    """
+    reader = csv.reader(f)
+    # Header aliases are resolved once per file, not per row.
+    columns = resolve_columns(next(reader, []))
+    batch = []
+
+    for row in reader:
+        if not row:
+            continue
+        batch.append(row)
+
+        if len(batch) >= batch_size:
+            yield split_columns(batch, columns), len(batch)
+            batch = []
+
+    if batch:
+        yield split_columns(batch, columns), len(batch)
+
+
+def csv_source(file_content=None, payload=None, compression=None):
+    """
+    Plain CSV arrives as decoded text in file_content. Compressed uploads
+    (gzip/zip) arrive as base64 payload and are decompressed and decoded
+    incrementally while rows are read.
+    """
+    if payload is not None:
+        return open_text_stream(base64.b64decode(payload), compression)
+    return contextlib.nullcontext(io.StringIO(file_content))
+
+
+@shared_task(bind=True)
+def import_orders_task(self, job_id, file_content=None, payload=None, compression=None):
+    total_rows = None
+    if file_content is not None:
+        # Pre-compute total rows approximately
+        total_rows = len(file_content.strip().split("\n")) - 1
+
+    job = _start_job(job_id, total_rows)
+    if job is None:
+        return
+
+    source = csv_source(file_content, payload, compression)
+
+    def chunks():
+        with source as f:
+            yield from iter_csv_columns(f)
+
+    with profile_job(job, f"{self.name} job {job.id}"):
+        run_import(self, job, chunks())
+
+
+@shared_task(bind=True)
+def import_parquet_task(self, job_id, payload):
+    """
+    Parquet uploads arrive as base64 payload and are read one row group at a
+    time, so typed values go straight to validation without CSV text parsing.
+    """
+    from .utils.parquet import iter_order_columns, parquet_row_count
+
+    data = base64.b64decode(payload)
+    try:
+        total_rows = parquet_row_count(data)
+    except Exception:
+        # Unreadable file; run_import records the error on the job.
+        total_rows = None
+
+    job = _start_job(job_id, total_rows)
+    if job is None:
+        return
+
+    with profile_job(job, f"{self.name} job {job.id}"):
+        run_import(self, job, iter_order_columns(data, chunk_size=IMPORT_BATCH_SIZE))
+
+
+@shared_task(bind=True)
+def stage_import_task(self, job_id, kind, file_content=None, payload=None, compression=None):
+    """
+    First step of a large import: split the upload into ImportChunk rows
+    and start the job's chunk slices (see scheduler.py).
+    """
+    job = _start_job(job_id)
+    if job is None:
+        return
+    job.total_rows = job.estimated_rows
+    job.save(update_fields=["total_rows"])
+
+    try:
+        if kind == "parquet":
+            from .utils.parquet import iter_order_columns
+
+            columns = iter_order_columns(
+                base64.b64decode(payload), chunk_size=IMPORT_BATCH_SIZE
+            )
+            scheduler.stage_chunks(job, columns)
+        else:
+            with csv_source(file_content, payload, compression) as f:
+                scheduler.stage_chunks(job, iter_csv_columns(f))
+    except Exception as e:
+        logger.exception(f"Critical error staging import job {job_id}: {e}")
+        job.refresh_from_db()
+        job.status = "FAILED"
+        job.error_report.append(
+            {"global_error": str(e), "trace": traceback.format_exc()}
+        )
+        job.finished_at = timezone.now()
+        job.save()
+        job.chunks.all().delete()
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def import_chunk_task(self, job_id):
+    """
+    One slice step of a large import: process a single staged chunk, then
+    go to the back of the queue so other active jobs get their turn. Acked
+    after it returns, so a lost worker's chunk is redelivered and resumed.
+    """
+    job = (
+        ImportJob.objects.filter(id=job_id)
+        .only("status", "staging_done", "profile")
+        .first()
+    )
+    if job is None or job.status != "PROCESSING":
+        return
+
+    chunk = scheduler.claim_chunk(job_id, self.request.id or "")
+    if chunk is None:
+        if job.staging_done:
+            scheduler.release_slice(job_id)
+        else:
+            # Staging is behind the slices; poll again shortly.
+            import_chunk_task.apply_async(
+                (job_id,), queue=scheduler.queue_name("large"), countdown=1
+            )
+        return
+
+    values = None
+    row_index = range(chunk.start_index, chunk.start_index + chunk.length)
+    geo_stats = GeocodeStats()
+    try:
+        with profile_job(job, f"{self.name} job {job_id} chunk {chunk.seq}"):
+            values = scheduler.decode_chunk(chunk.payload)
+            parsed, rejected = parse_columns(
+                values, chunk.length, start_index=chunk.start_index
+            )
+            success, duplicates, errors = process_batch(
+                self, TaxCalculationService(), job_id, parsed, geo_stats
+            )
+        errors = sorted(rejected + errors, key=lambda e: e["row"])
+    except Exception as e:
+        logger.exception(f"Critical error in import job {job_id} chunk {chunk.seq}: {e}")
+        success = duplicates = 0
+        errors = [{"row": row, "error": f"Chunk failed: {e}"} for row in row_index]
+    with transaction.atomic():
+        recorded = scheduler.record_chunk(
+            chunk, success, errors, duplicates=duplicates, geo_stats=geo_stats
+        )
+        if recorded and values is not None:
+            store_failed_rows(job_id, values, row_index, errors)
+
+    import_chunk_task.apply_async((job_id,), queue=scheduler.queue_name("large"))
+
+
+@shared_task(bind=True)
+def retry_failed_rows_task(self, job_id, patch_content=None):
+    """
+    Reprocess only the stored failed rows of an import job, with optional
+    corrections from a patch CSV (see failed_rows.py).
+    """
+    try:
+        job = ImportJob.objects.get(id=job_id)
+    except ImportJob.DoesNotExist:
+        logger.error(f"ImportJob {job_id} not found.")
+        return
+
+    try:
+        with profile_job(job, f"{self.name} job {job_id}"):
+            retry_failed_rows(job, read_patch(patch_content) if patch_content else None)
+    except Exception as e:
+        logger.exception(f"Critical error retrying import job {job_id}: {e}")
+        job.refresh_from_db()
+        job.status = "FAILED"
+        job.error_report.append(
+            {"global_error": str(e), "trace": traceback.format_exc()}
+        )
+        job.finished_at = timezone.now()
+        job.save()
+
+
+@shared_task(bind=True)
+def rerate_orders_task(self, rerate_job_id):
+    try:
+        job = RerateJob.objects.get(id=rerate_job_id)
+    except RerateJob.DoesNotExist:
+        logger.error(f"RerateJob {rerate_job_id} not found.")
+        return
+
+    job.status = "PROCESSING"
+    job.started_at = timezone.now()
+    job.save()
+
+    try:
+        OrderRerateService().run(job)
+        job.status = "COMPLETED"
+    except Exception as e:
+        logger.exception(f"Critical error in rerate job {rerate_job_id}: {e}")
+        job.status = "FAILED"
+        job.error_report.append(
+            {"global_error": str(e), "trace": traceback.format_exc()}
+        )
+    job.finished_at = timezone.now()
+    job.save()
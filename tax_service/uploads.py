@@ -0,0 +1,178 @@
+"""
+Content-addressed import uploads.
+
+HashingUploadHandler sits in front of Django's upload handlers and hashes
+each file while its chunks arrive, so the hash is known before the view
+reads the upload. With it:
+
+- an upload identical to an earlier job (same sha256) returns that job, or
+  attaches to it while it is still running, instead of importing again;
+- a plain CSV that only appends rows to an earlier upload is recognised by
+  prefix hashes: the running hash is snapshotted at the sizes of earlier
+  uploads that share this file's first HEAD_BYTES. Only the new tail is
+  imported, numbered after the rows of the job it extends.
+
+?force=true skips both checks.
+"""
+
+import hashlib
+import logging
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Files sharing this many leading bytes are prefix candidates of each other
+HEAD_BYTES = 64 * 1024
+# Most recent candidate jobs whose sizes are snapshotted during an upload
+PREFIX_CANDIDATES = 20
+
+
+def prefix_candidate_sizes(head_hash):
+    return list(
+        ImportJob.objects.filter(head_hash=head_hash, status="COMPLETED")
+        .order_by("-created_at")
+        .values_list("size_bytes", flat=True)[:PREFIX_CANDIDATES]
+    )
+
+
+class UploadDigest:
+    """
+    Incremental sha256 of one upload, plus the digest of every candidate
+    prefix length reached on the way: prefixes[size] = (sha256, ends_in_newline).
+    """
+
+    def __init__(self, candidate_sizes=prefix_candidate_sizes):
+        self._hash = hashlib.sha256()
+        self._head = bytearray()
+        self._candidate_sizes = candidate_sizes
+        self._pending = []
+        self._last_byte = b""
+        self.size = 0
+        self.head_hash = ""
+        self.prefixes = {}
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest()
+
+    def _boundary(self):
+        if self._head is not None:
+            return HEAD_BYTES
+        return self._pending[0] if self._pending else None
+
+    def _reached(self):
+        if self._head is not None and self.size == HEAD_BYTES:
+            self.head_hash = hashlib.sha256(self._head).hexdigest()
+            self._head = None
+            self._pending = sorted(
+                {s for s in self._candidate_sizes(self.head_hash) if s >= self.size}
+            )
+        while self._pending and self._pending[0] == self.size:
+            self.prefixes[self.size] = (self._hash.hexdigest(), self._last_byte == b"\n")
+            self._pending.pop(0)
+
+    def update(self, data):
+        view = memoryview(data)
+        while True:
+            self._reached()
+            if not view:
+                return
+            boundary = self._boundary()
+            take = len(view) if boundary is None else min(len(view), boundary - self.size)
+            piece, view = view[:take], view[take:]
+            self._hash.update(piece)
+            if self._head is not None:
+                self._head += piece
+            self._last_byte = bytes(piece[-1:])
+            self.size += take
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Passes every chunk on unchanged; digests[field_name] holds the result.
+    Must be inserted before the request body is parsed.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._digest = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._digest = UploadDigest()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._digest
+        return None
+
+
+def install_hasher(request):
+    """
+    Put a HashingUploadHandler first on a (DRF or Django) request.
+    """
+    hasher = HashingUploadHandler(request)
+    request.upload_handlers.insert(0, hasher)
+    return hasher
+
+
+def upload_digest(hasher, field_name, file_obj):
+    """
+    The streamed digest, or one computed from the file if the body had
+    already been parsed before the hasher was installed.
+    """
+    digest = hasher.digests.get(field_name)
+    if digest is None:
+        digest = UploadDigest()
+        for chunk in file_obj.chunks():
+            digest.update(chunk)
+        file_obj.seek(0)
+    return digest
+
+
+def find_identical(content_hash):
+    """
+    The latest job that imported (or is importing) exactly this content.
+    """
+    return (
+        ImportJob.objects.filter(content_hash=content_hash)
+        .exclude(status="FAILED")
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def find_appended_base(digest):
+    """
+    The largest completed job whose upload is a line-aligned prefix of this
+    one, or None.
+    """
+    for size in sorted(digest.prefixes, reverse=True):
+        prefix_hash, ends_in_newline = digest.prefixes[size]
+        if size >= digest.size or not ends_in_newline:
+            continue
+        base = (
+            ImportJob.objects.filter(
+                content_hash=prefix_hash, size_bytes=size, status="COMPLETED"
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if base is not None:
+            return base
+    return None
+
+
+def csv_tail(raw, base):
+    """
+    The rows of raw after base's upload, under raw's own header line.
+    """
+    header, _, _ = raw.partition(b"\n")
+    return header + b"\n" + raw[base.size_bytes :]
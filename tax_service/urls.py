@@ -1,11 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, ImportJobViewSet
+from .views import OrderViewSet, ImportJobViewSet, dashboard_summary, profile_download
+from . import async_views
 
 router = DefaultRouter()
 router.register(r"orders", OrderViewSet, basename="order")
 router.register(r"imports", ImportJobViewSet, basename="import")
 
 urlpatterns = [
+    path("async/orders/", async_views.order_create, name="order-create-async"),
+    path("async/orders/quote/", async_views.order_quote, name="order-quote-async"),
+    path("dashboard/summary/", dashboard_summary, name="dashboard-summary"),
+    path("profiles/<int:pk>/", profile_download, name="profile-download"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,215 @@
+"""
+Multi-layer boundary index: state -> county -> locality / special district.
+
+Every layer is split into groups by parent jurisdiction and each group gets
+its own quadtree, so a point query descends one small tree per level instead
+of scanning every boundary. Adding states or thousands of local boundaries
+only adds groups; a lookup still touches one group per level. Special
+districts are the exception: they overlap each other (a transit district
+and a school district can cover the same point), so each district gets its
+own tree and a lookup collects every district containing the point.
+
+Group trees are built lazily on first use, or loaded from
+<index_dir>/<group fingerprint>.qtree when a prebuilt artifact exists
+(python manage.py build_boundary_index).
+"""
+
+import logging
+import os
+
+from .quadtree import CountyQuadtree, geojson_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("state", "county", "locality", "special")
+
+
+class BoundaryLayer:
+    """
+    One GeoJSON layer. Parent jurisdictions come either from a fixed value
+    for the whole file (state="New York") or from a feature property.
+    """
+
+    def __init__(
+        self,
+        level,
+        geojson_data,
+        name=None,
+        state=None,
+        county=None,
+        name_property="name",
+        state_property="state",
+        county_property="county",
+    ):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown boundary level: {level}")
+        self.level = level
+        self.name = name or level
+        self.features = geojson_data.get("features", [])
+        self.state = state
+        self.county = county
+        self.name_property = name_property
+        self.state_property = state_property
+        self.county_property = county_property
+
+    def feature_name(self, feature):
+        return (feature.get("properties") or {}).get(self.name_property)
+
+    def feature_state(self, feature):
+        return self.state or (feature.get("properties") or {}).get(self.state_property)
+
+    def feature_county(self, feature):
+        return self.county or (feature.get("properties") or {}).get(self.county_property)
+
+
+class JurisdictionStack:
+    def __init__(self, state, county, locality=None, special_districts=None, features=None):
+        self.state = state
+        self.county = county
+        self.locality = locality
+        self.special_districts = special_districts or []
+        self.features = features or {}
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "county": self.county,
+            "locality": self.locality,
+            "special_districts": self.special_districts,
+            "features": self.features,
+        }
+
+
+class _Group:
+    def __init__(self, features, names):
+        self.features = features
+        self.names = names
+        self.tree = None
+
+
+class BoundaryIndex:
+    def __init__(self, layers, index_dir=None, max_depth=10):
+        self.index_dir = index_dir
+        self.max_depth = max_depth
+        self.has_state_layer = any(layer.level == "state" for layer in layers)
+        self._groups = {}
+        # state -> special district group keys
+        self._special = {}
+
+        members = {}
+        for layer in layers:
+            for feature in layer.features:
+                key, name, parents = self._group_key(layer, feature)
+                features, names = members.setdefault(key, ([], []))
+                features.append(feature)
+                names.append((name, parents))
+        for key, (features, names) in members.items():
+            self._groups[key] = _Group(features, names)
+            if key[0] == "special":
+                self._special.setdefault(key[1], []).append(key)
+
+    def _group_key(self, layer, feature):
+        """
+        Returns (group key, feature name, parent names the feature implies).
+        """
+        name = layer.feature_name(feature)
+        state = layer.feature_state(feature)
+        if layer.level == "state":
+            return ("state",), name, {}
+        if layer.level == "county":
+            # Without a state layer all counties share one root tree and
+            # the state is taken from the matching county.
+            key = ("county", state) if self.has_state_layer else ("county", None)
+            return key, name, {"state": state}
+        if layer.level == "locality":
+            return ("locality", state, layer.feature_county(feature)), name, {}
+        return ("special", state, name), name, {}
+
+    # ------------------------------------------------------------- trees
+    def _tree(self, group):
+        if group.tree is None:
+            data = {"features": group.features}
+            fingerprint = geojson_fingerprint(data)
+            path = (
+                os.path.join(self.index_dir, f"{fingerprint}.qtree")
+                if self.index_dir
+                else None
+            )
+            if path and os.path.exists(path):
+                group.tree = CountyQuadtree.load(path)
+            else:
+                logger.info(
+                    f"Building boundary tree for {len(group.features)} features "
+                    f"(no artifact at {path})"
+                )
+                group.tree = CountyQuadtree.build(data, max_depth=self.max_depth)
+        return group.tree
+
+    def _find(self, key, lon, lat):
+        """
+        Returns (feature, (name, parents)) of the first group member
+        containing the point, or None.
+        """
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        fi = self._tree(group).find_feature_index(lon, lat, group.features)
+        if fi is None:
+            return None
+        return group.features[fi], group.names[fi]
+
+    def save_artifacts(self, index_dir):
+        """
+        Build every group tree and write it to index_dir. Returns the paths.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        paths = []
+        for group in self._groups.values():
+            tree = self._tree(group)
+            path = os.path.join(index_dir, f"{tree.fingerprint}.qtree")
+            tree.save(path)
+            paths.append(path)
+        return paths
+
+    # ------------------------------------------------------------ lookup
+    def lookup(self, lon, lat):
+        """
+        Descend state -> county -> locality, plus every special district of
+        the state containing the point. Returns a JurisdictionStack, or None
+        when the point is outside every county.
+        """
+        features = {}
+        state = None
+        if self.has_state_layer:
+            match = self._find(("state",), lon, lat)
+            if match is None:
+                return None
+            feature, (state, _) = match
+            features["state"] = feature.get("properties", {})
+
+        match = self._find(("county", state), lon, lat)
+        if match is None:
+            return None
+        feature, (county, parents) = match
+        state = state or parents.get("state")
+        features["county"] = feature.get("properties", {})
+
+        locality = None
+        match = self._find(("locality", state, county), lon, lat)
+        if match is not None:
+            feature, (locality, _) = match
+            features["locality"] = feature.get("properties", {})
+
+        special_districts = []
+        for key in self._special.get(state, ()):
+            match = self._find(key, lon, lat)
+            if match is not None:
+                feature, (district, _) = match
+                special_districts.append(district)
+                features.setdefault("special", []).append(feature.get("properties", {}))
+
+        return JurisdictionStack(state, county, locality, special_districts, features)
+
+    @property
+    def group_count(self):
+        return len(self._groups)
@@ -0,0 +1,382 @@
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Canonical column -> accepted header aliases, in priority order.
+COLUMN_ALIASES = {
+    "lat": ("lat", "latitude"),
+    "lon": ("lon", "longitude"),
+    "subtotal": ("subtotal", "amount"),
+    "timestamp": ("timestamp", "date"),
+    "external_id": ("external_id", "order_id"),
+}
+
+# Order.external_id is CharField(max_length=64)
+MAX_EXTERNAL_ID_LENGTH = 64
+
+# Order.subtotal is DecimalField(max_digits=12, decimal_places=2)
+MAX_SUBTOTAL_CENTS = 10**12 - 1
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _epoch_micros(dt):
+    delta = dt - _EPOCH
+    return delta.days * 86_400_000_000 + delta.seconds * 1_000_000 + delta.microseconds
+
+
+def resolve_columns(header):
+    """
+    Map canonical column names to positions in the CSV header. Resolved once
+    per file so rows never repeat the alias lookups. Missing columns map to None.
+    """
+    positions = {name.strip().lower(): i for i, name in enumerate(header or [])}
+    resolved = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        resolved[column] = next(
+            (positions[a] for a in aliases if a in positions), None
+        )
+    return resolved
+
+
+class ColumnarBatch:
+    """
+    Valid rows of a chunk as parallel typed arrays. Timestamps are stored as
+    UTC epoch microseconds, subtotals as integer cents. External ids are
+    optional strings (None when the file has no such column).
+    """
+
+    def __init__(self):
+        self.row_index = array("q")
+        self.lat = array("d")
+        self.lon = array("d")
+        self.subtotal_cents = array("q")
+        self.timestamp_us = array("q")
+        self.external_id = []
+
+    def __len__(self):
+        return len(self.row_index)
+
+    def subtotal(self, i):
+        return Decimal(self.subtotal_cents[i]).scaleb(-2)
+
+    def order_timestamp(self, i):
+        return _EPOCH + timedelta(microseconds=self.timestamp_us[i])
+
+    def rows(self):
+        """
+        Yields (row_idx, lat, lon, subtotal, order_timestamp, external_id)
+        per valid row.
+        """
+        for i in range(len(self)):
+            yield (
+                self.row_index[i],
+                self.lat[i],
+                self.lon[i],
+                self.subtotal(i),
+                self.order_timestamp(i),
+                self.external_id[i],
+            )
+
+
+def _column(rows, position):
+    if position is None:
+        return [""] * len(rows)
+    return [
+        (row[position].strip() if position < len(row) else "") for row in rows
+    ]
+
+
+# Value shapes the pyarrow kernels parse; anything else non-blank goes
+# through the per-value Python parsers below, which decide validity.
+FLOAT_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+CENTS_PATTERN = r"^[+-]?(\d{1,15}(\.\d{0,2})?|\.\d{1,2})$"
+_ISO_DATETIME = r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?"
+NAIVE_TIMESTAMP_PATTERN = _ISO_DATETIME + "$"
+AWARE_TIMESTAMP_PATTERN = _ISO_DATETIME + r"(Z|[+-]\d{2}:?\d{2})$"
+
+
+# ---------------------------------------------------- per-value fallbacks
+def _float_value(raw, name):
+    try:
+        return float(raw), None
+    except (TypeError, ValueError):
+        return 0.0, f"Invalid {name}: {raw!r}"
+
+
+def _cents_value(raw):
+    try:
+        amount = Decimal(str(raw) if isinstance(raw, float) else raw)
+        if not amount.is_finite():
+            raise InvalidOperation
+        cents = int(amount.scaleb(2).quantize(Decimal(1), ROUND_HALF_UP))
+    except (InvalidOperation, TypeError, ValueError):
+        return 0, f"Invalid subtotal: {raw!r}"
+    if abs(cents) > MAX_SUBTOTAL_CENTS:
+        # Checked here too: it may not even fit the int64 column
+        return 0, f"subtotal out of range: {raw}"
+    return cents, None
+
+
+def _timestamp_value(raw, now_us):
+    if isinstance(raw, datetime):
+        dt = raw
+    else:
+        try:
+            # C-level ISO 8601 fast path; parse_datetime covers the rest.
+            dt = datetime.fromisoformat(raw)
+        except (TypeError, ValueError):
+            try:
+                dt = parse_datetime(str(raw))
+            except ValueError:
+                dt = None
+    if dt is None:
+        return now_us, f"Invalid timestamp: {raw!r}"
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return _epoch_micros(dt), None
+
+
+# ------------------------------------------------------- column kernels
+def _arrow():
+    # Imported on first parse, like utils/parquet.py
+    import pyarrow
+    import pyarrow.compute
+
+    return pyarrow, pyarrow.compute
+
+
+def _to_arrow(values):
+    pa, _ = _arrow()
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types, e.g. a retry patch over typed Parquet values
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _text(column):
+    """
+    The column as trimmed strings, and its blank (null or empty) mask.
+    Whitespace-only values aren't blank; the per-value parsers reject them.
+    """
+    pa, pc = _arrow()
+    if not pa.types.is_string(column.type):
+        column = pc.cast(column, pa.string())
+    blank = pc.fill_null(pc.equal(column, ""), True)
+    return pc.utf8_trim_whitespace(column), blank
+
+
+def _indices(mask):
+    _, pc = _arrow()
+    return pc.indices_nonzero(pc.fill_null(mask, False)).to_pylist()
+
+
+def _patch(parsed, mask, fallback):
+    """
+    parsed with the positions in mask replaced by fallback(i) values.
+    """
+    pa, pc = _arrow()
+    positions = _indices(mask)
+    if not positions:
+        return parsed
+    values = pa.array([fallback(i) for i in positions], parsed.type)
+    return pc.replace_with_mask(parsed, pc.fill_null(mask, False), values)
+
+
+def _parse_float(column, raw, name, low, high, errors):
+    pa, pc = _arrow()
+    if pa.types.is_floating(column.type) or pa.types.is_integer(column.type):
+        parsed = pc.cast(column, pa.float64())
+        blank = pc.is_null(column)
+        odd = pa.array([False] * len(column), pa.bool_())
+    else:
+        text, blank = _text(column)
+        fast = pc.match_substring_regex(text, FLOAT_PATTERN)
+        parsed = pc.cast(pc.if_else(fast, text, None), pa.float64())
+        odd = pc.and_not(pc.invert(blank), pc.fill_null(fast, False))
+
+    for i in _indices(blank):
+        errors.setdefault(i, f"{name} is required")
+    fallback = {}
+    for i in _indices(odd):
+        fallback[i], error = _float_value(raw[i], name)
+        if error:
+            errors.setdefault(i, error)
+    parsed = pc.fill_null(_patch(parsed, odd, fallback.get), 0.0)
+
+    in_range = pc.and_(pc.greater_equal(parsed, low), pc.less_equal(parsed, high))
+    for i in _indices(pc.invert(in_range)):
+        errors.setdefault(i, f"{name} out of range [{low}, {high}]: {raw[i]}")
+    return parsed
+
+
+def _parse_cents(column, raw, errors):
+    pa, pc = _arrow()
+    # Floats and decimals go through their shortest text form, like Decimal(str())
+    text, blank = _text(column)
+    fast = pc.match_substring_regex(text, CENTS_PATTERN)
+    amounts = pc.cast(pc.if_else(fast, text, None), pa.decimal128(17, 2))
+    parsed = pc.cast(
+        pc.multiply(amounts, pa.scalar(Decimal(100), pa.decimal128(3, 0))), pa.int64()
+    )
+    odd = pc.and_not(pc.invert(blank), pc.fill_null(fast, False))
+
+    fallback = {}
+    for i in _indices(odd):
+        fallback[i], error = _cents_value(raw[i])
+        if error:
+            errors.setdefault(i, error)
+    parsed = pc.fill_null(_patch(parsed, odd, fallback.get), 0)
+
+    for i in _indices(pc.greater(pc.abs(parsed), MAX_SUBTOTAL_CENTS)):
+        errors.setdefault(i, f"subtotal out of range: {raw[i]}")
+    return parsed
+
+
+def _cast_timestamps(text, mask, aware):
+    """
+    UTC epoch microseconds of the strings in mask (null elsewhere), or None
+    when the kernel rejects one of them (impossible dates, DST gaps).
+    """
+    pa, pc = _arrow()
+    selected = pc.if_else(mask, text, None)
+    try:
+        if aware:
+            stamps = pc.cast(selected, pa.timestamp("us", "UTC"))
+        else:
+            stamps = pc.assume_timezone(
+                pc.cast(selected, pa.timestamp("us")),
+                timezone.get_current_timezone_name(),
+            )
+    except pa.ArrowInvalid:
+        return None
+    return pc.cast(pc.cast(stamps, pa.timestamp("us", "UTC")), pa.int64())
+
+
+def _parse_timestamps(column, raw, now_us, errors):
+    pa, pc = _arrow()
+    if pa.types.is_timestamp(column.type):
+        if column.type.tz is None:
+            column = pc.assume_timezone(column, timezone.get_current_timezone_name())
+        parsed = pc.cast(pc.cast(column, pa.timestamp("us", "UTC")), pa.int64())
+        return pc.fill_null(parsed, now_us)
+
+    text, blank = _text(column)
+    parsed = pa.nulls(len(column), pa.int64())
+    fast = pa.array([False] * len(column), pa.bool_())
+    for pattern, aware in (
+        (NAIVE_TIMESTAMP_PATTERN, False),
+        (AWARE_TIMESTAMP_PATTERN, True),
+    ):
+        mask = pc.fill_null(pc.match_substring_regex(text, pattern), False)
+        stamps = _cast_timestamps(text, mask, aware)
+        if stamps is not None:
+            parsed = pc.coalesce(parsed, stamps)
+            fast = pc.or_(fast, mask)
+    odd = pc.and_not(pc.invert(blank), fast)
+
+    fallback = {}
+    for i in _indices(odd):
+        fallback[i], error = _timestamp_value(raw[i], now_us)
+        if error:
+            errors.setdefault(i, error)
+    return pc.fill_null(_patch(parsed, odd, fallback.get), now_us)
+
+
+def _parse_external_ids(column, errors):
+    pa, pc = _arrow()
+    text, _ = _text(column)
+    parsed = pc.if_else(pc.equal(text, ""), None, text)
+    too_long = pc.greater(pc.utf8_length(parsed), MAX_EXTERNAL_ID_LENGTH)
+    for i in _indices(too_long):
+        errors.setdefault(
+            i, f"external_id longer than {MAX_EXTERNAL_ID_LENGTH} characters"
+        )
+    return parsed
+
+
+def _typed_array(typecode, column):
+    """
+    array(typecode) with the values of a null-free pyarrow numeric column,
+    copied straight from its data buffer.
+    """
+    out = array(typecode)
+    size = out.itemsize
+    data = memoryview(column.buffers()[1])
+    out.frombytes(data[column.offset * size : (column.offset + len(column)) * size])
+    return out
+
+
+def split_columns(rows, columns):
+    """
+    csv.reader rows -> {"lat": [...], ...} raw string columns.
+    """
+    return {name: _column(rows, position) for name, position in columns.items()}
+
+
+def parse_chunk(rows, columns, start_index=1):
+    """
+    Parse and validate a chunk of csv.reader rows column by column.
+
+    Returns (ColumnarBatch, rejected) where rejected is a list of
+    {"row": row_idx, "error": reason} in the same shape as ImportJob.error_report.
+    """
+    return parse_columns(
+        split_columns(rows, columns), length=len(rows), start_index=start_index
+    )
+
+
+def parse_columns(values, length, start_index=1, row_index=None):
+    """
+    Validate already split columns ({"lat": [...], ...}). Values may be raw
+    strings or typed (float, Decimal, datetime) as read from columnar files;
+    a missing column is treated as all blank. Rows are numbered from
+    start_index, or by row_index when they are not contiguous (retries).
+
+    Each column is converted to a pyarrow array once and parsed, range
+    checked and filtered with pyarrow.compute kernels. Python only sees the
+    rejected rows (to word their errors) and values in shapes the kernels
+    don't take (e.g. "1.005", exponents, non-ISO dates), which keep the
+    per-value parsers' results. A row's first failing column (in lat, lon,
+    subtotal, timestamp, external_id order) gives its error.
+    """
+    pa, pc = _arrow()
+    errors = {}
+    if row_index is None:
+        row_index = range(start_index, start_index + length)
+    now_us = _epoch_micros(timezone.now())
+
+    def column(name):
+        raw = values.get(name) or [None] * length
+        return _to_arrow(raw), raw
+
+    lat = _parse_float(*column("lat"), "lat", -90.0, 90.0, errors)
+    lon = _parse_float(*column("lon"), "lon", -180.0, 180.0, errors)
+    cents = _parse_cents(*column("subtotal"), errors)
+    stamps = _parse_timestamps(*column("timestamp"), now_us, errors)
+    external_ids = _parse_external_ids(column("external_id")[0], errors)
+
+    valid = pc.invert(
+        pc.is_in(
+            pa.array(range(length), pa.int64()),
+            value_set=pa.array(list(errors), pa.int64()),
+        )
+    )
+    batch = ColumnarBatch()
+    batch.row_index = _typed_array(
+        "q", pc.filter(pa.array(row_index, pa.int64()), valid)
+    )
+    batch.lat = _typed_array("d", pc.filter(lat, valid))
+    batch.lon = _typed_array("d", pc.filter(lon, valid))
+    batch.subtotal_cents = _typed_array("q", pc.filter(cents, valid))
+    batch.timestamp_us = _typed_array("q", pc.filter(stamps, valid))
+    batch.external_id = pc.filter(external_ids, valid).to_pylist()
+
+    rejected = [
+        {"row": row_index[i], "error": reason} for i, reason in sorted(errors.items())
+    ]
+    return batch, rejected
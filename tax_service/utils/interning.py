@@ -0,0 +1,34 @@
+import hashlib
+import json
+
+
+def content_hash(payload):
+    """
+    SHA-256 of a canonical JSON encoding. Decimals and other non-JSON values
+    are hashed by their string form, so Decimal("0.0400") != Decimal("0.04").
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def jurisdiction_key(state, county, locality, special_districts=()):
+    """
+    The identity of a jurisdiction: what rates are looked up by. The geocoder
+    payload (timestamps, place ids, bounding boxes) and the provider that
+    produced it are not part of it, so every Nominatim hit inside the same
+    county/locality shares one row.
+    """
+    return [
+        (state or "").strip(),
+        (county or "").strip(),
+        (locality or "").strip() or None,
+        sorted({d.strip() for d in special_districts or () if d and d.strip()}),
+    ]
+
+
+def jurisdiction_hash(state, county, locality, special_districts=()):
+    return content_hash(jurisdiction_key(state, county, locality, special_districts))
+
+
+def rate_application_hash(composite_rate, jurisdictions, components):
+    return content_hash([str(composite_rate), jurisdictions, components])
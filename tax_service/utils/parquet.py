@@ -0,0 +1,182 @@
+"""
+Parquet import/export helpers. pyarrow is imported lazily so that web and
+worker processes which never touch Parquet don't pay for it at startup.
+"""
+
+import io
+from decimal import Decimal
+
+from .columnar import COLUMN_ALIASES
+
+# (Parquet column, ORM lookup) read for export, in query order.
+EXPORT_COLUMNS = (
+    ("id", "id"),
+    ("lat", "lat"),
+    ("lon", "lon"),
+    ("subtotal", "subtotal"),
+    ("order_timestamp", "order_timestamp"),
+    ("geo_state", "jurisdiction__state"),
+    ("geo_county", "jurisdiction__county"),
+    ("geo_locality", "jurisdiction__locality"),
+    ("geo_source", "jurisdiction__source"),
+    ("composite_rate", "composite_rate"),
+    ("tax_amount", "tax_amount"),
+    ("total_amount", "total_amount"),
+    ("jurisdictions", "rate_application__jurisdictions"),
+    ("breakdown", "rate_application__components"),
+    ("created_at", "created_at"),
+)
+EXPORT_FIELDS = tuple(lookup for _, lookup in EXPORT_COLUMNS)
+
+# Breakdown entries flattened into fixed per-component columns.
+BREAKDOWN_COMPONENTS = ("state", "county", "locality", "special")
+
+SPECIAL_DISTRICT_NAME = "Special District"
+
+
+def order_schema():
+    import pyarrow as pa
+
+    rate = pa.decimal128(6, 4)
+    money = pa.decimal128(12, 2)
+    coord = pa.decimal128(9, 6)
+    timestamp = pa.timestamp("us", tz="UTC")
+
+    fields = [
+        pa.field("id", pa.int64(), nullable=False),
+        pa.field("lat", coord),
+        pa.field("lon", coord),
+        pa.field("subtotal", money),
+        pa.field("order_timestamp", timestamp),
+        pa.field("geo_state", pa.string()),
+        pa.field("geo_county", pa.string()),
+        pa.field("geo_locality", pa.string()),
+        pa.field("geo_source", pa.string()),
+        pa.field("composite_rate", rate),
+        pa.field("tax_amount", money),
+        pa.field("total_amount", money),
+        pa.field("jurisdictions", pa.list_(pa.string())),
+    ]
+    for component in BREAKDOWN_COMPONENTS:
+        fields += [
+            pa.field(f"{component}_name", pa.string()),
+            pa.field(f"{component}_rate", rate),
+            pa.field(f"{component}_tax", money),
+        ]
+    fields.append(pa.field("created_at", timestamp))
+    return pa.schema(fields)
+
+
+def flatten_breakdown(breakdown):
+    """
+    Map the breakdown list built by TaxCalculationService.process_order
+    ([state, county, locality?, special?]) onto fixed component slots.
+    """
+    slots = dict.fromkeys(BREAKDOWN_COMPONENTS)
+    for position, entry in enumerate(breakdown or []):
+        if position == 0:
+            component = "state"
+        elif position == 1:
+            component = "county"
+        elif entry.get("name") == SPECIAL_DISTRICT_NAME:
+            component = "special"
+        else:
+            component = "locality"
+        slots[component] = entry
+    return slots
+
+
+def _to_decimal(value):
+    return None if value in (None, "") else Decimal(str(value))
+
+
+def rows_to_record_batch(rows, schema):
+    """
+    rows are tuples in EXPORT_FIELDS order (as returned by values_list).
+    """
+    import pyarrow as pa
+    from ..models import RateApplication
+
+    columns = {name: [] for name in schema.names}
+    subtotal_pos = EXPORT_FIELDS.index("subtotal")
+    components_pos = EXPORT_FIELDS.index("rate_application__components")
+
+    for row in rows:
+        for position, (name, _) in enumerate(EXPORT_COLUMNS):
+            if position != components_pos:
+                columns[name].append(row[position])
+
+        breakdown = RateApplication(components=row[components_pos]).breakdown_for(
+            row[subtotal_pos]
+        )
+        slots = flatten_breakdown(breakdown)
+        for component, entry in slots.items():
+            entry = entry or {}
+            columns[f"{component}_name"].append(entry.get("name"))
+            columns[f"{component}_rate"].append(_to_decimal(entry.get("rate")))
+            columns[f"{component}_tax"].append(_to_decimal(entry.get("tax_amount")))
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(columns[f.name], type=f.type) for f in schema], schema=schema
+    )
+
+
+def write_orders(rows, sink, row_group_size=50_000):
+    """
+    Stream rows (an iterator, ideally from a server-side cursor) into a
+    Parquet file, one row group per row_group_size rows. Returns row count.
+    """
+    import pyarrow.parquet as pq
+
+    schema = order_schema()
+    written = 0
+    chunk = []
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= row_group_size:
+                writer.write_batch(rows_to_record_batch(chunk, schema))
+                written += len(chunk)
+                chunk = []
+        if chunk or not written:
+            writer.write_batch(rows_to_record_batch(chunk, schema))
+            written += len(chunk)
+    return written
+
+
+def iter_order_columns(payload, chunk_size=500):
+    """
+    Read an uploaded Parquet file one row group at a time and yield
+    ({"lat": [...], "lon": [...], ...}, length) chunks for parse_columns.
+    Header aliases are resolved once from the file schema.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(io.BytesIO(payload))
+    names = {name.lower(): name for name in parquet_file.schema_arrow.names}
+    selected = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        source = next((names[a] for a in aliases if a in names), None)
+        if source is not None:
+            selected[column] = source
+
+    for group in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(group, columns=list(selected.values()))
+        for offset in range(0, table.num_rows, chunk_size):
+            part = table.slice(offset, chunk_size)
+            yield (
+                {
+                    column: part.column(source).to_pylist()
+                    for column, source in selected.items()
+                },
+                part.num_rows,
+            )
+
+
+def parquet_row_count(payload):
+    """
+    Row count from the file footer, without reading any row group.
+    """
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(io.BytesIO(payload)).metadata.num_rows
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(dt, months):
+    index = dt.year * 12 + dt.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start.year:04d}_{start.month:02d}"
+
+
+def parse_bound(value):
+    """
+    Accepts an ISO date or datetime; naive values are made aware.
+    Returns None if the value can't be parsed.
+    """
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            return None
+        dt = datetime(d.year, d.month, d.day)
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def period_bounds(period):
+    """
+    "YYYY-MM" -> [first day of month, first day of next month).
+    """
+    try:
+        year, month = (int(part) for part in period.split("-"))
+        start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+    return start, add_months(start, 1)
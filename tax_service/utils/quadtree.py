@@ -0,0 +1,306 @@
+import hashlib
+import json
+import struct
+import sys
+from array import array
+
+from .geo_math import point_in_polygon, point_in_multipolygon
+
+# Binary artifact layout:
+#   MAGIC | uint32 header length | JSON header | int32 nodes | int32 edges
+# Arrays are always stored little-endian.
+MAGIC = b"NYSQT1\n"
+
+# Node encoding (one int32 per node, children of a node are 4 consecutive slots
+# ordered SW, SE, NW, NE):
+#   v > 0                  -> internal node, children start at index v
+#   v == 0                 -> leaf wholly outside every feature
+#   -feature_count <= v < 0 -> leaf wholly inside feature (-v - 1)
+#   v < -feature_count     -> mixed "edge" leaf, candidate list starts at
+#                             edges[-v - feature_count - 1] as [count, idx...]
+OUTSIDE = 0
+
+
+def feature_polygons(feature):
+    """
+    Normalize a GeoJSON feature geometry to a list of polygons.
+    """
+    geom = feature.get("geometry") or {}
+    coords = geom.get("coordinates", [])
+    if geom.get("type") == "Polygon":
+        return [coords]
+    if geom.get("type") == "MultiPolygon":
+        return coords
+    return []
+
+
+def geojson_fingerprint(geojson_data):
+    """
+    Stable hash of the feature geometries, used to detect a stale artifact.
+    """
+    payload = json.dumps(
+        [f.get("geometry") for f in geojson_data.get("features", [])],
+        separators=(",", ":"),
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _segment_hits_rect(x1, y1, x2, y2, xmin, ymin, xmax, ymax):
+    """
+    True if the segment touches the closed rectangle.
+    """
+    if max(x1, x2) < xmin or min(x1, x2) > xmax:
+        return False
+    if max(y1, y2) < ymin or min(y1, y2) > ymax:
+        return False
+    if xmin <= x1 <= xmax and ymin <= y1 <= ymax:
+        return True
+    if xmin <= x2 <= xmax and ymin <= y2 <= ymax:
+        return True
+
+    # Bounding boxes overlap: the segment crosses the rectangle unless all four
+    # corners lie strictly on the same side of its supporting line.
+    dx, dy = x2 - x1, y2 - y1
+    sides = [
+        dx * (cy - y1) - dy * (cx - x1)
+        for cx, cy in ((xmin, ymin), (xmax, ymin), (xmin, ymax), (xmax, ymax))
+    ]
+    return not (all(s > 0 for s in sides) or all(s < 0 for s in sides))
+
+
+def _feature_segments(polygons):
+    segments = []
+    for polygon in polygons:
+        for ring in polygon:
+            n = len(ring)
+            for i in range(n):
+                (ax, ay), (bx, by) = ring[i][:2], ring[(i + 1) % n][:2]
+                if (ax, ay) != (bx, by):
+                    segments.append((ax, ay, bx, by))
+    return segments
+
+
+def _bbox(polygons):
+    xs = [pt[0] for polygon in polygons for ring in polygon for pt in ring]
+    ys = [pt[1] for polygon in polygons for ring in polygon for pt in ring]
+    if not xs:
+        return None
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class CountyQuadtree:
+    """
+    Adaptive quadtree over the feature envelope. Leaves are either wholly
+    inside one feature, wholly outside all of them, or an "edge" cell holding
+    the short list of features whose boundaries cross it. Only edge cells need
+    an exact point-in-polygon test at lookup time.
+    """
+
+    def __init__(self, bbox, nodes, edges, feature_count, fingerprint, max_depth):
+        self.bbox = tuple(bbox)
+        self.nodes = nodes
+        self.edges = edges
+        self.feature_count = feature_count
+        self.fingerprint = fingerprint
+        self.max_depth = max_depth
+
+    # ------------------------------------------------------------------ build
+    @classmethod
+    def build(cls, geojson_data, max_depth=10):
+        features = geojson_data.get("features", [])
+        polygons = [feature_polygons(f) for f in features]
+        boxes = [_bbox(p) for p in polygons]
+        valid = [b for b in boxes if b]
+        if not valid:
+            raise ValueError("GeoJSON contains no polygon features")
+
+        bbox = (
+            min(b[0] for b in valid),
+            min(b[1] for b in valid),
+            max(b[2] for b in valid),
+            max(b[3] for b in valid),
+        )
+
+        nodes = array("i", [OUTSIDE])
+        edges = array("i")
+        # Candidate lists repeat along every shared boundary; store each once.
+        edge_offsets = {}
+        feature_count = len(features)
+
+        def contains(fi, x, y):
+            return point_in_multipolygon((x, y), polygons[fi])
+
+        def visit(index, rect, depth, crossing, containing):
+            xmin, ymin, xmax, ymax = rect
+            cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+
+            # Features whose boundary no longer touches this cell are either
+            # fully inside it or fully outside; the centre decides which.
+            still_crossing = []
+            for fi, segments in crossing:
+                hits = [
+                    s for s in segments if _segment_hits_rect(*s, xmin, ymin, xmax, ymax)
+                ]
+                if hits:
+                    still_crossing.append((fi, hits))
+                elif (containing is None or fi < containing) and contains(fi, cx, cy):
+                    containing = fi
+
+            # Preserve the first-match order of find_containing_feature.
+            if not still_crossing or (
+                containing is not None
+                and containing < min(fi for fi, _ in still_crossing)
+            ):
+                nodes[index] = OUTSIDE if containing is None else -(containing + 1)
+                return
+
+            if depth >= max_depth:
+                candidates = tuple(
+                    sorted(
+                        {fi for fi, _ in still_crossing}
+                        | ({containing} if containing is not None else set())
+                    )
+                )
+                if candidates not in edge_offsets:
+                    edge_offsets[candidates] = len(edges)
+                    edges.append(len(candidates))
+                    edges.extend(candidates)
+                nodes[index] = -(feature_count + 1 + edge_offsets[candidates])
+                return
+
+            base = len(nodes)
+            nodes.extend([OUTSIDE] * 4)
+            nodes[index] = base
+            children = (
+                (xmin, ymin, cx, cy),
+                (cx, ymin, xmax, cy),
+                (xmin, cy, cx, ymax),
+                (cx, cy, xmax, ymax),
+            )
+            for offset, child in enumerate(children):
+                visit(base + offset, child, depth + 1, still_crossing, containing)
+
+        initial = [
+            (fi, _feature_segments(polygons[fi]))
+            for fi, box in enumerate(boxes)
+            if box is not None
+        ]
+        visit(0, bbox, 0, initial, None)
+
+        return cls(
+            bbox=bbox,
+            nodes=nodes,
+            edges=edges,
+            feature_count=feature_count,
+            fingerprint=geojson_fingerprint(geojson_data),
+            max_depth=max_depth,
+        )
+
+    # ----------------------------------------------------------------- lookup
+    def locate(self, lon, lat):
+        """
+        Returns ("outside", None), ("inside", feature_idx) or
+        ("edge", [candidate feature_idx, ...]) for the given point.
+        """
+        xmin, ymin, xmax, ymax = self.bbox
+        if not (xmin <= lon <= xmax and ymin <= lat <= ymax):
+            return "outside", None
+
+        nodes = self.nodes
+        value = nodes[0]
+        while value > 0:
+            cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+            quadrant = 0
+            if lon >= cx:
+                quadrant += 1
+                xmin = cx
+            else:
+                xmax = cx
+            if lat >= cy:
+                quadrant += 2
+                ymin = cy
+            else:
+                ymax = cy
+            value = nodes[value + quadrant]
+
+        if value == OUTSIDE:
+            return "outside", None
+        if value >= -self.feature_count:
+            return "inside", -value - 1
+
+        offset = -value - self.feature_count - 1
+        count = self.edges[offset]
+        return "edge", list(self.edges[offset + 1 : offset + 1 + count])
+
+    def find_feature_index(self, lon, lat, features):
+        """
+        Index of the first feature containing the point, or None.
+        """
+        kind, payload = self.locate(lon, lat)
+        if kind == "inside":
+            return payload
+        if kind == "edge":
+            for fi in payload:
+                polygons = feature_polygons(features[fi])
+                if any(point_in_polygon((lon, lat), p) for p in polygons):
+                    return fi
+        return None
+
+    def find_containing_feature(self, lon, lat, geojson_data):
+        """
+        Drop-in replacement for geo_math.find_containing_feature.
+        """
+        features = geojson_data.get("features", [])
+        fi = self.find_feature_index(lon, lat, features)
+        return None if fi is None else features[fi]
+
+    # ------------------------------------------------------------ persistence
+    def save(self, path):
+        header = json.dumps(
+            {
+                "bbox": list(self.bbox),
+                "feature_count": self.feature_count,
+                "fingerprint": self.fingerprint,
+                "max_depth": self.max_depth,
+                "nodes": len(self.nodes),
+                "edges": len(self.edges),
+            }
+        ).encode("utf-8")
+
+        nodes, edges = array("i", self.nodes), array("i", self.edges)
+        if sys.byteorder != "little":
+            nodes.byteswap()
+            edges.byteswap()
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(nodes.tobytes())
+            f.write(edges.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a county quadtree artifact")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+            nodes, edges = array("i"), array("i")
+            nodes.frombytes(f.read(header["nodes"] * nodes.itemsize))
+            edges.frombytes(f.read(header["edges"] * edges.itemsize))
+
+        if sys.byteorder != "little":
+            nodes.byteswap()
+            edges.byteswap()
+
+        return cls(
+            bbox=header["bbox"],
+            nodes=nodes,
+            edges=edges,
+            feature_count=header["feature_count"],
+            fingerprint=header["fingerprint"],
+            max_depth=header["max_depth"],
+        )
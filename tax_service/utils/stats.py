@@ -0,0 +1,8 @@
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of samples (pct in 0..100); 0.0 when empty.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -1,8 +1,10 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 from rest_framework.parsers import MultiPartParser
-from .models import Order, ImportJob
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from . import external_ids, idempotency
+from .models import Order, OrderExternalId, ImportJob, ProfileReport
 from .serializers import (
     OrderSerializer,
     OrderCreateSerializer,
@@ -10,15 +12,100 @@ from .serializers import (
     ImportJobCreateSerializer,
 )
 from .services import TaxCalculationService
-from .geocoders import VectorPolygonProvider
-from .tasks import import_orders_task
+from .db_router import ReplicaReadMixin, replica_reads
+from .dashboard import changes_since, decode_cursor, summary
+from .failed_rows import read_patch
+from .profiling import ProfiledViewMixin, merge_reports, profile_requested
+from .scheduler import queue_name, queue_report, submit_import
+from .uploads import (
+    csv_tail,
+    find_appended_base,
+    find_identical,
+    install_hasher,
+    upload_digest,
+)
+from .utils.compression import decode_upload, detect_compression, estimate_rows
+from .utils.periods import parse_bound, period_bounds
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+import base64
+import tempfile
+
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+RETRY_PATCH_MAX_BYTES = 5 * 1024 * 1024
+
+
+def _force(request):
+    return request.query_params.get("force", "").lower() in ("1", "true", "yes")
+
 
+def _profile_download(reports, filename):
+    content, suffix, content_type = merge_reports(reports)
+    response = HttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{suffix}"'
+    return response
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().order_by("-created_at")
+
+def _duplicate_response(job):
+    data = ImportJobSerializer(job).data
+    data["deduplicated"] = True
+    running = job.status in ("PENDING", "PROCESSING")
+    return Response(data, status=status.HTTP_202_ACCEPTED if running else status.HTTP_200_OK)
+
+
+class OrderViewSet(ProfiledViewMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = (
+        Order.objects.select_related("jurisdiction", "rate_application")
+        .all()
+        .order_by("-created_at")
+    )
     filter_backends = [filters.OrderingFilter]
-    ordering_fields = "__all__"
+    ordering_fields = [
+        "id",
+        "lat",
+        "lon",
+        "subtotal",
+        "order_timestamp",
+        "composite_rate",
+        "tax_amount",
+        "total_amount",
+        "created_at",
+    ]
     ordering = ["-created_at"]
+    replica_actions = ("list", "changes", "export_parquet")
+
+    def get_queryset(self):
+        """
+        ?period=YYYY-MM or ?from=/&to= (to is exclusive) restrict orders by
+        order_timestamp, so a partitioned table only scans those months.
+        """
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        start = end = None
+        if params.get("period"):
+            bounds = period_bounds(params["period"])
+            if bounds is None:
+                raise ValidationError({"period": "Expected YYYY-MM"})
+            start, end = bounds
+        if params.get("from"):
+            start = parse_bound(params["from"])
+            if start is None:
+                raise ValidationError({"from": "Expected an ISO date or datetime"})
+        if params.get("to"):
+            end = parse_bound(params["to"])
+            if end is None:
+                raise ValidationError({"to": "Expected an ISO date or datetime"})
+
+        if start is not None:
+            queryset = queryset.filter(order_timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(order_timestamp__lt=end)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -26,19 +113,135 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
 
     def create(self, request, *args, **kwargs):
+        """
+        With an Idempotency-Key header a retried request replays the first
+        response instead of creating a second order (see idempotency.py).
+        """
         serializer = self.get_serializer_class()(data=request.data)
         serializer.is_valid(raise_exception=True)
+
+        key = request.headers.get(idempotency.HEADER)
+        if not key:
+            return self._create_order(serializer.validated_data)
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            raise ValidationError(
+                {idempotency.HEADER: f"At most {idempotency.MAX_KEY_LENGTH} characters"}
+            )
+
+        record, replay = idempotency.claim(
+            key, idempotency.request_fingerprint(serializer.validated_data)
+        )
+        if replay is not None:
+            return Response(
+                replay.body,
+                status=replay.status_code,
+                headers={idempotency.REPLAY_HEADER: "true"},
+            )
+        try:
+            response = self._create_order(serializer.validated_data)
+        except Exception:
+            idempotency.release(record)
+            raise
+        idempotency.complete(record, response.status_code, response.data)
+        return response
+
+    def _create_order(self, data):
+        external_id = data.get("external_id")
+        if external_id:
+            existing = self._existing_order_response(external_id)
+            if existing is not None:
+                return existing
+
+        service = TaxCalculationService()
+        try:
+            if settings.ORDER_WRITE_BEHIND:
+                from .write_behind import get_write_buffer
+
+                order = service.quote(
+                    lat=data["lat"],
+                    lon=data["lon"],
+                    subtotal=data["subtotal"],
+                    order_timestamp=data.get("timestamp"),
+                    external_id=external_id,
+                )
+                get_write_buffer().submit(order)
+            else:
+                order = service.process_order(
+                    lat=data["lat"],
+                    lon=data["lon"],
+                    subtotal=data["subtotal"],
+                    order_timestamp=data.get("timestamp"),
+                    external_id=external_id,
+                )
+        except IntegrityError:
+            # A concurrent request claimed the same external_id first
+            existing = self._existing_order_response(external_id) if external_id else None
+            if existing is None:
+                raise
+            return existing
+
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _existing_order_response(external_id):
+        order, pending = external_ids.lookup(external_id)
+        if pending:
+            # Claimed by an order that is still buffered or being inserted
+            return Response(
+                {"detail": "An order with this external_id is still being written"},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": "1"},
+            )
+        if order is None:
+            return None
+        return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def quote(self, request):
+        serializer = OrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        service = TaxCalculationService(geocoder=VectorPolygonProvider())
-        order = service.process_order(
+        service = TaxCalculationService()
+        order = service.quote(
             lat=data["lat"],
             lon=data["lon"],
             subtotal=data["subtotal"],
             order_timestamp=data.get("timestamp"),
         )
 
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        return Response(OrderSerializer(order).data)
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Orders created after ?since=<cursor>, oldest first. Without a cursor
+        only next_cursor is returned, to tail from now. Poll again with
+        next_cursor; the newest few seconds of rows may repeat, so dedupe
+        by id.
+        """
+        cursor = None
+        if request.query_params.get("since"):
+            cursor = decode_cursor(request.query_params["since"])
+            if cursor is None:
+                raise ValidationError({"since": "Invalid cursor"})
+        try:
+            limit = int(request.query_params.get("limit", CHANGES_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Expected an integer"})
+        limit = min(max(limit, 1), CHANGES_MAX_LIMIT)
+
+        rows, next_cursor, has_more, reset = changes_since(
+            self.get_queryset(), cursor, limit
+        )
+        return Response(
+            {
+                "results": OrderSerializer(rows, many=True).data,
+                "next_cursor": next_cursor,
+                "has_more": has_more,
+                "reset": reset,
+            }
+        )
 
     @action(detail=False, methods=["post"])
     def clear(self, request):
@@ -46,29 +249,266 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         with connection.cursor() as cursor:
             table_name = connection.ops.quote_name(Order._meta.db_table)
-            cursor.execute(f"TRUNCATE TABLE {table_name} RESTART IDENTITY CASCADE;")
+            claims = connection.ops.quote_name(OrderExternalId._meta.db_table)
+            cursor.execute(f"TRUNCATE TABLE {table_name}, {claims} RESTART IDENTITY CASCADE;")
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser])
-    def import_csv(self, request):
+    def _receive_upload(self, request):
+        """
+        Parse the upload through a streaming hasher. Returns (file, digest,
+        response); response is set when the same content was already
+        imported or is being imported (unless ?force=true).
+        """
+        hasher = install_hasher(request)
         serializer = ImportJobCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         file_obj = serializer.validated_data["file"]
+        digest = upload_digest(hasher, "file", file_obj)
+
+        existing = None if _force(request) else find_identical(digest.content_hash)
+        if existing is not None:
+            return file_obj, digest, _duplicate_response(existing)
+        return file_obj, digest, None
+
+    def _new_job(self, request, digest, **fields):
+        """
+        Returns (job, None), or (None, response) when an identical upload
+        created its job first.
+        """
+        try:
+            with transaction.atomic():
+                job = ImportJob.objects.create(
+                    content_hash=digest.content_hash,
+                    size_bytes=digest.size,
+                    profile=profile_requested(request),
+                    **fields,
+                )
+        except IntegrityError:
+            existing = find_identical(digest.content_hash)
+            if existing is None or _force(request):
+                return None, Response(
+                    {"detail": "An identical import is still running"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return None, _duplicate_response(existing)
+        return job, None
+
+    @staticmethod
+    def _submit(job, kind, estimated_rows, **task_kwargs):
+        """
+        submit_import, failing the job if it cannot be queued: a PENDING job
+        would keep its content_hash active and absorb every re-upload.
+        """
+        try:
+            submit_import(job, kind, estimated_rows, **task_kwargs)
+        except Exception as e:
+            job.status = "FAILED"
+            job.error_report = [{"global_error": f"Could not queue import: {e}"}]
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error_report", "finished_at"])
+            raise
 
-        job = ImportJob.objects.create()
+    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """
+        An identical file returns the existing job; a plain CSV that only
+        appends rows to an earlier upload imports just the new rows.
+        ?force=true imports the whole file regardless.
+        """
+        file_obj, digest, duplicate = self._receive_upload(request)
+        if duplicate is not None:
+            return duplicate
 
+        raw = file_obj.read()
+        compression = detect_compression(file_obj.name, raw[:4])
+        fields = {}
+        if not compression:
+            fields["head_hash"] = digest.head_hash
+            base = None if _force(request) else find_appended_base(digest)
+            if base is not None:
+                raw = csv_tail(raw, base)
+                fields["appended_to"] = base
+                fields["row_offset"] = base.row_offset + base.total_rows
         try:
-            file_content = file_obj.read().decode("utf-8-sig")
-        except UnicodeDecodeError:
-            file_content = file_obj.read().decode("latin-1")
+            estimated_rows = estimate_rows(raw, compression)
+        except Exception as e:
+            # Not valid gzip/zip; rejected before any job exists
+            raise ValidationError({"file": f"Cannot read {compression} upload: {e}"})
+
+        job, duplicate = self._new_job(request, digest, **fields)
+        if duplicate is not None:
+            return duplicate
 
         # Fire off celery task passing the content directly via Redis.
         # This completely avoids Heroku's ephemeral/isolated filesystem issues.
-        import_orders_task.delay(job.id, file_content)
+        if compression:
+            # .csv.gz / .zip stay compressed in the broker; the worker
+            # decompresses and decodes them incrementally.
+            self._submit(
+                job,
+                "csv",
+                estimated_rows,
+                payload=base64.b64encode(raw).decode("ascii"),
+                compression=compression,
+            )
+        else:
+            self._submit(job, "csv", estimated_rows, file_content=decode_upload(raw))
 
         return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser])
+    def import_parquet(self, request):
+        file_obj, digest, duplicate = self._receive_upload(request)
+        if duplicate is not None:
+            return duplicate
+
+        from .utils.parquet import parquet_row_count
+
+        raw = file_obj.read()
+        try:
+            estimated_rows = parquet_row_count(raw)
+        except Exception as e:
+            raise ValidationError({"file": f"Cannot read parquet upload: {e}"})
+
+        job, duplicate = self._new_job(request, digest)
+        if duplicate is not None:
+            return duplicate
+        self._submit(
+            job, "parquet", estimated_rows, payload=base64.b64encode(raw).decode("ascii")
+        )
+
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"])
+    def export_parquet(self, request):
+        from .utils.parquet import EXPORT_FIELDS, write_orders
+
+        # .iterator() uses a server-side cursor on Postgres, so only one
+        # row group worth of orders is materialized at a time.
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=5000)
+        )
+
+        sink = tempfile.TemporaryFile()
+        write_orders(rows, sink)
+        sink.seek(0)
+        return FileResponse(
+            sink,
+            as_attachment=True,
+            filename="orders.parquet",
+            content_type="application/vnd.apache.parquet",
+        )
+
 
-class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+class ImportJobViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ImportJob.objects.all().order_by("-created_at")
     serializer_class = ImportJobSerializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        jobs = list(queryset if page is None else page)
+        context = self.get_serializer_context()
+        context["queue_report"] = queue_report(jobs)
+        serializer = self.get_serializer(jobs, many=True, context=context)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["post"], parser_classes=[MultiPartParser])
+    def retry_failed(self, request, pk=None):
+        """
+        Reprocess only the rows that failed, optionally corrected by a patch
+        CSV upload ("file": a row column plus the columns to override).
+        """
+        job = self.get_object()
+        patch_content = None
+        upload = request.FILES.get("file")
+        if upload is not None:
+            if upload.size > RETRY_PATCH_MAX_BYTES:
+                raise ValidationError(
+                    {"file": f"Patch CSV is limited to {RETRY_PATCH_MAX_BYTES} bytes"}
+                )
+            patch_content = decode_upload(upload.read())
+            try:
+                read_patch(patch_content)
+            except ValueError as e:
+                raise ValidationError({"file": str(e)})
+
+        if not job.failed_row_sets.exists():
+            raise ValidationError({"detail": "No failed rows stored for this job"})
+        claim = {"status": "PROCESSING", "started_at": timezone.now(), "finished_at": None}
+        if profile_requested(request):
+            claim["profile"] = True
+        try:
+            claimed = ImportJob.objects.filter(
+                pk=job.pk, status__in=("COMPLETED", "FAILED")
+            ).update(**claim)
+        except IntegrityError:
+            # A forced re-import of the same file is running
+            claimed = 0
+        if not claimed:
+            return Response(
+                {"detail": "Import job is still running"}, status=status.HTTP_409_CONFLICT
+            )
+
+        from .tasks import retry_failed_rows_task
+
+        retry_failed_rows_task.apply_async(
+            (job.id,), {"patch_content": patch_content}, queue=queue_name("small")
+        )
+        job.refresh_from_db()
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def profile(self, request, pk=None):
+        """
+        Staff only: the job's task profiles merged into one download
+        (collapsed stacks, or .pstats in cprofile mode).
+        """
+        if not request.user.is_staff:
+            raise PermissionDenied()
+        job = self.get_object()
+        reports = job.profiles.order_by("-created_at")
+        latest = reports.first()
+        if latest is None:
+            raise NotFound("No profile recorded for this job; upload with ?profile=1")
+        return _profile_download(reports.filter(mode=latest.mode), f"import-{job.id}")
+
+
+@api_view(["GET"])
+def profile_download(request, pk):
+    """
+    Staff only: one stored request or task profile (see X-Profile-Url).
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied()
+    report = ProfileReport.objects.filter(pk=pk).first()
+    if report is None:
+        raise NotFound()
+    return _profile_download([report], f"profile-{report.id}")
+
+
+@api_view(["GET"])
+def dashboard_summary(request):
+    """
+    Order totals and import counts. Send back the ETag as If-None-Match
+    (or Last-Modified as If-Modified-Since) to get 304 while nothing changed.
+    """
+    with replica_reads(request):
+        payload, etag, last_modified = summary()
+    etag = f'"{etag}"'
+    last_modified = last_modified.timestamp() if last_modified else None
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = Response(payload)
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,307 @@
+"""
+Optional write-behind buffer for single-order API traffic.
+
+Orders are computed in the request, given a pre-reserved primary key and
+queued; a background flusher writes them with bulk_create every
+ORDER_WRITE_BEHIND_FLUSH_MS or ORDER_WRITE_BEHIND_MAX_ROWS rows, turning
+per-request commits into group commits.
+
+ORDER_WRITE_BEHIND_DURABILITY:
+    "flush"  - the request waits until its row is committed (group commit)
+    "buffer" - the request is acknowledged once the row is buffered
+               (in process memory, or in Redis for the redis backend)
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core import serializers
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import external_ids
+from .dashboard import settled_before
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+def reserve_order_ids(count):
+    """
+    Reserve a contiguous block of Order primary keys so buffered rows can be
+    returned to the client with their final id before they are inserted.
+    """
+    table = Order._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                    "FROM generate_series(1, %s)",
+                    [connection.ops.quote_name(table), count],
+                )
+                return sorted(row[0] for row in cursor.fetchall())
+
+            if connection.vendor == "sqlite":
+                # AUTOINCREMENT tables track their high-water mark here.
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                start = (row[0] if row else 0) + 1
+                if row:
+                    cursor.execute(
+                        "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                        [start + count - 1, table],
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                        [table, start + count - 1],
+                    )
+                return list(range(start, start + count))
+
+    raise NotImplementedError(
+        f"Order id reservation is not supported on {connection.vendor}"
+    )
+
+
+class LocalBackend:
+    """
+    In-process queue. Rows are lost if the process dies before a flush.
+    """
+
+    def __init__(self):
+        self._rows = deque()
+
+    def push(self, payload):
+        self._rows.append(payload)
+
+    def pop(self, count):
+        rows = []
+        while self._rows and len(rows) < count:
+            rows.append(self._rows.popleft())
+        return rows
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class RedisBackend:
+    """
+    One Redis list per process, registered in a set so that
+    `manage.py flush_order_buffer` can drain lists left by crashed processes.
+    """
+
+    REGISTRY_KEY = "order_buffer:lists"
+
+    def __init__(self, url, key=None):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.key = key or f"order_buffer:{socket.gethostname()}:{os.getpid()}"
+        self._redis.sadd(self.REGISTRY_KEY, self.key)
+
+    @classmethod
+    def registered(cls, url):
+        import redis
+
+        client = redis.Redis.from_url(url)
+        return [k.decode() for k in client.smembers(cls.REGISTRY_KEY)]
+
+    def push(self, payload):
+        self._redis.rpush(self.key, payload)
+
+    def pop(self, count):
+        return [row.decode() for row in (self._redis.lpop(self.key, count) or [])]
+
+    def unregister(self):
+        if not self._redis.llen(self.key):
+            self._redis.srem(self.REGISTRY_KEY, self.key)
+
+    def __len__(self):
+        return self._redis.llen(self.key)
+
+
+class OrderWriteBuffer:
+    def __init__(
+        self,
+        backend,
+        flush_interval_ms=50,
+        max_rows=500,
+        durability="flush",
+        id_block_size=1000,
+        flush_timeout=10.0,
+    ):
+        if durability not in ("flush", "buffer"):
+            raise ValueError(f"Unknown write-behind durability: {durability}")
+        self.backend = backend
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.durability = durability
+        self.id_block_size = id_block_size
+        self.flush_timeout = flush_timeout
+
+        self._ids = deque()
+        self._id_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._waiters = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------ producers
+    def _next_id(self):
+        with self._id_lock:
+            if not self._ids:
+                self._ids.extend(reserve_order_ids(self.id_block_size))
+            return self._ids.popleft()
+
+    def submit(self, order):
+        """
+        Assign a reserved id to an unsaved Order, claim its external_id and
+        queue it. Blocks until it is committed when durability is "flush".
+        """
+        if order.jurisdiction_id is None or order.rate_application_id is None:
+            order.intern_dimensions()
+        order.pk = self._next_id()
+        # Claimed before buffering so a retry sees it (IntegrityError if taken)
+        external_ids.claim([order])
+        # The JSON payload keeps milliseconds; answer with what gets stored
+        order.created_at = order.created_at.replace(
+            microsecond=order.created_at.microsecond // 1000 * 1000
+        )
+        payload = serializers.serialize("json", [order])
+
+        waiter = None
+        if self.durability == "flush":
+            waiter = {"done": threading.Event(), "error": None}
+            with self._lock:
+                self._waiters[order.pk] = waiter
+
+        self.backend.push(payload)
+        if len(self.backend) >= self.max_rows:
+            self._wakeup.set()
+
+        if waiter:
+            if not waiter["done"].wait(self.flush_timeout):
+                with self._lock:
+                    self._waiters.pop(order.pk, None)
+                raise TimeoutError(f"Order {order.pk} was not flushed in time")
+            if waiter["error"]:
+                raise waiter["error"]
+            order.created_at = waiter["created_at"]
+        return order
+
+    # -------------------------------------------------------------- flusher
+    def flush(self):
+        """
+        Write out everything currently buffered. Returns the number of rows
+        committed.
+        """
+        written = 0
+        while True:
+            rows = self.backend.pop(self.max_rows)
+            if not rows:
+                return written
+            written += self._write(rows)
+
+    def _write(self, rows):
+        orders = [
+            obj.object
+            for row in rows
+            for obj in serializers.deserialize("json", row)
+        ]
+        # Rows keep the created_at their response showed, unless they sat in
+        # the buffer past the settle window (e.g. drained after a crash):
+        # the changes cursor may already be beyond that time.
+        settled = settled_before()
+        for order in orders:
+            if order.created_at < settled:
+                order.created_at = timezone.now()
+        failed = {}
+        try:
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+        except Exception:
+            logger.exception("Write-behind group commit failed, retrying row by row")
+            for order in orders:
+                try:
+                    with transaction.atomic():
+                        Order.objects.bulk_create([order])
+                except Exception as e:
+                    logger.exception(f"Dropping buffered order {order.pk}")
+                    failed[order.pk] = e
+            if failed:
+                external_ids.release(failed)
+
+        with self._lock:
+            for order in orders:
+                waiter = self._waiters.pop(order.pk, None)
+                if waiter:
+                    waiter["error"] = failed.get(order.pk)
+                    waiter["created_at"] = order.created_at
+                    waiter["done"].set()
+        return len(orders) - len(failed)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+            finally:
+                connection.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="order-write-behind", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Graceful shutdown: stop the flusher and drain what is left.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_timeout)
+            self._thread = None
+        drained = self.flush()
+        if drained:
+            logger.info(f"Drained {drained} buffered orders on shutdown")
+        if hasattr(self.backend, "unregister"):
+            self.backend.unregister()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """
+    Process-wide buffer built from settings and started on first use.
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            if settings.ORDER_WRITE_BEHIND_BACKEND == "redis":
+                backend = RedisBackend(settings.ORDER_WRITE_BEHIND_REDIS_URL)
+            else:
+                backend = LocalBackend()
+            _buffer = OrderWriteBuffer(
+                backend,
+                flush_interval_ms=settings.ORDER_WRITE_BEHIND_FLUSH_MS,
+                max_rows=settings.ORDER_WRITE_BEHIND_MAX_ROWS,
+                durability=settings.ORDER_WRITE_BEHIND_DURABILITY,
+            )
+            _buffer.start()
+        return _buffer